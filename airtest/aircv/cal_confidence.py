@@ -30,17 +30,21 @@ def cal_rgb_confidence(img_src_rgb, img_sch_rgb):
     img_src_rgb = np.clip(img_src_rgb, 10, 245)
     img_sch_rgb = np.clip(img_sch_rgb, 10, 245)
     # 转HSV强化颜色的影响
-    img_src_rgb = cv2.cvtColor(img_src_rgb, cv2.COLOR_BGR2HSV)
-    img_sch_rgb = cv2.cvtColor(img_sch_rgb, cv2.COLOR_BGR2HSV)
+    img_src_hsv = cv2.cvtColor(img_src_rgb, cv2.COLOR_BGR2HSV)
+    img_sch_hsv = cv2.cvtColor(img_sch_rgb, cv2.COLOR_BGR2HSV)
+    return cal_hsv_confidence(img_src_hsv, img_sch_hsv)
 
+
+def cal_hsv_confidence(img_src_hsv, img_sch_hsv):
+    """同大小的HSV图(已clip到[10, 245]再转换)计算相似度, 即cal_rgb_confidence的后半部分."""
     # 扩展置信度计算区域
-    img_src_rgb = cv2.copyMakeBorder(img_src_rgb, 10,10,10,10,cv2.BORDER_REPLICATE)
+    img_src_hsv = cv2.copyMakeBorder(img_src_hsv, 10,10,10,10,cv2.BORDER_REPLICATE)
     # 加入取值范围干扰，防止算法过于放大微小差异
-    img_src_rgb[0,0] = 0
-    img_src_rgb[0,1] = 255
+    img_src_hsv[0,0] = 0
+    img_src_hsv[0,1] = 255
 
     # 计算BGR三通道的confidence，存入bgr_confidence
-    src_bgr, sch_bgr = cv2.split(img_src_rgb), cv2.split(img_sch_rgb)
+    src_bgr, sch_bgr = cv2.split(img_src_hsv), cv2.split(img_sch_hsv)
     bgr_confidence = [0, 0, 0]
     for i in range(3):
         res_temp = cv2.matchTemplate(src_bgr[i], sch_bgr[i], cv2.TM_CCOEFF_NORMED)
@@ -48,3 +52,72 @@ def cal_rgb_confidence(img_src_rgb, img_sch_rgb):
         bgr_confidence[i] = max_val
 
     return min(bgr_confidence)
+
+
+class ConfidenceEngine(object):
+    """
+    Score many candidate crops of the same size against one template.
+
+    The template side (gray image or channels of the clipped HSV image) is prepared once, and the
+    crops are scored in buffers allocated once, with the same operations as cal_ccoeff_confidence,
+    cal_rgb_confidence and cal_hsv_confidence, so the confidences are identical.
+    With a threshold, the HSV channels left are skipped once one is below it: the returned value is
+    then below the threshold but not the exact confidence.
+    The buffers are reused between calls, an engine must not be shared between threads.
+    """
+
+    # 置信度计算区域四周扩展的像素数
+    BORDER = 10
+
+    def __init__(self, img_sch, rgb=True, hsv=False):
+        """
+        img_sch: the template, in BGR, or already clipped to [10, 245] and converted to HSV if hsv is True
+        rgb: score the 3 HSV channels like cal_rgb_confidence, else the gray images like cal_ccoeff_confidence
+        """
+        super(ConfidenceEngine, self).__init__()
+        self.rgb = rgb or hsv
+        h, w = img_sch.shape[:2]
+        self.shape = (h, w)
+        padded = (h + 2 * self.BORDER, w + 2 * self.BORDER)
+        if self.rgb:
+            if not hsv:
+                img_sch = cv2.cvtColor(np.clip(img_sch, 10, 245), cv2.COLOR_BGR2HSV)
+            self._sch_channels = cv2.split(img_sch)
+            self._clipped = np.empty((h, w, 3), np.uint8)
+            self._hsv = np.empty((h, w, 3), np.uint8)
+            self._padded = [np.empty(padded, np.uint8) for _ in range(3)]
+        else:
+            self._sch_gray = img_mat_rgb_2_gray(img_sch)
+            self._padded_bgr = np.empty(padded + img_sch.shape[2:], img_sch.dtype)
+            self._padded_gray = np.empty(padded, np.uint8)
+        self._res = np.empty((2 * self.BORDER + 1, 2 * self.BORDER + 1), np.float32)
+
+    def confidence(self, img_src, threshold=None):
+        """Confidence of a BGR crop of the template size."""
+        if not self.rgb:
+            return self._ccoeff_confidence(img_src)
+        # 减少极限值对hsv角度计算的影响, 转HSV强化颜色的影响
+        np.clip(img_src, 10, 245, out=self._clipped)
+        return self.hsv_confidence(cv2.cvtColor(self._clipped, cv2.COLOR_BGR2HSV, dst=self._hsv), threshold)
+
+    def hsv_confidence(self, img_src_hsv, threshold=None):
+        """Confidence of a crop already clipped to [10, 245] and converted to HSV, as cal_hsv_confidence."""
+        b = self.BORDER
+        hsv_confidence = []
+        for i, channel in enumerate(cv2.split(img_src_hsv)):
+            # 扩展置信度计算区域, 并加入取值范围干扰，防止算法过于放大微小差异
+            padded = cv2.copyMakeBorder(channel, b, b, b, b, cv2.BORDER_REPLICATE, dst=self._padded[i])
+            padded[0, 0], padded[0, 1] = 0, 255
+            res = cv2.matchTemplate(padded, self._sch_channels[i], cv2.TM_CCOEFF_NORMED, result=self._res)
+            hsv_confidence.append(cv2.minMaxLoc(res)[1])
+            if threshold is not None and hsv_confidence[-1] < threshold:
+                break
+        return min(hsv_confidence)
+
+    def _ccoeff_confidence(self, img_src):
+        b = self.BORDER
+        padded = cv2.copyMakeBorder(img_src, b, b, b, b, cv2.BORDER_REPLICATE, dst=self._padded_bgr)
+        padded[0, 0], padded[0, 1] = 0, 255
+        padded = cv2.cvtColor(padded, cv2.COLOR_BGR2GRAY, dst=self._padded_gray)
+        res = cv2.matchTemplate(padded, self._sch_gray, cv2.TM_CCOEFF_NORMED, result=self._res)
+        return cv2.minMaxLoc(res)[1]
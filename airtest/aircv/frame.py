@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Images with lazily computed derived forms, shared by the matching methods."""
+
+import cv2
+import time
+import itertools
+import numpy as np
+from .utils import string_2_img, image_size, resize_by_max
+
+FINGERPRINT_CELL = 8
+
+
+class ImageFrame(object):
+    """
+    Wrap a BGR image and memoize images derived from it (gray, hsv, pyramid, keypoints...).
+
+    The wrapped image must not be modified in place once derived images were computed.
+    cache_key: identity of the image in the caches shared between frames, e.g. the screen keypoint cache,
+               None if the image is only identified by this object
+    """
+
+    cache_key = None
+
+    def __init__(self, image, cache_key=None):
+        super(ImageFrame, self).__init__()
+        self.image = image
+        self.cache_key = cache_key
+        self._derived = {}
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def to_json(self):
+        # 写入log时只记录尺寸,不展开图像内容
+        h, w = self.image.shape[:2]
+        return "<%s %dx%d>" % (self.__class__.__name__, w, h)
+
+    def derived(self, key, func, *args):
+        """Return func(*args), computed once for the same key."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            # 多线程同时计算时结果相同,以先存入的为准
+            return self._derived.setdefault(key, func(*args))
+
+    @property
+    def gray(self):
+        if self.image.ndim == 2:
+            return self.image
+        return self.derived("gray", cv2.cvtColor, self.image, cv2.COLOR_BGR2GRAY)
+
+    @property
+    def clipped_hsv(self):
+        """HSV of the image clipped to [10, 245], the color space used by cal_rgb_confidence."""
+        return self.derived("clipped_hsv", _clipped_hsv, self.image)
+
+    def pyramid(self, level):
+        """Gray image downsampled level times by cv2.pyrDown, level 0 is the gray image itself."""
+        if level <= 0:
+            return self.gray
+        return self.derived(("pyramid", level), lambda: cv2.pyrDown(self.pyramid(level - 1)))
+
+    @property
+    def fingerprint(self):
+        """The image averaged over cells of FINGERPRINT_CELL*FINGERPRINT_CELL pixels, to compare frames cheaply."""
+        h, w = self.image.shape[:2]
+        size = (max(1, w // FINGERPRINT_CELL), max(1, h // FINGERPRINT_CELL))
+        return self.derived("fingerprint", lambda: cv2.resize(self.image, size, interpolation=cv2.INTER_AREA))
+
+    def keypoints(self, key, func):
+        """Keypoints and descriptors of the image, func(image) is called once per detector key."""
+        return self.derived(("keypoints", key), func, self.image)
+
+    def crop(self, rect):
+        """The area rect (xmin, ymin, xmax, ymax) of the image, identified by this frame and rect in the caches."""
+        xmin, ymin, xmax, ymax = rect
+        cache_key = None if self.cache_key is None else (self.cache_key, tuple(rect))
+        return ImageFrame(self.image[ymin:ymax, xmin:xmax], cache_key=cache_key)
+
+
+class ScreenFrame(ImageFrame):
+    """
+    One screenshot of the device, shared by all matching methods and templates tried on it.
+
+    frame_id: increasing number of the frame in this process
+    timestamp: time when the screenshot was taken
+    """
+
+    _counter = itertools.count(1)
+
+    def __init__(self, image, timestamp=None):
+        frame_id = next(self._counter)
+        super(ScreenFrame, self).__init__(image, cache_key=frame_id)
+        self.frame_id = frame_id
+        self.timestamp = timestamp or time.time()
+
+
+class EncodedFrame(ImageFrame):
+    """
+    A jpg/png frame of the screen stream, decoded when needed: `image` at full size, `resized()` scaled down.
+
+    Each view is decoded at most once, the reduced ones by libjpeg at 1/2, 1/4 or 1/8 size, so that
+    consumers of small images (recording, try_log_screen) do not pay for the full size decoding.
+    The data must not be modified or reused while the frame is in use.
+    """
+
+    def __init__(self, data):
+        # image是按需解码的属性,不调用ImageFrame.__init__
+        self.data = data
+        self._derived = {}
+
+    @property
+    def image(self):
+        return self.derived("image", string_2_img, self.data)
+
+    @property
+    def size(self):
+        """(width, height) of the full image, read from the headers without decoding when possible."""
+        size = self.derived("size", image_size, self.data)
+        if size is None and self.image is not None:
+            h, w = self.image.shape[:2]
+            size = (w, h)
+        return size
+
+    def to_json(self):
+        w, h = self.size or (0, 0)
+        return "<%s %dx%d>" % (self.__class__.__name__, w, h)
+
+    def resized(self, max_size):
+        """The image scaled down so that its longer side is at most max_size, the full image if it is smaller."""
+        size = self.derived("size", image_size, self.data)
+        if not max_size or (size and max(size) <= max_size):
+            return self.image
+        return self.derived(("resized", max_size), self._decode_resized, max_size)
+
+    def _decode_resized(self, max_size):
+        if "image" in self._derived:
+            # 已经完整解码过,直接缩放
+            return resize_by_max(self._derived["image"], max_size)
+        return string_2_img(self.data, max_size)
+
+
+def changed_area(old, new, threshold):
+    """
+    Area of the new frame changed since the old one, compared by their fingerprints.
+
+    A cell is changed when one of its channels differs by more than threshold.
+
+    Returns:
+        (xmin, ymin, xmax, ymax) bounding the changed cells, None if nothing changed
+    """
+    h, w = new.shape[:2]
+    if old.shape != new.shape:
+        return 0, 0, w, h
+    diff = cv2.absdiff(old.fingerprint, new.fingerprint)
+    if diff.ndim == 3:
+        diff = diff.max(axis=2)
+    ys, xs = np.nonzero(diff > threshold)
+    if xs.size == 0:
+        return None
+    fh, fw = diff.shape
+    # 扩大一格: 尺寸不是格子的整数倍时, 格子与像素不完全对齐
+    return (max(0, int(xs.min() - 1) * w // fw), max(0, int(ys.min() - 1) * h // fh),
+            min(w, int(xs.max() + 2) * w // fw), min(h, int(ys.max() + 2) * h // fh))
+
+
+def _clipped_hsv(image):
+    return cv2.cvtColor(np.clip(image, 10, 245), cv2.COLOR_BGR2HSV)
+
+
+def as_frame(img, frame_class=ImageFrame):
+    """Wrap img into a frame_class object, frames are returned as they are."""
+    if isinstance(img, ImageFrame):
+        return img
+    return frame_class(img)
@@ -5,16 +5,27 @@
 
 import cv2
 import time
+import threading
 import numpy as np
 
 from airtest.utils.logger import get_logger
 
 from .error import *  # noqa
 from .utils import generate_result, check_image_valid, print_run_time
-from .cal_confidence import cal_ccoeff_confidence, cal_rgb_confidence
+from .cal_confidence import ConfidenceEngine
+from .frame import as_frame
 
 LOGGING = get_logger(__name__)
 
+# 每个线程各自复用的检测器/匹配器对象: (class, detector key) -> {attribute name: object}
+_DETECTOR_POOL = threading.local()
+
+# keypoint_matcher="flann"时的近似最近邻索引参数: 二进制描述符用LSH, 浮点描述符用KD-tree
+FLANN_INDEX_KDTREE = 1
+FLANN_INDEX_LSH = 6
+FLANN_LSH_PARAMS = dict(algorithm=FLANN_INDEX_LSH, table_number=6, key_size=12, multi_probe_level=1)
+FLANN_KDTREE_PARAMS = dict(algorithm=FLANN_INDEX_KDTREE, trees=4)
+
 
 class KeypointMatching(object):
     """基于特征点的识别基类: KAZE."""
@@ -25,23 +36,75 @@ class KeypointMatching(object):
     FILTER_RATIO = 0.59
     # 参数: SIFT识别时只找出一对相似特征点时的置信度(confidence)
     ONE_POINT_CONFI = 0.5
-
-    def __init__(self, im_search, im_source, threshold=0.8, rgb=True):
+    # 影响特征点检测结果的类属性, 是特征点缓存键的一部分
+    DETECTOR_PARAMS = ()
+    # init_detector()创建的属性, 在同一线程内复用
+    DETECTOR_ATTRS = ("detector", "matcher")
+    # 多目标识别: 默认最多返回的结果数
+    MAX_RESULT_COUNT = 10
+    # 多目标识别: 每个目标至少需要的单矩阵映射内点数
+    MIN_INSTANCE_POINTS = 4
+
+    def __init__(self, im_search, im_source, threshold=0.8, rgb=True, keypoint_cache=None, source_keypoint_cache=None,
+                 keypoint_matcher="bf"):
         super(KeypointMatching, self).__init__()
-        self.im_source = im_source
-        self.im_search = im_search
+        self.source_frame = as_frame(im_source)
+        self.im_source = self.source_frame.image
+        self.search_frame = as_frame(im_search)
+        self.im_search = self.search_frame.image
         self.threshold = threshold
         self.rgb = rgb
+        self.keypoint_cache = keypoint_cache
+        self.source_keypoint_cache = source_keypoint_cache
+        # "bf": 暴力匹配(match_keypoints); "flann": 在模板特征点的近似最近邻索引中查询截图特征点, 索引每个模板只建立一次
+        if keypoint_matcher not in ("bf", "flann"):
+            raise ValueError("keypoint_matcher should be 'bf' or 'flann', got %r" % (keypoint_matcher,))
+        self.keypoint_matcher = keypoint_matcher
+        self._confidence_engine = None
 
     def mask_kaze(self):
         """基于kaze查找多个目标区域的方法."""
-        # 求出特征点后，self.im_source中获得match的那些点进行聚类
-        raise NotImplementedError
+        return self.find_all_results()
 
-    def find_all_results(self):
-        """基于kaze查找多个目标区域的方法."""
-        # 求出特征点后，self.im_source中获得match的那些点进行聚类
-        raise NotImplementedError
+    @print_run_time
+    def find_all_results(self, max_count=None):
+        """
+        基于kaze查找多个目标区域的方法.
+
+        截图的每个特征点在模板中找最优匹配, 使同一模板的多个目标都能保留下来;
+        然后反复用RANSAC求出内点最多的单矩阵映射, 每个映射的内点即为一个目标, 移除后继续寻找下一个目标.
+        """
+        max_count = max_count or self.MAX_RESULT_COUNT
+        if not check_image_valid(self.im_source, self.im_search):
+            return None
+
+        sch_pts, src_pts = self._get_all_matched_points()
+        result = []
+        remaining = np.arange(len(src_pts))
+        # 每轮至少移除MIN_INSTANCE_POINTS个点, 轮数有限
+        while len(remaining) >= self.MIN_INSTANCE_POINTS and len(result) < max_count:
+            M, mask = cv2.findHomography(sch_pts[remaining], src_pts[remaining], cv2.RANSAC, 5.0)
+            if M is None or np.count_nonzero(mask) < self.MIN_INSTANCE_POINTS:
+                break
+            inliers = mask.ravel() != 0
+            instance, remaining = remaining[inliers], remaining[~inliers]
+            # 针对该目标的内点再次计算出更精确的转化矩阵M
+            M, _ = cv2.findHomography(sch_pts[instance], src_pts[instance], cv2.RANSAC, 5.0)
+            if M is None:
+                continue
+            try:
+                middle_point, pypts, w_h_range = self._get_target_with_homography(M)
+                match = self._cal_result(middle_point, pypts, w_h_range)
+            except (MatchResultCheckError, cv2.error):
+                continue
+            # 与已找到的目标重叠(中心点落在其区域内)的视为同一目标
+            if match["confidence"] < self.threshold or any(self._in_rectangle(middle_point, r["rectangle"]) for r in result):
+                continue
+            result.append(match)
+
+        result.sort(key=lambda r: r["confidence"], reverse=True)
+        LOGGING.debug("[%s] threshold=%s, results=%s" % (self.METHOD_NAME, self.threshold, result))
+        return result if result else None
 
     @print_run_time
     def find_best_result(self):
@@ -73,6 +136,12 @@ class KeypointMatching(object):
             middle_point, pypts, w_h_range = self._many_good_pts(self.kp_sch, self.kp_src, self.good)
 
         # 第四步：根据识别区域，求出结果可信度，并将结果进行返回:
+        best_match = self._cal_result(middle_point, pypts, w_h_range)
+        LOGGING.debug("[%s] threshold=%s, result=%s" % (self.METHOD_NAME, self.threshold, best_match))
+        return best_match if best_match["confidence"] >= self.threshold else None
+
+    def _cal_result(self, middle_point, pypts, w_h_range):
+        """校验识别区域, 求出可信度并生成识别结果."""
         # 对识别结果进行合理性校验: 小于5个像素的，或者缩放超过5倍的，一律视为不合法直接raise.
         self._target_error_check(w_h_range)
         # 将截图和识别结果缩放到大小一致,准备计算可信度
@@ -80,10 +149,12 @@ class KeypointMatching(object):
         target_img = self.im_source[y_min:y_max, x_min:x_max]
         resize_img = cv2.resize(target_img, (w, h))
         confidence = self._cal_confidence(resize_img)
+        return generate_result(middle_point, pypts, confidence)
 
-        best_match = generate_result(middle_point, pypts, confidence)
-        LOGGING.debug("[%s] threshold=%s, result=%s" % (self.METHOD_NAME, self.threshold, best_match))
-        return best_match if confidence >= self.threshold else None
+    @staticmethod
+    def _in_rectangle(point, rectangle):
+        (x_min, y_min), _, (x_max, y_max), _ = rectangle
+        return x_min <= point[0] <= x_max and y_min <= point[1] <= y_max
 
     def show_match_image(self):
         """Show how the keypoints matches."""
@@ -106,10 +177,10 @@ class KeypointMatching(object):
 
     def _cal_confidence(self, resize_img):
         """计算confidence."""
-        if self.rgb:
-            confidence = cal_rgb_confidence(resize_img, self.im_search)
-        else:
-            confidence = cal_ccoeff_confidence(resize_img, self.im_search)
+        # 与cal_rgb_confidence/cal_ccoeff_confidence结果相同, 模板一侧只准备一次, 多目标识别时逐个目标复用
+        if self._confidence_engine is None:
+            self._confidence_engine = ConfidenceEngine(self.im_search, rgb=self.rgb)
+        confidence = self._confidence_engine.confidence(resize_img)
         # confidence修正
         confidence = (1 + confidence) / 2
         return confidence
@@ -130,37 +201,123 @@ class KeypointMatching(object):
         # 匹配两个图片中的特征点集，k=2表示每个特征点取出2个最匹配的对应点:
         return self.matcher.knnMatch(des_sch, des_src, k=2)
 
+    def _get_search_keypoints_and_descriptors(self, image):
+        """模板的特征点和描述符, 有keypoint_cache时从中读取, 只需检测截图的特征点."""
+        if self.keypoint_cache is None:
+            return self.get_keypoints_and_descriptors(image)
+        return self.keypoint_cache.get_or_create(image, self._detector_key(), self.get_keypoints_and_descriptors)
+
+    def _get_source_keypoints_and_descriptors(self):
+        """
+        截图的特征点和描述符: 截图帧有cache_key(帧号、帧号+裁剪区域)且有source_keypoint_cache时按cache_key缓存,
+        同一帧截图的不同模板对象只检测一次; 否则缓存在截图帧对象上.
+        """
+        cache, key = self.source_keypoint_cache, self.source_frame.cache_key
+        if cache is None or not cache.maxsize or key is None:
+            return self.source_frame.keypoints(self._detector_key(), self.get_keypoints_and_descriptors)
+        ret = cache.get_or_create_by_key(key, self._detector_key(),
+                                         lambda: self.get_keypoints_and_descriptors(self.im_source))
+        LOGGING.debug("[%s] screen keypoint cache: %s" % (self.METHOD_NAME, cache.stats()))
+        return ret
+
+    def _detector_key(self):
+        return "%s %s" % (self.METHOD_NAME, [(name, getattr(self, name)) for name in self.DETECTOR_PARAMS])
+
+    def _init_detector_from_pool(self):
+        """Set the DETECTOR_ATTRS created by init_detector() once per thread, class and DETECTOR_PARAMS."""
+        pool = _DETECTOR_POOL.__dict__.setdefault("detectors", {})
+        key = (type(self), self._detector_key())
+        attrs = pool.get(key)
+        if attrs is None:
+            self.init_detector()
+            attrs = pool[key] = {name: getattr(self, name) for name in self.DETECTOR_ATTRS}
+        else:
+            self.__dict__.update(attrs)
+
     def _get_key_points(self):
         """根据传入图像,计算图像所有的特征点,并得到匹配特征点对."""
-        # 准备工作: 初始化算子
-        self.init_detector()
+        # 准备工作: 初始化算子, 同一线程内复用
+        self._init_detector_from_pool()
         # 第一步：获取特征点集，并匹配出特征点对: 返回值 good, pypts, kp_sch, kp_src
-        kp_sch, des_sch = self.get_keypoints_and_descriptors(self.im_search)
-        kp_src, des_src = self.get_keypoints_and_descriptors(self.im_source)
+        kp_sch, des_sch = self.search_frame.keypoints(self._detector_key(), self._get_search_keypoints_and_descriptors)
+        # 特征点按检测器缓存,同一模板或同一帧截图重复匹配时不再重新检测
+        kp_src, des_src = self._get_source_keypoints_and_descriptors()
         # When apply knnmatch , make sure that number of features in both test and
         #       query image is greater than or equal to number of nearest neighbors in knn match.
         if len(kp_sch) < 2 or len(kp_src) < 2:
             raise NoMatchPointError("Not enough feature points in input images !")
+        if self.keypoint_matcher == "flann":
+            # 索引建立在模板上, 查询得到的是截图->模板的匹配, 转换为模板->截图的点对,
+            # 按模板特征点排序后与暴力匹配一样去重
+            good = sorted((cv2.DMatch(m.trainIdx, m.queryIdx, m.distance) for m in self._match_source_to_search(des_sch, des_src)),
+                          key=lambda m: m.queryIdx)
+            return kp_sch, kp_src, self._unique_source_matches(good, kp_src)
         # match descriptors (特征值匹配)
         matches = self.match_keypoints(des_sch, des_src)
 
-        # good为特征点初选结果，剔除掉前两名匹配太接近的特征点，不是独特优秀的特征点直接筛除(多目标识别情况直接不适用)
-        good = []
-        for m, n in matches:
-            if m.distance < self.FILTER_RATIO * n.distance:
-                good.append(m)
-        # good点需要去除重复的部分，（设定源图像不能有重复点）去重时将src图像中的重复点找出即可
-        # 去重策略：允许搜索图像对源图像的特征点映射一对多，不允许多对一重复（即不能源图像上一个点对应搜索图像的多个点）
-        good_diff, diff_good_point = [], [[]]
-        for m in good:
-            diff_point = [int(kp_src[m.trainIdx].pt[0]), int(kp_src[m.trainIdx].pt[1])]
-            if diff_point not in diff_good_point:
-                good_diff.append(m)
-                diff_good_point.append(diff_point)
-        good = good_diff
-
+        good = self._filter_good_matches(matches, kp_src)
         return kp_sch, kp_src, good
 
+    def _get_all_matched_points(self):
+        """
+        多目标识别的匹配点对: 截图的特征点在模板中找出前两名匹配, 比例筛选后返回(模板点, 截图点)坐标数组.
+
+        与_get_key_points的方向相反, 截图中同一模板的多个目标不会因为彼此相似而在比例筛选中被剔除.
+        """
+        self._init_detector_from_pool()
+        kp_sch, des_sch = self.search_frame.keypoints(self._detector_key(), self._get_search_keypoints_and_descriptors)
+        kp_src, des_src = self._get_source_keypoints_and_descriptors()
+        if len(kp_sch) < 2 or len(kp_src) < 2:
+            raise NoMatchPointError("Not enough feature points in input images !")
+        good = self._match_source_to_search(des_sch, des_src)
+        sch_pts = np.float32([kp_sch[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
+        src_pts = np.float32([kp_src[m.queryIdx].pt for m in good]).reshape(-1, 1, 2)
+        return sch_pts, src_pts
+
+    def _match_source_to_search(self, des_sch, des_src):
+        """截图的每个特征点在模板中找出前两名匹配并进行比例筛选, 返回的DMatch中queryIdx为截图特征点, trainIdx为模板特征点."""
+        if self.keypoint_matcher != "flann":
+            pairs = [pair for pair in self.match_keypoints(des_src, des_sch) if len(pair) == 2]
+            return [m for m, n in pairs if m.distance < self.FILTER_RATIO * n.distance]
+
+        index, lock = self.search_frame.derived(("flann_index", self._detector_key()), _build_flann_index, des_sch)
+        # 同一模板的索引由各线程共用, cv2.flann_Index的查询不保证线程安全
+        with lock:
+            indices, distances = index.knnSearch(des_src.astype(des_sch.dtype), 2, params={})
+        distances = distances.astype(np.float64)
+        if des_sch.dtype != np.uint8:
+            # KD-tree返回的是L2距离的平方
+            distances = np.sqrt(distances)
+        # LSH找不到足够的近邻时序号为-1
+        good_idx = np.flatnonzero((indices >= 0).all(axis=1) & (distances[:, 0] < self.FILTER_RATIO * distances[:, 1]))
+        return [cv2.DMatch(int(i), int(indices[i, 0]), float(distances[i, 0])) for i in good_idx]
+
+    def _filter_good_matches(self, matches, kp_src):
+        """
+        good为特征点初选结果，剔除掉前两名匹配太接近的特征点，不是独特优秀的特征点直接筛除(多目标识别情况直接不适用)
+
+        good点需要去除重复的部分，（设定源图像不能有重复点）去重时将src图像中的重复点找出即可
+        去重策略：允许搜索图像对源图像的特征点映射一对多，不允许多对一重复（即不能源图像上一个点对应搜索图像的多个点）
+        源图像上的点取整后比较, 重复时保留先出现的匹配.
+        """
+        # knnMatch可能对个别特征点返回少于2个匹配, 无法进行比例筛选
+        pairs = [pair for pair in matches if len(pair) == 2]
+        if not pairs:
+            return []
+        distances = np.array([(m.distance, n.distance) for m, n in pairs], dtype=np.float64)
+        good_idx = np.flatnonzero(distances[:, 0] < self.FILTER_RATIO * distances[:, 1])
+        return self._unique_source_matches([pairs[i][0] for i in good_idx], kp_src)
+
+    @staticmethod
+    def _unique_source_matches(good, kp_src):
+        """去除源图像上重复的点: 点取整后比较, 重复时保留先出现的匹配."""
+        if not good:
+            return []
+        # int()与astype(int)都向0取整, 坐标非负时即向下取整
+        src_pts = np.array([kp_src[m.trainIdx].pt for m in good], dtype=np.float64).astype(int)
+        _, first_idx = np.unique(src_pts, axis=0, return_index=True)
+        return [good[i] for i in np.sort(first_idx)]
+
     def _handle_two_good_points(self, kp_sch, kp_src, good):
         """处理两对特征点的情况."""
         pts_sch1 = int(kp_sch[good[0].queryIdx].pt[0]), int(kp_sch[good[0].queryIdx].pt[1])
@@ -188,14 +345,16 @@ class KeypointMatching(object):
             -1, 1, 2), np.float32([kp_src[m.trainIdx].pt for m in good]).reshape(-1, 1, 2)
         # M是转化矩阵
         M, mask = self._find_homography(sch_pts, img_pts)
-        matches_mask = mask.ravel().tolist()
         # 从good中间筛选出更精确的点(假设good中大部分点为正确的，由ratio=0.7保障)
-        selected = [v for k, v in enumerate(good) if matches_mask[k]]
+        selected = mask.ravel() != 0
 
         # 针对所有的selected点再次计算出更精确的转化矩阵M来
-        sch_pts, img_pts = np.float32([kp_sch[m.queryIdx].pt for m in selected]).reshape(
-            -1, 1, 2), np.float32([kp_src[m.trainIdx].pt for m in selected]).reshape(-1, 1, 2)
+        sch_pts, img_pts = sch_pts[selected], img_pts[selected]
         M, mask = self._find_homography(sch_pts, img_pts)
+        return self._get_target_with_homography(M)
+
+    def _get_target_with_homography(self, M):
+        """根据模板到截图的单矩阵映射M, 求出目标的中心点、角点和区域范围."""
         # 计算四个角矩阵变换后的坐标，也就是在大图中的目标区域的顶点坐标:
         h, w = self.im_search.shape[:2]
         h_s, w_s = self.im_source.shape[:2]
@@ -289,3 +448,14 @@ class KeypointMatching(object):
         # 如果矩形识别区域的宽和高，与sch_img的宽高差距超过5倍(屏幕像素差不可能有5倍)，认定为识别错误。
         if tar_width < 0.2 * w or tar_width > 5 * w or tar_height < 0.2 * h or tar_height > 5 * h:
             raise MatchResultCheckError("Target area is 5 times bigger or 0.2 times smaller than sch_img.")
+
+
+def _build_flann_index(descriptors):
+    """
+    模板描述符的近似最近邻索引, 二进制描述符(BRISK/ORB/AKAZE/BRIEF)用LSH, 浮点描述符(KAZE/SIFT/SURF)用KD-tree.
+
+    Returns: (index, lock), queries of the index must hold the lock
+    """
+    if descriptors.dtype == np.uint8:
+        return cv2.flann_Index(descriptors, FLANN_LSH_PARAMS), threading.Lock()
+    return cv2.flann_Index(descriptors.astype(np.float32), FLANN_KDTREE_PARAMS), threading.Lock()
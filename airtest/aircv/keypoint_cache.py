@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Keypoints and descriptors of template images, kept across matches and runs."""
+
+import os
+import cv2
+import hashlib
+import numpy as np
+
+from airtest.utils.logger import get_logger
+from .cache import LRUCache
+
+LOGGING = get_logger(__name__)
+
+
+class KeypointCache(object):
+    """
+    Keypoints and descriptors of images, by image content, detector and OpenCV version,
+    or by an image key given by the caller with get_or_create_by_key().
+
+    cache_dir: directory of the npz files keeping them for the next runs, None to keep them in memory only.
+    A changed image or another OpenCV version has another key, so stale files are never read.
+    """
+
+    def __init__(self, cache_dir=None, maxsize=200):
+        super(KeypointCache, self).__init__()
+        self.cache_dir = cache_dir
+        self._cache = LRUCache(maxsize)
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def maxsize(self):
+        return self._cache.maxsize
+
+    @maxsize.setter
+    def maxsize(self, value):
+        self._cache.maxsize = value
+
+    def get_or_create(self, image, detector_key, detect):
+        """Return the keypoints and descriptors of image, detect(image) is called if they are not cached."""
+        key = self.make_key(image, detector_key)
+        return self._cache.get_or_create(key, lambda: self._load(key) or self._detect(key, image, detect))
+
+    def get_or_create_by_key(self, image_key, detector_key, detect):
+        """
+        Return the keypoints and descriptors of the image identified by image_key, e.g. a screen frame id,
+        detect() is called if they are not cached. The image is not hashed, and they are kept in memory only.
+        """
+        return self._cache.get_or_create((image_key, detector_key), detect)
+
+    @staticmethod
+    def make_key(image, detector_key):
+        md5 = hashlib.md5(np.ascontiguousarray(image).tobytes())
+        md5.update(("%s %s %s %s" % (image.shape, image.dtype, detector_key, cv2.__version__)).encode("utf-8"))
+        return md5.hexdigest()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, "%s.npz" % key)
+
+    def _detect(self, key, image, detect):
+        keypoints, descriptors = detect(image)
+        if self.cache_dir:
+            self._save(key, keypoints, descriptors)
+        return keypoints, descriptors
+
+    def _load(self, key):
+        if not self.cache_dir or not os.path.isfile(self._path(key)):
+            return None
+        try:
+            with np.load(self._path(key)) as data:
+                points, descriptors = data["points"], data["descriptors"]
+        except (IOError, OSError, ValueError, KeyError) as err:
+            LOGGING.warning("failed to load keypoints from %s: %s" % (self._path(key), err))
+            return None
+        keypoints = tuple(cv2.KeyPoint(x, y, size, angle, response, int(octave), int(class_id))
+                          for x, y, size, angle, response, octave, class_id in points.tolist())
+        # detectAndCompute返回的descriptors在没有特征点时为None
+        return keypoints, descriptors if descriptors.size else None
+
+    def _save(self, key, keypoints, descriptors):
+        points = np.array([(kp.pt[0], kp.pt[1], kp.size, kp.angle, kp.response, kp.octave, kp.class_id)
+                           for kp in keypoints], dtype=np.float64).reshape(-1, 7)
+        if descriptors is None:
+            descriptors = np.empty((0,), np.float32)
+        tmp_path = "%s.%d.tmp.npz" % (self._path(key)[:-4], os.getpid())
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            np.savez_compressed(tmp_path, points=points, descriptors=descriptors)
+            os.replace(tmp_path, self._path(key))
+        except (IOError, OSError) as err:
+            LOGGING.warning("failed to save keypoints to %s: %s" % (self._path(key), err))
@@ -24,6 +24,7 @@ class BRIEFMatching(KeypointMatching):
     """FastFeature Matching."""
 
     METHOD_NAME = "BRIEF"  # 日志中的方法名
+    DETECTOR_ATTRS = ("star_detector", "brief_extractor", "matcher")
 
     def init_detector(self):
         """Init keypoint detector object."""
@@ -107,6 +108,7 @@ class SURFMatching(KeypointMatching):
     UPRIGHT = 0
     # SURF算子的Hessian Threshold
     HESSIAN_THRESHOLD = 400
+    DETECTOR_PARAMS = ("HESSIAN_THRESHOLD", "UPRIGHT")
     # SURF识别特征点匹配方法设置:
     FLANN_INDEX_KDTREE = 0
 
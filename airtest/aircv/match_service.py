@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Matching in a pool of worker processes, for CPU bound methods called from many threads."""
+
+import cv2
+import sys
+import weakref
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    # python < 3.8
+    shared_memory = None
+
+from airtest.utils.logger import get_logger
+from .cache import LRUCache
+from .error import NoModuleError
+from .frame import ImageFrame, as_frame
+from .keypoint_base import KeypointMatching
+from .keypoint_cache import KeypointCache
+
+LOGGING = get_logger(__name__)
+
+# the "service" entry is the match service of get_match_service(), replaced when the number of processes changes
+_SERVICE = {}
+_SERVICE_LOCK = threading.Lock()
+
+# in the worker processes: templates by shared memory name, and keypoints of the recent screens by shared memory name
+_WORKER_TEMPLATES = LRUCache(100)
+_WORKER_SCREEN_KEYPOINTS = KeypointCache(maxsize=8)
+
+
+class SharedImage(object):
+    """
+    An image copied into a shared memory block, the workers read it by name instead of unpickling it.
+
+    The block is released when the object is garbage collected or closed.
+    """
+
+    def __init__(self, image):
+        super(SharedImage, self).__init__()
+        if shared_memory is None:
+            raise NoModuleError("multiprocessing.shared_memory needs python 3.8+")
+        image = np.ascontiguousarray(image)
+        self.shape, self.dtype = image.shape, image.dtype.str
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        np.ndarray(image.shape, image.dtype, buffer=self._shm.buf)[...] = image
+        self.name = self._shm.name
+        self._finalizer = weakref.finalize(self, _release, self._shm)
+
+    @property
+    def ref(self):
+        """(name, shape, dtype), what is sent to the workers."""
+        return self.name, self.shape, self.dtype
+
+    def close(self):
+        self._finalizer()
+
+
+def _release(shm):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class MatchService(object):
+    """
+    Match templates on screens in a pool of worker processes, results in the generate_result() format.
+
+    Keypoint detection and matching hold the GIL in parts of keypoint_base, so threads driving several
+    devices wait for each other; processes do not. The template and the screen of a request are copied
+    once into shared memory, memoized on their frames, and only their names are sent to the workers.
+    Each worker keeps the templates it received, with their keypoints, by shared memory name.
+
+    The workers are started with the default multiprocessing start method: with "spawn" (Windows, macOS)
+    the main script is imported by each worker and must guard its code with if __name__ == "__main__".
+    """
+
+    def __init__(self, processes):
+        super(MatchService, self).__init__()
+        if shared_memory is None:
+            raise NoModuleError("multiprocessing.shared_memory needs python 3.8+")
+        self.processes = max(1, processes)
+        # set when a worker died, the pool then refuses all requests
+        self.broken = False
+        # workers started from now on share the tracker of this process, which unlinks the leftover blocks at exit
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker)
+
+    def submit(self, func, im_search, im_source, **kwargs):
+        """
+        Start matching im_search in im_source with the matching class func, e.g. SIFTMatching.
+
+        kwargs are passed to func, they must be picklable: the caches of this process are not used by the workers.
+
+        Returns:
+            a Future of the func(im_search, im_source, **kwargs).find_best_result() result
+        """
+        search = _shared(as_frame(im_search))
+        source = _shared(as_frame(im_source))
+        future = self._executor.submit(_match_in_worker, func, search.ref, source.ref, kwargs)
+        # 保持共享内存直到worker读取完毕
+        future.add_done_callback(lambda f, images=(search, source): None)
+        return future
+
+    def match(self, func, im_search, im_source, **kwargs):
+        """
+        Match in a worker and wait for the result, the aircv errors are raised here.
+
+        When the pool cannot run the request (shut down, or broken by a worker that died), match in this process.
+        """
+        try:
+            future = self.submit(func, im_search, im_source, **kwargs)
+        except RuntimeError as err:
+            # 进程池已关闭
+            return self._match_in_process(err, func, im_search, im_source, **kwargs)
+        try:
+            return future.result()
+        except BrokenProcessPool as err:
+            # worker异常退出后进程池不再可用, get_match_service()会替换它
+            self.broken = True
+            return self._match_in_process(err, func, im_search, im_source, **kwargs)
+
+    @staticmethod
+    def _match_in_process(err, func, im_search, im_source, **kwargs):
+        LOGGING.warning("match service unavailable, matching in process: %r" % err)
+        return func(im_search, im_source, **kwargs).find_best_result()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def get_match_service(processes):
+    """
+    Get the match service with processes workers, created on first use and replaced when processes changed
+    or its pool is broken.
+
+    A replaced service is not shut down, since other threads may still use it, as in utils.get_executor():
+    its workers exit once the last reference to it is dropped.
+    Returns None if shared memory is not available (python < 3.8), the caller then matches in process.
+    """
+    if shared_memory is None:
+        return None
+    with _SERVICE_LOCK:
+        service = _SERVICE.get("service")
+        if service is None or service.broken or service.processes != max(1, processes):
+            service = MatchService(processes)
+            _SERVICE["service"] = service
+        return service
+
+
+def _shared(frame):
+    return frame.derived("shared_image", SharedImage, frame.image)
+
+
+def _init_worker():
+    # 每个进程单线程运行OpenCV: 进程数已占满CPU, 且fork出的进程中OpenCV线程池可能死锁
+    cv2.setNumThreads(1)
+
+
+def _attach(ref):
+    name, shape, dtype = ref
+    shm = _open_untracked(name)
+    return shm, np.ndarray(shape, dtype, buffer=shm.buf)
+
+
+def _open_untracked(name):
+    """
+    Open the shared memory block created by the main process without registering it to the resource_tracker.
+
+    The main process unlinks its blocks. Before python 3.13 opening a block registers it too, which makes a
+    tracker of the worker warn about leaked blocks and unlink them again; unregistering it after opening would
+    remove the registration of the main process instead when both use the same tracker.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+
+    def register_others(name, rtype):
+        if rtype != "shared_memory":
+            register(name, rtype)
+
+    # worker进程是单线程的, 临时替换不影响其他调用
+    resource_tracker.register = register_others
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _read_template(ref):
+    shm, image = _attach(ref)
+    try:
+        return ImageFrame(image.copy())
+    finally:
+        del image
+        shm.close()
+
+
+def _match_in_worker(func, search_ref, source_ref, kwargs):
+    im_search = _WORKER_TEMPLATES.get_or_create(search_ref[0], lambda: _read_template(search_ref))
+    shm, image = _attach(source_ref)
+    try:
+        return _find_best_result(func, im_search, image, kwargs, image_key=source_ref[0])
+    finally:
+        del image
+        try:
+            shm.close()
+        except BufferError:
+            # 异常的traceback仍引用截图, 由垃圾回收关闭
+            pass
+
+
+def _find_best_result(func, im_search, image, kwargs, image_key=None):
+    # 截图不复制, 直接在共享内存上匹配
+    if isinstance(func, type) and issubclass(func, KeypointMatching):
+        kwargs = dict(kwargs, source_keypoint_cache=_WORKER_SCREEN_KEYPOINTS)
+    # 同一截图的共享内存只创建一次, 以其名称作为截图特征点缓存的key
+    return func(im_search, ImageFrame(image, cache_key=image_key), **kwargs).find_best_result()
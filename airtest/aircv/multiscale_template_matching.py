@@ -14,12 +14,15 @@ from __future__ import print_function
 
 import cv2
 import time
+import hashlib
+from collections import OrderedDict
 
 from airtest.utils.logger import get_logger
 from airtest.aircv.error import TemplateInputError
 from airtest import aircv
-from .utils import generate_result, check_source_larger_than_search, img_mat_rgb_2_gray, print_run_time
+from .utils import generate_result, check_source_larger_than_search, print_run_time, get_executor
 from .cal_confidence import cal_rgb_confidence, cal_ccoeff_confidence
+from .frame import as_frame
 
 LOGGING = get_logger(__name__)
 
@@ -28,16 +31,28 @@ class MultiScaleTemplateMatching(object):
     """多尺度模板匹配."""
 
     METHOD_NAME = "MSTemplate"
+    # multi_scale_search: 粗搜步长为step的倍数, 以及粗搜后细搜的缩放比个数
+    COARSE_FACTOR = 4
+    REFINE_PEAKS = 3
+    # 搜索超过TIME_OUT秒后, 接受第一个达到阈值的结果
+    TIME_OUT = 3.0
+    # 有scale_hints时, 先搜索上次最优缩放比前后HINT_RADIUS个步长
+    HINT_RADIUS = 2
 
-    def __init__(self, im_search, im_source, threshold=0.8, rgb=True, record_pos=None, resolution=(), scale_max=800, scale_step=0.005):
-        self.im_source = im_source
-        self.im_search = im_search
+    def __init__(self, im_search, im_source, threshold=0.8, rgb=True, record_pos=None, resolution=(), scale_max=800, scale_step=0.005,
+                 threads=1, scale_hints=None):
+        self.source_frame = as_frame(im_source)
+        self.im_source = self.source_frame.image
+        self.search_frame = as_frame(im_search)
+        self.im_search = self.search_frame.image
         self.threshold = threshold
         self.rgb = rgb
         self.record_pos = record_pos
         self.resolution = resolution
         self.scale_max = scale_max
         self.scale_step = scale_step
+        self.threads = threads
+        self.scale_hints = scale_hints
 
     def find_all_results(self):
         raise NotImplementedError
@@ -49,10 +64,10 @@ class MultiScaleTemplateMatching(object):
         check_source_larger_than_search(self.im_source, self.im_search)
 
         # 第二步：计算模板匹配的结果矩阵res
-        s_gray, i_gray = img_mat_rgb_2_gray(
-            self.im_search), img_mat_rgb_2_gray(self.im_source)
+        s_gray, i_gray = self.search_frame.gray, self.source_frame.gray
         confidence, max_loc, w, h, _ = self.multi_scale_search(
-            i_gray, s_gray, ratio_min=0.01, ratio_max=0.99, src_max=self.scale_max, step=self.scale_step, threshold=self.threshold)
+            i_gray, s_gray, ratio_min=0.01, ratio_max=0.99, src_max=self.scale_max, step=self.scale_step,
+            threshold=self.threshold, time_out=self.TIME_OUT)
 
         # 求取识别位置: 目标中心 + 目标区域:
         middle_point, rectangle = self._get_target_rectangle(max_loc, w, h)
@@ -95,20 +110,24 @@ class MultiScaleTemplateMatching(object):
         return middle_point, rectangle
 
     @staticmethod
-    def _resize_by_ratio(src, templ, ratio=1.0, templ_min=10, src_max=800):
-        """根据模板相对屏幕的长边 按比例缩放屏幕"""
-        # 截屏最大尺寸限制
-        sr = min(src_max/max(src.shape),1.0)
-        src = cv2.resize(src, (int(src.shape[1]*sr), int(src.shape[0]*sr)))
-        # 截图尺寸缩放
-        h, w = src.shape[0], src.shape[1]
+    def _resize_src(src, src_max=800):
+        """按src_max限制截屏尺寸, 与缩放比无关, 只需缩放一次"""
+        sr = min(src_max / max(src.shape), 1.0)
+        src = cv2.resize(src, (int(src.shape[1] * sr), int(src.shape[0] * sr)))
+        src[0, 0], src[0, 1] = 0, 255
+        return src, sr
+
+    @staticmethod
+    def _resize_templ(templ, src_shape, ratio=1.0):
+        """根据模板相对屏幕的长边 按比例缩放模板"""
+        h, w = src_shape[0], src_shape[1]
         th, tw = templ.shape[0], templ.shape[1]
         if th/h >= tw/w:
             tr = (h*ratio)/th
         else:
             tr = (w*ratio)/tw
         templ = cv2.resize(templ, (max(int(tw*tr), 1), max(int(th*tr), 1)))
-        return src, templ, tr, sr
+        return templ, tr
 
     @staticmethod
     def _org_size(max_loc, w, h, tr, sr):
@@ -117,39 +136,110 @@ class MultiScaleTemplateMatching(object):
         w, h = int((w/sr)), int((h/sr))
         return max_loc, w, h
 
-    def multi_scale_search(self, org_src, org_templ, templ_min=10, src_max=800, ratio_min=0.01, 
+    def multi_scale_search(self, org_src, org_templ, templ_min=10, src_max=800, ratio_min=0.01,
                             ratio_max=0.99, step=0.01, threshold=0.8, time_out=3.0):
-        """多尺度模板匹配"""
-        mmax_val = 0
-        max_info = None
-        r = ratio_min
+        """多尺度模板匹配, 有scale_hints时先搜索同一模板在同样大小的图像中上次的最优缩放比, 并记录本次的最优缩放比."""
+        args = (org_src, org_templ, templ_min, src_max, ratio_min, ratio_max, step, threshold, time_out)
+        if self.scale_hints is None:
+            return self._search_scales(*args)
+        key = "%s %dx%d %s %s" % (hashlib.md5(org_templ.tobytes()).hexdigest(), org_src.shape[1], org_src.shape[0], src_max, step)
+        ret = self._search_scales(*args, hint=self.scale_hints.get(key))
+        if ret[0] >= threshold:
+            self.scale_hints.put(key, ret[4])
+        return ret
+
+    def _search_scales(self, org_src, org_templ, templ_min, src_max, ratio_min, ratio_max, step, threshold, time_out,
+                       hint=None):
+        """
+        多尺度模板匹配.
+
+        有hint时先搜索缩放比hint附近, 找到confidence达到threshold的结果即返回.
+        先以COARSE_FACTOR倍的步长粗搜缩放比, 再在最好的REFINE_PEAKS个缩放比附近以折半步长细搜到step.
+        超过time_out秒后, 一旦找到confidence达到threshold的结果即返回, 并取消其余缩放比的匹配.
+        self.threads > 1 时多个缩放比在线程池中并行匹配, 但结果按缩放比的顺序处理, 与线程调度无关.
+        """
         t = time.time()
-        while r <= ratio_max:
-            src, templ, tr, sr = self._resize_by_ratio(
-                org_src.copy(), org_templ.copy(), r, src_max=src_max)
-            if min(templ.shape) > templ_min:
-                src[0,0] = templ[0,0] = 0
-                src[0,1] = templ[0,1] = 255
-                result = cv2.matchTemplate(src, templ, cv2.TM_CCOEFF_NORMED)
-                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                h, w = templ.shape
-                if mmax_val < max_val:
-                    mmax_val = max_val
-                    max_info = (r, max_val, max_loc, w, h, tr, sr)
-                # print((r, max_val, max_loc, w, h, tr, sr))
-                time_cost = time.time() - t
-                if time_cost>time_out and max_val >= threshold:
-                    omax_loc, ow, oh = self._org_size(max_loc, w, h, tr, sr)
-                    confidence = self._get_confidence_from_matrix(omax_loc, ow, oh)
-                    if confidence >= threshold:
-                        return confidence, omax_loc, ow, oh, r
-            r += step
-        if max_info is None:
+        src, sr = self._resize_src(org_src, src_max)
+        count = int((ratio_max - ratio_min) / step + 1e-6)
+        # 缩放比 ratio_min + i*step 的匹配结果: i -> (r, max_val, max_loc, w, h, tr, sr), 模板过小时为None
+        results = {}
+
+        def match(i):
+            r = ratio_min + i * step
+            templ, tr = self._resize_templ(org_templ, src.shape, r)
+            if min(templ.shape) <= templ_min:
+                return None
+            templ[0, 0], templ[0, 1] = 0, 255
+            result = cv2.matchTemplate(src, templ, cv2.TM_CCOEFF_NORMED)
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+            h, w = templ.shape
+            return r, max_val, max_loc, w, h, tr, sr
+
+        def search(indexes):
+            """按indexes的顺序产出尚未匹配过的缩放比的结果."""
+            indexes = [i for i in OrderedDict.fromkeys(indexes) if 0 <= i <= count and i not in results]
+            for i, ret in zip(indexes, self._map(match, indexes)):
+                results[i] = ret
+                yield i, ret
+
+        def verify(ret):
+            r, max_val, max_loc, w, h, tr, sr = ret
+            omax_loc, ow, oh = self._org_size(max_loc, w, h, tr, sr)
+            return self._get_confidence_from_matrix(omax_loc, ow, oh), omax_loc, ow, oh, r
+
+        def accept(ret):
+            """超时后第一个confidence达到threshold的结果, 返回后search生成器关闭, 其余缩放比的匹配被取消."""
+            if ret and ret[1] >= threshold and time.time() - t > time_out:
+                verified = verify(ret)
+                if verified[0] >= threshold:
+                    return verified
+            return None
+
+        if hint is not None:
+            i = int(round((hint - ratio_min) / step))
+            near = [ret for j, ret in search(range(i - self.HINT_RADIUS, i + self.HINT_RADIUS + 1)) if ret]
+            if near:
+                verified = verify(max(near, key=lambda ret: ret[1]))
+                if verified[0] >= threshold:
+                    return verified
+
+        coarse = max(1, min(self.COARSE_FACTOR, count // 4))
+        for i, ret in search(list(range(0, count + 1, coarse)) + [count]):
+            verified = accept(ret)
+            if verified:
+                return verified
+        # 在粗搜最好的几个缩放比附近细搜
+        peaks = sorted((ret[1], i) for i, ret in results.items() if ret)[-self.REFINE_PEAKS:]
+        for max_val, i in peaks:
+            delta = (coarse + 1) // 2
+            while delta >= 1:
+                for j, ret in search([i - delta, i + delta]):
+                    verified = accept(ret)
+                    if verified:
+                        return verified
+                i = max((j for j in (i - delta, i, i + delta) if results.get(j)), key=lambda j: results[j][1])
+                delta //= 2
+
+        found = [ret for ret in results.values() if ret]
+        if not found:
             return 0, (0, 0), 0, 0, 0
-        max_r, max_val, max_loc, w, h, tr, sr = max_info
-        omax_loc, ow, oh = self._org_size(max_loc, w, h, tr, sr)
-        confidence = self._get_confidence_from_matrix(omax_loc, ow, oh)
-        return confidence, omax_loc, ow, oh, max_r
+        return verify(max(found, key=lambda ret: ret[1]))
+
+    def _map(self, func, items):
+        """Yield func(item) for items in order, computed in the thread pool when self.threads > 1."""
+        if self.threads <= 1:
+            for item in items:
+                yield func(item)
+            return
+        executor = get_executor("multiscale", self.threads)
+        futures = [executor.submit(func, item) for item in items]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # 提前结束时取消尚未开始的匹配
+            for future in futures:
+                future.cancel()
 
 
 class MultiScaleTemplateMatchingPre(MultiScaleTemplateMatching):
@@ -167,16 +257,19 @@ class MultiScaleTemplateMatchingPre(MultiScaleTemplateMatching):
             if self.resolution[0]<self.im_search.shape[1] or self.resolution[1]<self.im_search.shape[0]:
                 raise TemplateInputError("error: resolution is too small.")
             # 第二步：计算模板匹配的结果矩阵res
+            i_gray = self.source_frame.gray
             if not self.record_pos is None:
                 area, self.resolution = self._get_area_scope(self.im_source, self.im_search, self.record_pos, self.resolution)
                 self.im_source = aircv.crop_image(self.im_source, area)
+                # 直接截取整帧的灰度图,不必对截取区域重新转换
+                i_gray = aircv.crop_image(i_gray, area)
                 check_source_larger_than_search(self.im_source, self.im_search)
             r_min, r_max = self._get_ratio_scope(
                 self.im_source, self.im_search, self.resolution)
-            s_gray, i_gray = img_mat_rgb_2_gray(self.im_search), img_mat_rgb_2_gray(self.im_source)
+            s_gray = self.search_frame.gray
             confidence, max_loc, w, h, _ = self.multi_scale_search(
                     i_gray, s_gray, ratio_min=r_min, ratio_max=r_max, step=self.scale_step, 
-                    threshold=self.threshold, time_out=1.0)
+                    threshold=self.threshold, time_out=self.TIME_OUT)
             if not self.record_pos is None:
                 max_loc = (max_loc[0] + area[0], max_loc[1] + area[1])
             
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Extract all matching positions from a cv2.matchTemplate result matrix at once."""
+
+import cv2
+import numpy as np
+
+# 3*3邻域内的最大值才被视为峰值
+_PEAK_KERNEL = np.ones((3, 3), np.uint8)
+
+
+def find_peaks(res, threshold, w, h, max_count=None):
+    """
+    Find all matching positions of a w*h template in the result matrix res.
+
+    The local maxima >= threshold are extracted in one pass, then non-maximum suppression keeps
+    only the best of the peaks closer than half a template (w/2, h/2) to each other.
+
+    Args:
+        res: result matrix of cv2.matchTemplate, TM_CCOEFF_NORMED
+        threshold: minimum value of a peak
+        w, h: size of the template
+        max_count: max number of peaks returned, None for all
+
+    Returns:
+        [((x, y), value), ...] sorted by value in descending order, (x, y) is the left top point of the target
+    """
+    peaks_mask = (res >= threshold) & (res >= cv2.dilate(res, _PEAK_KERNEL))
+    ys, xs = np.nonzero(peaks_mask)
+    if xs.size == 0:
+        return []
+    values = res[ys, xs]
+    order = np.argsort(-values, kind="stable")
+    xs, ys, values = xs[order], ys[order], values[order]
+    keep = nms(xs, ys, w / 2, h / 2, max_count)
+    return [((int(xs[i]), int(ys[i])), float(values[i])) for i in keep]
+
+
+def nms(xs, ys, half_w, half_h, max_count=None):
+    """
+    Greedy non-maximum suppression of same-size boxes, sorted by score in descending order.
+
+    A box suppresses every lower one whose left top point is within (half_w, half_h) of its own.
+    Each round removes all the boxes suppressed by the kept one, so the cost is O(kept * boxes).
+
+    Returns:
+        indexes of the kept boxes
+    """
+    keep = []
+    candidates = np.arange(len(xs))
+    while candidates.size:
+        i = candidates[0]
+        keep.append(i)
+        if max_count and len(keep) >= max_count:
+            break
+        close = (np.abs(xs[candidates] - xs[i]) <= half_w) & (np.abs(ys[candidates] - ys[i]) <= half_h)
+        candidates = candidates[~close]
+    return keep
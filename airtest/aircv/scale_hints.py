@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Winning scale ratios of the multi-scale template matching, remembered across calls and runs."""
+
+import os
+import json
+import time
+import threading
+
+from airtest.utils.logger import get_logger
+from .cache import LRUCache
+
+LOGGING = get_logger(__name__)
+
+
+class ScaleHints(object):
+    """
+    Scale ratio found by MultiScaleTemplateMatching, by template and searched image size.
+
+    path: json file where the hints are loaded from and saved to, None to keep them in memory only.
+          The file is loaded on first use after path is set, and saved when hints changed, at most every
+          SAVE_INTERVAL seconds; flush() saves the last changes, airtest.core.cv calls it at exit for SCALE_HINTS.
+    """
+
+    SAVE_INTERVAL = 5.0
+
+    def __init__(self, path=None, maxsize=1000):
+        super(ScaleHints, self).__init__()
+        self.path = path
+        self._cache = LRUCache(maxsize)
+        self._loaded_path = None
+        self._last_save = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key):
+        self._load()
+        return self._cache.get(key)
+
+    def put(self, key, ratio):
+        self._load()
+        with self._lock:
+            # 比较时不计入get()的命中统计
+            if self._cache.peek(key) == ratio:
+                return
+            self._cache.put(key, ratio)
+            self._dirty = True
+            if time.time() - self._last_save >= self.SAVE_INTERVAL:
+                self.flush()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+    def flush(self):
+        """Save the hints to path if they changed."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            hints = dict(self._cache._data)
+            self._dirty = False
+            self._last_save = time.time()
+            tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+            try:
+                dirname = os.path.dirname(self.path)
+                if dirname and not os.path.isdir(dirname):
+                    os.makedirs(dirname)
+                with open(tmp_path, "w") as f:
+                    json.dump(hints, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except (IOError, OSError) as err:
+                LOGGING.warning("failed to save scale hints to %s: %s" % (self.path, err))
+
+    def _load(self):
+        with self._lock:
+            if not self.path or self.path == self._loaded_path:
+                return
+            self._loaded_path = self.path
+            if not os.path.isfile(self.path):
+                return
+            try:
+                with open(self.path) as f:
+                    hints = json.load(f)
+            except (IOError, OSError, ValueError) as err:
+                LOGGING.warning("failed to load scale hints from %s: %s" % (self.path, err))
+                return
+            for key, ratio in hints.items():
+                self._cache.put(key, ratio)
@@ -10,6 +10,8 @@ import time
 import numpy as np
 import subprocess
 
+from airtest.aircv.utils import resize_by_max
+
 
 RECORDER_ORI = {
     "PORTRAIT": 1,
@@ -17,16 +19,6 @@ RECORDER_ORI = {
     "ROTATION": 0,  # The screen is centered in a square
 }
 
-def resize_by_max(img, max_size=800):
-    if img is None:
-        return np.zeros((max_size, max_size, 3), dtype=np.uint8)
-    max_len = max(img.shape[0], img.shape[1])
-    if max_len > max_size:
-        scale = max_size / max_len
-        img = cv2.resize(img, (int(img.shape[1] * scale), int(img.shape[0] * scale)))
-    return img
-
-
 def get_max_size(max_size):
     try:
         max_size = int(max_size)
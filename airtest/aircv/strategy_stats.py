@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Hit rate and latency of each matching method by template, to try the fastest methods first."""
+
+import os
+import json
+import time
+import threading
+
+from airtest.utils.logger import get_logger
+from .cache import LRUCache
+
+LOGGING = get_logger(__name__)
+
+
+class StrategyStats(object):
+    """
+    Tries, hits and total time of each matching method, by template.
+
+    Only the matches where a method found the template are recorded: the methods tried before it
+    missed, the last one hit. order() sorts the methods with enough tries by expected time to hit.
+
+    path: json file where the statistics are loaded from and saved to, None to keep them in memory only.
+          The file is loaded on first use after path is set, and saved at most every SAVE_INTERVAL
+          seconds; flush() saves the last changes, airtest.core.cv calls it at exit for STRATEGY_STATS.
+    """
+
+    # 方法尝试次数达到MIN_TRIES后才参与排序
+    MIN_TRIES = 3
+    SAVE_INTERVAL = 5.0
+
+    def __init__(self, path=None, maxsize=1000):
+        super(StrategyStats, self).__init__()
+        self.path = path
+        self._cache = LRUCache(maxsize)
+        self._loaded_path = None
+        self._last_save = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, key):
+        """Return {method: [tries, hits, total seconds]} of the template key, None if nothing was recorded."""
+        self._load()
+        return self._cache.get(key)
+
+    def record(self, key, tries):
+        """
+        Record one match of the template key.
+
+        tries: [(method, hit, seconds), ...] the methods tried, in order
+        """
+        self._load()
+        with self._lock:
+            stats = self._cache.get(key) or {}
+            for method, hit, cost in tries:
+                method_stats = stats.setdefault(method, [0, 0, 0.0])
+                method_stats[0] += 1
+                method_stats[1] += 1 if hit else 0
+                method_stats[2] = round(method_stats[2] + cost, 4)
+            self._cache.put(key, stats)
+            self._dirty = True
+            if time.time() - self._last_save >= self.SAVE_INTERVAL:
+                self.flush()
+
+    def order(self, key, methods):
+        """
+        Reorder methods for the template key.
+
+        The methods with at least MIN_TRIES tries are sorted by expected time to hit (mean time / hit rate),
+        in the places they have in methods, the other ones keep their places.
+        """
+        stats = self.get(key) or {}
+        known = [method for method in methods if method in stats and stats[method][0] >= self.MIN_TRIES]
+        if len(known) < 2:
+            return list(methods)
+        ranked = iter(sorted(known, key=lambda method: self.expected_time(stats[method])))
+        return [next(ranked) if method in known else method for method in methods]
+
+    @staticmethod
+    def expected_time(method_stats):
+        """Mean time divided by the hit rate, smoothed so that a method that never hit is not infinite."""
+        tries, hits, total = method_stats
+        return (total / tries) / ((hits + 0.1) / (tries + 0.2))
+
+    def items(self):
+        self._load()
+        with self._lock:
+            return list(self._cache._data.items())
+
+    def clear(self):
+        self._cache.clear()
+
+    def flush(self):
+        """Save the statistics to path if they changed."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            stats = dict(self._cache._data)
+            self._dirty = False
+            self._last_save = time.time()
+            tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+            try:
+                dirname = os.path.dirname(self.path)
+                if dirname and not os.path.isdir(dirname):
+                    os.makedirs(dirname)
+                with open(tmp_path, "w") as f:
+                    json.dump(stats, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except (IOError, OSError) as err:
+                LOGGING.warning("failed to save strategy stats to %s: %s" % (self.path, err))
+
+    def _load(self):
+        with self._lock:
+            if not self.path or self.path == self._loaded_path:
+                return
+            self._loaded_path = self.path
+            if not os.path.isfile(self.path):
+                return
+            try:
+                with open(self.path) as f:
+                    stats = json.load(f)
+            except (IOError, OSError, ValueError) as err:
+                LOGGING.warning("failed to load strategy stats from %s: %s" % (self.path, err))
+                return
+            for key, value in stats.items():
+                self._cache.put(key, value)
+
+
+def format_stats(stats, methods):
+    """Text table of the learned order of methods for each template of the StrategyStats stats."""
+    lines = []
+    for key, template_stats in sorted(stats.items()):
+        lines.append("%s: %s" % (key, " > ".join(stats.order(key, methods))))
+        for method in methods:
+            if method not in template_stats:
+                continue
+            tries, hits, total = template_stats[method]
+            lines.append("    %-8s hits %4d/%-4d %8.1f ms" % (method, hits, tries, total / tries * 1000))
+    return "\n".join(lines)
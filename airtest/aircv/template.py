@@ -12,7 +12,9 @@
 import cv2
 from airtest.utils.logger import get_logger
 from .utils import generate_result, check_source_larger_than_search, img_mat_rgb_2_gray
-from .cal_confidence import cal_rgb_confidence
+from .cal_confidence import cal_rgb_confidence, ConfidenceEngine
+from .frame import ImageFrame
+from .peaks import find_peaks
 LOGGING = get_logger(__name__)
 
 
@@ -42,28 +44,29 @@ def find_all_template(im_source, im_search, threshold=0.8, rgb=False, max_count=
     # 第二步：计算模板匹配的结果矩阵res
     res = _get_template_result_matrix(im_source, im_search)
 
-    # 第三步：依次获取匹配结果
-    result = []
+    # 第三步：一次取出所有峰值,并做非极大值抑制(相距不到半个模板的只保留最优值)
+    # 有颜色校验时只按三通道可信度筛选, 灰度匹配值低于阈值的峰值也可能通过校验
     h, w = im_search.shape[:2]
+    peaks = find_peaks(res, -1 if rgb else threshold, w, h, max_count=max_count)
 
-    while True:
-        # 本次循环中,取出当前结果矩阵中的最优值
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
-        # 求取可信度:
-        confidence = _get_confidence_from_matrix(im_source, im_search, max_loc, max_val, w, h, rgb)
+    # 第四步：按峰值从高到低求取可信度, 有颜色校验时逐个进行三通道校验, 遇到未通过的峰值或取够max_count个结果即停止
+    if rgb:
+        engine = ConfidenceEngine(ImageFrame(im_search).clipped_hsv, hsv=True)
+        img_hsv = ImageFrame(im_source).clipped_hsv
 
-        if confidence < threshold or len(result) > max_count:
+    result = []
+    for max_loc, max_val in peaks:
+        if rgb:
+            confidence = engine.hsv_confidence(img_hsv[max_loc[1]:max_loc[1] + h, max_loc[0]:max_loc[0] + w], threshold)
+        else:
+            confidence = max_val
+        if confidence < threshold:
             break
-
         # 求取识别位置: 目标中心 + 目标区域:
         middle_point, rectangle = _get_target_rectangle(max_loc, w, h)
-        one_good_match = generate_result(middle_point, rectangle, confidence)
-
-        result.append(one_good_match)
-
-        # 屏蔽已经取出的最优结果,进入下轮循环继续寻找:
-        # cv2.floodFill(res, None, max_loc, (-1000,), max(max_val, 0), flags=cv2.FLOODFILL_FIXED_RANGE)
-        cv2.rectangle(res, (int(max_loc[0] - w / 2), int(max_loc[1] - h / 2)), (int(max_loc[0] + w / 2), int(max_loc[1] + h / 2)), (0, 0, 0), -1)
+        result.append(generate_result(middle_point, rectangle, confidence))
+        if len(result) >= max_count:
+            break
 
     return result if result else None
 
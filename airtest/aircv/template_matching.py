@@ -6,14 +6,17 @@
 对用户提供的调节参数:
     1. threshod: 筛选阈值，默认为0.8
     2. rgb: 彩色三通道,进行彩色权识别.
+    3. pyramid_level: 金字塔层数，大于0时先在缩小的图上粗匹配，再在原图的候选区域内精确匹配
 """
 
 import cv2
 import time
 
 from airtest.utils.logger import get_logger
-from .utils import generate_result, check_source_larger_than_search, img_mat_rgb_2_gray, print_run_time
-from .cal_confidence import cal_rgb_confidence
+from .utils import generate_result, check_source_larger_than_search, print_run_time
+from .cal_confidence import cal_hsv_confidence, ConfidenceEngine
+from .frame import as_frame
+from .peaks import find_peaks
 
 LOGGING = get_logger(__name__)
 
@@ -23,45 +26,58 @@ class TemplateMatching(object):
 
     METHOD_NAME = "Template"
     MAX_RESULT_COUNT = 10
-
-    def __init__(self, im_search, im_source, threshold=0.8, rgb=True):
+    # 金字塔模式: 粗匹配后保留的候选数
+    PYRAMID_TOP_K = 5
+    # 金字塔模式: 精确匹配时候选位置四周扩展的像素数(以粗匹配层的像素计)
+    PYRAMID_MARGIN = 2
+    # 金字塔模式: 粗匹配层模板的最小边长,模板过小时自动减少层数
+    PYRAMID_MIN_TEMPLATE = 16
+
+    def __init__(self, im_search, im_source, threshold=0.8, rgb=True, pyramid_level=0):
         super(TemplateMatching, self).__init__()
-        self.im_source = im_source
-        self.im_search = im_search
+        # 输入可以是ImageFrame(如Template缓存中的模板、ScreenFrame截图),以复用其灰度图等中间结果
+        self.source_frame = as_frame(im_source)
+        self.im_source = self.source_frame.image
+        self.search_frame = as_frame(im_search)
+        self.im_search = self.search_frame.image
         self.threshold = threshold
         self.rgb = rgb
+        self.pyramid_level = pyramid_level
 
     @print_run_time
-    def find_all_results(self):
+    def find_all_results(self, max_count=None):
         """基于模板匹配查找多个目标区域的方法."""
+        max_count = max_count or self.MAX_RESULT_COUNT
         # 第一步：校验图像输入
         check_source_larger_than_search(self.im_source, self.im_search)
 
         # 第二步：计算模板匹配的结果矩阵res
         res = self._get_template_result_matrix()
 
-        # 第三步：依次获取匹配结果
-        result = []
+        # 第三步：一次取出所有峰值,并做非极大值抑制(相距不到半个模板的只保留最优值)
+        # 有颜色校验时只按三通道可信度筛选, 灰度匹配值低于阈值的峰值也可能通过校验
         h, w = self.im_search.shape[:2]
+        peaks = find_peaks(res, -1 if self.rgb else self.threshold, w, h, max_count=max_count)
 
-        while True:
-            # 本次循环中,取出当前结果矩阵中的最优值
-            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
-            # 求取可信度:
-            confidence = self._get_confidence_from_matrix(max_loc, max_val, w, h)
+        # 第四步：按峰值从高到低求取可信度, 有颜色校验时逐个进行三通道校验, 遇到未通过的峰值或取够max_count个结果即停止
+        if self.rgb:
+            engine = ConfidenceEngine(self.search_frame.clipped_hsv, hsv=True)
+            img_hsv = self.source_frame.clipped_hsv
 
-            if confidence < self.threshold or len(result) > self.MAX_RESULT_COUNT:
+        result = []
+        for max_loc, max_val in peaks:
+            if self.rgb:
+                img_crop = img_hsv[max_loc[1]:max_loc[1] + h, max_loc[0]:max_loc[0] + w]
+                confidence = engine.hsv_confidence(img_crop, self.threshold)
+            else:
+                confidence = max_val
+            if confidence < self.threshold:
                 break
-
             # 求取识别位置: 目标中心 + 目标区域:
             middle_point, rectangle = self._get_target_rectangle(max_loc, w, h)
-            one_good_match = generate_result(middle_point, rectangle, confidence)
-
-            result.append(one_good_match)
-
-            # 屏蔽已经取出的最优结果,进入下轮循环继续寻找:
-            # cv2.floodFill(res, None, max_loc, (-1000,), max(max_val, 0), flags=cv2.FLOODFILL_FIXED_RANGE)
-            cv2.rectangle(res, (int(max_loc[0] - w / 2), int(max_loc[1] - h / 2)), (int(max_loc[0] + w / 2), int(max_loc[1] + h / 2)), (0, 0, 0), -1)
+            result.append(generate_result(middle_point, rectangle, confidence))
+            if len(result) >= max_count:
+                break
 
         return result if result else None
 
@@ -71,10 +87,13 @@ class TemplateMatching(object):
         """函数功能：找到最优结果."""
         # 第一步：校验图像输入
         check_source_larger_than_search(self.im_source, self.im_search)
-        # 第二步：计算模板匹配的结果矩阵res
-        res = self._get_template_result_matrix()
-        # 第三步：依次获取匹配结果
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
+        # 第二步：计算模板匹配的结果矩阵res, 并取出最优值
+        level = self._get_pyramid_level()
+        if level > 0:
+            max_val, max_loc = self._pyramid_search(level)
+        else:
+            res = self._get_template_result_matrix()
+            min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
         h, w = self.im_search.shape[:2]
         # 求取可信度:
         confidence = self._get_confidence_from_matrix(max_loc, max_val, w, h)
@@ -90,8 +109,9 @@ class TemplateMatching(object):
         # 求取可信度:
         if self.rgb:
             # 如果有颜色校验,对目标区域进行BGR三通道校验:
-            img_crop = self.im_source[max_loc[1]:max_loc[1] + h, max_loc[0]: max_loc[0] + w]
-            confidence = cal_rgb_confidence(img_crop, self.im_search)
+            # 截图的HSV图每帧只计算一次,直接截取目标区域:
+            img_crop = self.source_frame.clipped_hsv[max_loc[1]:max_loc[1] + h, max_loc[0]: max_loc[0] + w]
+            confidence = cal_hsv_confidence(img_crop, self.search_frame.clipped_hsv)
         else:
             confidence = max_val
 
@@ -100,9 +120,50 @@ class TemplateMatching(object):
     def _get_template_result_matrix(self):
         """求取模板匹配的结果矩阵."""
         # 灰度识别: cv2.matchTemplate( )只能处理灰度图片参数
-        s_gray, i_gray = img_mat_rgb_2_gray(self.im_search), img_mat_rgb_2_gray(self.im_source)
+        s_gray, i_gray = self.search_frame.gray, self.source_frame.gray
         return cv2.matchTemplate(i_gray, s_gray, cv2.TM_CCOEFF_NORMED)
 
+    def _get_pyramid_level(self):
+        """模板过小时减少金字塔层数,保证粗匹配层的模板仍有足够的细节."""
+        h, w = self.im_search.shape[:2]
+        level = self.pyramid_level or 0
+        while level > 0 and min(h, w) >> level < self.PYRAMID_MIN_TEMPLATE:
+            level -= 1
+        return level
+
+    def _pyramid_search(self, level):
+        """金字塔模式: 在缩小的图上粗匹配出前k个候选位置, 再只在原图中候选位置附近精确匹配.
+
+        返回值与全图匹配一致: 原图上TM_CCOEFF_NORMED的最大值及其左上角坐标.
+        """
+        s_gray, i_gray = self.search_frame.gray, self.source_frame.gray
+        h, w = s_gray.shape[:2]
+        h_src, w_src = i_gray.shape[:2]
+        s_coarse = self.search_frame.pyramid(level)
+        ch, cw = s_coarse.shape[:2]
+        coarse = cv2.matchTemplate(self.source_frame.pyramid(level), s_coarse, cv2.TM_CCOEFF_NORMED)
+
+        scale = 2 ** level
+        margin = self.PYRAMID_MARGIN * scale
+        best_val, best_loc = -1.0, (0, 0)
+        for _ in range(self.PYRAMID_TOP_K):
+            _, coarse_val, _, coarse_loc = cv2.minMaxLoc(coarse)
+            if coarse_val <= -1:
+                break
+            # 屏蔽已取出的候选,下一轮取次优的候选位置
+            cv2.rectangle(coarse, (coarse_loc[0] - cw // 2, coarse_loc[1] - ch // 2),
+                          (coarse_loc[0] + cw // 2, coarse_loc[1] + ch // 2), (-1,), -1)
+            # 在原图中候选位置附近的区域内精确匹配:
+            x_min, y_min = max(coarse_loc[0] * scale - margin, 0), max(coarse_loc[1] * scale - margin, 0)
+            x_max, y_max = min(coarse_loc[0] * scale + w + margin, w_src), min(coarse_loc[1] * scale + h + margin, h_src)
+            if x_max - x_min < w or y_max - y_min < h:
+                continue
+            res = cv2.matchTemplate(i_gray[y_min:y_max, x_min:x_max], s_gray, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+            if max_val > best_val:
+                best_val, best_loc = max_val, (max_loc[0] + x_min, max_loc[1] + y_min)
+        return best_val, best_loc
+
     def _get_target_rectangle(self, left_top_pos, w, h):
         """根据左上角点和宽高求出目标区域."""
         x_min, y_min = left_top_pos
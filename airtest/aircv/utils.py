@@ -3,7 +3,10 @@
 
 import cv2
 import time
+import struct
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
 from airtest.utils.logger import get_logger
@@ -11,6 +14,10 @@ from .error import TemplateInputError
 
 LOGGING = get_logger(__name__)
 
+# thread pools by name, and their sizes
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
 
 def print_run_time(func):
 
@@ -26,6 +33,23 @@ def print_run_time(func):
     return wrapper
 
 
+def get_executor(name, max_workers):
+    """
+    Get the thread pool of name, created on first use and replaced when max_workers changed.
+
+    OpenCV releases the GIL in matchTemplate/resize/detect, so the matching code can run in parallel threads.
+    A replaced pool is not shut down, since other threads may still submit to it: its idle workers exit once
+    the last reference to it is dropped.
+    """
+    max_workers = max(1, max_workers)
+    with _EXECUTORS_LOCK:
+        executor, size = _EXECUTORS.get(name, (None, 0))
+        if executor is None or size != max_workers:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            _EXECUTORS[name] = (executor, max_workers)
+        return executor
+
+
 def generate_result(middle_point, pypts, confi):
     """Format the result: 定义图像识别结果格式."""
     ret = dict(result=middle_point,
@@ -66,12 +90,90 @@ def img_2_string(img):
     return png.tostring()
 
 
-def string_2_img(pngstr):
+def string_2_img(pngstr, max_size=None):
+    """
+    Decode a jpg/png image, scaled down so that its longer side is at most max_size if given.
+
+    Jpg images are decoded at 1/2, 1/4 or 1/8 size by libjpeg when possible (IMREAD_REDUCED_COLOR_*),
+    which is much faster than decoding the full image and resizing it.
+    """
     nparr = np.frombuffer(pngstr, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if not max_size:
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    size = image_size(nparr)
+    flag = cv2.IMREAD_COLOR
+    if size and nparr[0] == 0xFF:
+        # 只缩小到不小于max_size的尺寸,剩下的再resize
+        for factor, reduced in REDUCED_DECODE_FLAGS:
+            if max(size) >= max_size * factor:
+                flag = reduced
+                break
+    img = cv2.imdecode(nparr, flag)
+    if img is None:
+        return None
+    return resize_by_max(img, max_size, size)
+
+
+def resize_by_max(img, max_size=800, size=None):
+    """
+    Scale img down so that its longer side is at most max_size, a black max_size square if img is None.
+
+    size: (width, height) of the full image when img was decoded at a reduced size, default is the size of img
+    """
+    if img is None:
+        return np.zeros((max_size, max_size, 3), dtype=np.uint8)
+    w, h = size or (img.shape[1], img.shape[0])
+    if max(w, h) > max_size:
+        scale = float(max_size) / max(w, h)
+        img = cv2.resize(img, (int(w * scale), int(h * scale)))
     return img
 
 
+# libjpeg scaled decoding: (scale factor, imdecode flag), largest first
+REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+_JPG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_size(data):
+    """
+    Read the (width, height) of a jpg/png image from its headers, without decoding it.
+
+    Returns:
+        (width, height), None if it is neither jpg nor png or the headers are truncated
+    """
+    buf = np.frombuffer(data, np.uint8)
+    n = len(buf)
+    if n >= 24 and bytes(buf[:8]) == b"\x89PNG\r\n\x1a\n":
+        # IHDR是第一个块
+        return struct.unpack(">II", bytes(buf[16:24]))
+    if n < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 <= n:
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:
+            # 填充字节
+            i += 1
+            continue
+        if marker in _JPG_SOF_MARKERS:
+            h = (int(buf[i + 5]) << 8) | int(buf[i + 6])
+            w = (int(buf[i + 7]) << 8) | int(buf[i + 8])
+            return w, h
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            # 没有长度的标记
+            i += 2
+            continue
+        i += 2 + ((int(buf[i + 2]) << 8) | int(buf[i + 3]))
+    return None
+
+
 def pil_2_cv2(pil_image):
     open_cv_image = np.array(pil_image)
     # Convert RGB to BGR (method-1):
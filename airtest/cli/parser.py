@@ -7,7 +7,7 @@ from airtest.cli.runner import setup_by_args
 
 def get_parser():
     ap = argparse.ArgumentParser()
-    subparsers = ap.add_subparsers(dest="action", help="version/run/info/report")
+    subparsers = ap.add_subparsers(dest="action", help="version/run/info/report/strategy")
     # subparser version
     subparsers.add_parser("version", help="show version and exit")
     # subparser run
@@ -19,6 +19,10 @@ def get_parser():
     # subparser report
     ap_report = subparsers.add_parser("report", help="generate report of script")
     report_parser(ap_report)
+    # subparser strategy
+    ap_strategy = subparsers.add_parser("strategy", help="show the CVSTRATEGY order learned for each template")
+    ap_strategy.add_argument("stats_file", help="json file of ST.STRATEGY_STATS_FILE")
+    ap_strategy.add_argument("--cvstrategy", nargs="+", help="methods to order, default to ST.CVSTRATEGY")
     return ap
 
 
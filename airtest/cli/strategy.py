@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+from airtest.aircv.strategy_stats import StrategyStats, format_stats
+from airtest.core.settings import Settings as ST
+
+
+def show_strategy(stats_file, methods=None):
+    """Text of the CVSTRATEGY order learned for each template in stats_file, with the statistics of each method."""
+    stats = StrategyStats(stats_file)
+    if not stats.items():
+        return "no statistics in %s" % stats_file
+    return format_stats(stats, methods or ST.CVSTRATEGY)
@@ -14,7 +14,7 @@ from six import PY3, text_type, binary_type
 from six.moves import reduce
 
 from airtest.core.android.constant import (DEFAULT_ADB_PATH, IP_PATTERN,
-                                           SDK_VERISON_ANDROID7)
+                                           SDK_VERISON_ANDROID5, SDK_VERISON_ANDROID7)
 from airtest.core.error import (AdbError, AdbShellError, AirtestError,
                                 DeviceConnectionError)
 from airtest.utils.compat import decode_path, raisefrom, proc_communicate_timeout, SUBPROCESS_FLAG
@@ -831,6 +831,24 @@ class ADB(object):
             raw = self.cmd('shell screencap -p', ensure_unicode=False)
         return raw.replace(self.line_breaker, b"\n")
 
+    def raw_snapshot(self):
+        """
+        Take the screenshot of the device display as the raw framebuffer, without the PNG encoding
+
+        The data is a header (width, height, pixel format, and the colorspace since Android 9)
+        followed by the pixels, see `airtest.core.android.cap_methods.adbcap.raw_to_img()`
+
+        Returns:
+            command output (stdout)
+
+        """
+        screencap = 'screencap -d {0}'.format(self.display_id) if self.display_id else 'screencap'
+        if self.sdk_version >= SDK_VERISON_ANDROID5:
+            # exec-out does not translate the line breaks
+            return self.cmd('exec-out ' + screencap, ensure_unicode=False)
+        raw = self.cmd('shell ' + screencap, ensure_unicode=False)
+        return raw.replace(self.line_breaker, b"\n")
+
     # PEP 3113 -- Removal of Tuple Parameter Unpacking
     # https://www.python.org/dev/peps/pep-3113/
     def touch(self, tuple_xy):
@@ -27,6 +27,7 @@ from airtest.core.android.touch_methods.maxtouch import Maxtouch  # noqa
 
 from airtest.core.settings import Settings as ST
 from airtest.aircv.screen_recorder import ScreenRecorder, resize_by_max, get_max_size
+from airtest.aircv.frame import EncodedFrame
 from airtest.utils.snippet import get_absolute_coordinate
 from airtest.utils.logger import get_logger
 
@@ -490,6 +491,16 @@ class Android(Device):
             aircv.imwrite(filename, screen, quality, max_size=max_size)
         return screen
 
+    def snapshot_frame(self):
+        """
+        Take a screenshot of the display as an EncodedFrame, see `Device.snapshot_frame()`
+
+        Returns:
+            EncodedFrame, None if the screenshot method does not provide encoded frames
+
+        """
+        return self.screen_proxy.snapshot_frame()
+
     def shell(self, *args, **kwargs):
         """
         Return `adb shell` interpreter
@@ -966,10 +977,10 @@ class Android(Device):
 
         max_size = get_max_size(max_size)
         def get_frame():
-            data = self.screen_proxy.get_frame_from_stream()
-            frame = aircv.utils.string_2_img(data)
-
-            if max_size is not None:
+            # 需要缩小时按缩小后的尺寸解码
+            frame = EncodedFrame(self.screen_proxy.get_frame_from_stream()).resized(max_size)
+            if frame is None and max_size is not None:
+                # 解码失败时录制黑色画面
                 frame = resize_by_max(frame, max_size)
             return frame
 
@@ -1,17 +1,118 @@
 # -*- coding: utf-8 -*-
+import struct
 import warnings
+import numpy as np
 from airtest.core.android.cap_methods.base_cap import BaseCap
 from airtest.core.android.constant import SDK_VERISON_ANDROID7
+from airtest.core.error import ScreenError
+from airtest.utils.logger import get_logger
 from airtest import aircv
 
+LOGGING = get_logger(__name__)
+
+# android PixelFormat of the framebuffer: (bytes per pixel, cv2 conversion to BGR)
+RAW_PIXEL_FORMATS = {
+    1: (4, aircv.cv2.COLOR_RGBA2BGR),  # RGBA_8888
+    2: (4, aircv.cv2.COLOR_RGBA2BGR),  # RGBX_8888
+    3: (3, aircv.cv2.COLOR_RGB2BGR),  # RGB_888
+    4: (2, aircv.cv2.COLOR_BGR5652BGR),  # RGB_565
+    5: (4, aircv.cv2.COLOR_BGRA2BGR),  # BGRA_8888
+}
+
+
+def raw_to_img(raw, max_size=None):
+    """
+    Convert the output of `screencap` without `-p` into a cv2 image, without any image codec
+
+    The data starts with the width, height and pixel format as little endian uint32, and the colorspace
+    since Android 9, followed by the pixels row by row.
+
+    将screencap输出的原始帧数据转换成cv2图像，不经过PNG编解码
+
+    Args:
+        raw: screencap output
+        max_size: if the longer side of the screen exceeds it, the image is scaled down to it
+
+    Returns:
+        numpy.ndarray, BGR image
+
+    """
+    if len(raw) < 12:
+        raise ScreenError("raw screencap data too short: %d bytes" % len(raw))
+    w, h, fmt = struct.unpack_from("<3I", raw)
+    if fmt not in RAW_PIXEL_FORMATS:
+        raise ScreenError("unsupported raw screencap pixel format: %s" % fmt)
+    bpp, conversion = RAW_PIXEL_FORMATS[fmt]
+    if not w or not h:
+        raise ScreenError("raw screencap of an empty screen: %dx%d" % (w, h))
+    # 12 bytes header, 16 bytes with the colorspace since Android 9
+    for header in (16, 12):
+        body = len(raw) - header
+        if body >= w * h * bpp and body % h == 0:
+            break
+    else:
+        raise ScreenError("raw screencap data size %d does not match %dx%d format %s" % (len(raw), w, h, fmt))
+    stride = body // h
+    pixels = np.frombuffer(raw, dtype=np.uint8, count=body, offset=header).reshape(h, stride)
+    pixels = pixels[:, :w * bpp].reshape(h, w, bpp)
+    if not max_size or max(w, h) <= max_size:
+        return aircv.cv2.cvtColor(pixels, conversion)
+    if bpp == 2:
+        # RGB_565 的两个字节不是独立的通道，先转换再缩放
+        return _shrink(aircv.cv2.cvtColor(pixels, conversion), max_size)
+    # 先缩放再转换颜色，转换的像素更少
+    return aircv.cv2.cvtColor(_shrink(pixels, max_size), conversion)
+
+
+def _shrink(img, max_size):
+    """Scale an image down so that its longer side is max_size."""
+    h, w = img.shape[:2]
+    ratio = float(max_size) / max(w, h)
+    size = (max(1, int(round(w * ratio))), max(1, int(round(h * ratio))))
+    # INTER_AREA is fast for integer factors only: shrink by the largest one, and the rest (less than 2x) linearly
+    factor = int(1 / ratio)
+    if factor >= 2:
+        img = aircv.cv2.resize(img, (w // factor, h // factor), interpolation=aircv.cv2.INTER_AREA)
+    if (img.shape[1], img.shape[0]) != size:
+        img = aircv.cv2.resize(img, size, interpolation=aircv.cv2.INTER_LINEAR)
+    return img
+
 
 class AdbCap(BaseCap):
+    # raw: take the screenshots from the raw framebuffer (`screencap` without `-p`), skipping the PNG encoding
+    # on the device and the decoding here, at the cost of transferring more data
+    # raw_max_size: in raw mode, scale the screenshots down so that their longer side is at most this size
+    raw = False
+    raw_max_size = None
+
     def get_frame_from_stream(self):
         warnings.warn("Currently using ADB screenshots, the efficiency may be very low.")
         return self.adb.snapshot()
 
+    def snapshot_frame(self):
+        # PNG截图不能按缩小的尺寸解码，且旧版本需要旋转，使用snapshot()
+        return None
+
+    def get_raw_frame(self):
+        """
+        Take a screenshot from the raw framebuffer
+
+        Returns: numpy.ndarray
+
+        """
+        return raw_to_img(self.adb.raw_snapshot(), max_size=self.raw_max_size)
+
     def snapshot(self, ensure_orientation=True):
-        screen = super(AdbCap, self).snapshot()
+        screen = None
+        if self.raw:
+            try:
+                screen = self.get_raw_frame()
+            except ScreenError as e:
+                # 个别设备的原始帧格式无法解析，退回到PNG截图
+                LOGGING.warning("raw screencap failed, fall back to png: %s" % e)
+                self.raw = False
+        if screen is None:
+            screen = super(AdbCap, self).snapshot()
         if ensure_orientation and self.adb.sdk_version <= SDK_VERISON_ANDROID7:
             screen = aircv.rotate(screen, self.adb.display_info["orientation"] * 90, clockwise=False)
         return screen
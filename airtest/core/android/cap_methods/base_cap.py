@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 import traceback
+import threading
 from airtest import aircv
+from airtest.aircv.frame import EncodedFrame
+from airtest.core.android.cap_methods.prefetcher import FramePrefetcher
+from airtest.core.error import ScreenError
+from airtest.utils.safesocket import BufferPool
 
 
 class BaseCap(object):
@@ -9,8 +14,19 @@ class BaseCap(object):
     所有屏幕截图方法的基类
     """
 
+    # seconds to wait for the first prefetched frame
+    PREFETCH_TIMEOUT = 10
+    # seconds to wait for a frame newer than the requested one: the device sends no frame while the screen
+    # does not change, the latest frame is then returned
+    NEWER_FRAME_TIMEOUT = 0.5
+    prefetch = False
+    _prefetcher = None
+
     def __init__(self, adb, *args, **kwargs):
         self.adb = adb
+        # buffers receiving the frames of the stream, given back by `snapshot()` once a frame is decoded
+        self.frame_pool = BufferPool()
+        self._prefetch_lock = threading.Lock()
 
     def get_frame_from_stream(self):
         """
@@ -27,23 +43,149 @@ class BaseCap(object):
         # 获得单张屏幕截图
         return self.get_frame_from_stream()
 
+    def _get_frame_data(self):
+        """
+        Get a frame for `snapshot()`, the data may be a memoryview of a `frame_pool` buffer, released once decoded
+
+        Returns: frame_data
+
+        """
+        return self.get_frame_from_stream()
+
+    def _frame_bytes(self, data):
+        """
+        Copy the data of `_get_frame_data()` into bytes for `get_frame_from_stream()`, giving its buffer back
+
+        Returns: bytes, None if data is None
+
+        """
+        if data is None or isinstance(data, bytes):
+            return data
+        frame = bytes(data)
+        if not self.prefetch:
+            # 预取的帧可能被多次读取，不能复用
+            self.frame_pool.release(data)
+        return frame
+
     def teardown_stream(self):
         pass
 
-    def snapshot(self, ensure_orientation=True, *args, **kwargs):
+    def get_prefetch_stream(self):
+        """
+        Get the stream read continuously by the prefetcher, an iterator of jpg data
+
+        获取预取线程持续读取的画面流
+
+        Returns: iterator
+
+        """
+        raise NotImplementedError
+
+    def start_prefetch(self):
+        """
+        Read the screen stream continuously in a background thread, `get_frame_from_stream()` and `snapshot()`
+        then return the latest frame without waiting for the device
+
+        在后台线程中持续读取画面流，截图时直接返回最新的一帧
+
+        Returns:
+            None
+
+        """
+        self.teardown_stream()
+        self.prefetch = True
+
+    def stop_prefetch(self):
+        """
+        Stop the background capture and go back to requesting each frame
+
+        Returns:
+            None
+
+        """
+        self.prefetch = False
+        self.teardown_stream()
+
+    def get_latest_frame(self, newer_than=None, timeout=None):
+        """
+        Get the latest prefetched frame, the background capture is started if it is not running
+
+        Args:
+            newer_than: wait for a frame whose seq is greater than it, e.g. the seq of the last frame used
+            timeout: max seconds to wait for the newer frame, default is NEWER_FRAME_TIMEOUT;
+                the first frame is waited for up to PREFETCH_TIMEOUT
+
+        Returns:
+            LatestFrame(data, timestamp, seq), the latest one if no newer frame came before timeout
+
+        """
+        with self._prefetch_lock:
+            prefetcher = self._prefetcher
+            if prefetcher is None or not prefetcher.alive:
+                # 首次调用，或者画面流断开后重新建立
+                self.teardown_stream()
+                prefetcher = self._prefetcher = FramePrefetcher(
+                    self.get_prefetch_stream(), name="%s_prefetcher" % self.__class__.__name__.lower())
+        frame = prefetcher.latest(timeout=self.PREFETCH_TIMEOUT)
+        if frame is None:
+            raise ScreenError("%s prefetcher got no frame" % self.__class__.__name__)
+        if newer_than is not None and frame.seq <= newer_than:
+            # 画面不变时设备不发送新帧, 超时后返回最新的一帧
+            frame = prefetcher.latest(newer_than, self.NEWER_FRAME_TIMEOUT if timeout is None else timeout)
+        return frame
+
+    def _stop_prefetcher(self):
+        """
+        Tell the prefetcher to stop, the caller closes the stream and then joins it
+
+        Returns:
+            the prefetcher, None if there is none
+
+        """
+        prefetcher, self._prefetcher = self._prefetcher, None
+        if prefetcher is not None:
+            prefetcher.stop()
+        return prefetcher
+
+    def snapshot_frame(self):
+        """
+        Take a screenshot as an EncodedFrame, decoded when needed
+
+        获取一张屏幕截图，按需解码
+
+        Returns: EncodedFrame, None if there is no frame
+
+        """
+        data = self.get_frame_from_stream()
+        if data is None:
+            return None
+        return EncodedFrame(data)
+
+    def snapshot(self, ensure_orientation=True, newer_than=None, *args, **kwargs):
         """
         Take a screenshot and convert it into a cv2 image object
 
         获取一张屏幕截图，并转化成cv2的图像对象
 
+        Args:
+            ensure_orientation: True or False whether to keep the orientation same as display
+            newer_than: in prefetch mode, wait for a frame whose seq is greater than it
+
         Returns: numpy.ndarray
 
         """
-        screen = self.get_frame_from_stream()
+        if self.prefetch:
+            data = self.get_latest_frame(newer_than).data
+        else:
+            data = self._get_frame_data()
         try:
-            screen = aircv.utils.string_2_img(screen)
+            screen = aircv.utils.string_2_img(data)
         except Exception:
             # may be black/locked screen or other reason, print exc for debugging
             traceback.print_exc()
             return None
+        finally:
+            if not self.prefetch:
+                # 帧数据只在这里使用，解码后缓冲区可以复用; 预取的帧可能被多次读取，不能复用
+                self.frame_pool.release(data)
         return screen
@@ -96,7 +96,8 @@ class Javacap(Yosemite, BaseCap):
                 stopping = yield None
             else:
                 frame_size = struct.unpack("<I", header)[0]
-                frame_data = s.recv(frame_size)
+                # received into a reusable buffer, see BaseCap.frame_pool
+                frame_data = s.recv_exact(frame_size, pool=self.frame_pool)
                 stopping = yield frame_data
 
         LOGGING.debug("javacap stream ends")
@@ -107,13 +108,29 @@ class Javacap(Yosemite, BaseCap):
         Get frame from the stream
 
         Returns:
-            frame
+            frame, jpg data (bytes)
 
         """
+        return self._frame_bytes(self._get_frame_data())
+
+    def _get_frame_data(self):
+        if self.prefetch:
+            return self.get_latest_frame().data
         if self.frame_gen is None:
             self.frame_gen = self.get_frames()
         return self.frame_gen.send(None)
 
+    def get_prefetch_stream(self):
+        """
+        Get the stream of javacap, the frames are still requested one by one but back to back by the prefetcher
+
+        Returns:
+            frame generator
+
+        """
+        self.frame_gen = self.get_frames()
+        return self.frame_gen
+
     def _cleanup(self):
         """
         Cleanup javacap process and stream reader
@@ -133,7 +150,11 @@ class Javacap(Yosemite, BaseCap):
             None
 
         """
+        prefetcher = self._stop_prefetcher()
         self._cleanup()
+        if prefetcher is not None:
+            # the closed socket interrupts the prefetcher reading frame_gen
+            prefetcher.join(self.PREFETCH_TIMEOUT)
 
         if not self.frame_gen:
             return
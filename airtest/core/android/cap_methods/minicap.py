@@ -278,10 +278,8 @@ class Minicap(BaseCap):
                 stopping = yield None
             else:
                 frame_size = struct.unpack("<I", header)[0]
-                if self.RECVTIMEOUT is not None:
-                    frame_data = s.recv_with_timeout(frame_size, self.RECVTIMEOUT)
-                else:
-                    frame_data = s.recv(frame_size)
+                # received into a reusable buffer, see BaseCap.frame_pool
+                frame_data = s.recv_exact(frame_size, pool=self.frame_pool, timeout=self.RECVTIMEOUT)
                 stopping = yield frame_data
 
         LOGGING.debug("minicap stream ends")
@@ -332,29 +330,53 @@ class Minicap(BaseCap):
         self._stream_rotation = int(display_info["rotation"])
         return proc, nbsp, localport
 
-    @retry_when_socket_error
     def get_frame_from_stream(self):
         """
         Get one frame from minicap stream
 
         Returns:
-            frame
+            frame, jpg data (bytes)
 
         """
+        return self._frame_bytes(self._get_frame_data())
+
+    @retry_when_socket_error
+    def _get_frame_data(self):
         if self._update_rotation_event.is_set():
             LOGGING.debug("do update rotation")
             self.teardown_stream()
             self._update_rotation_event.clear()
+        if self.prefetch:
+            return self.get_latest_frame().data
         if self.frame_gen is None:
             self.frame_gen = self.get_stream()
         return six.next(self.frame_gen)
 
-    def snapshot(self, ensure_orientation=True, projection=None):
+    def get_prefetch_stream(self):
+        """
+        Get the stream of minicap in non-lazy mode, the server sends every new frame without waiting for requests
+
+        Returns:
+            frame generator
+
+        """
+        self.frame_gen = self.get_stream(lazy=False)
+        return self.frame_gen
+
+    def get_latest_frame(self, newer_than=None, timeout=None):
+        if self._update_rotation_event.is_set():
+            LOGGING.debug("do update rotation")
+            self.teardown_stream()
+            self._update_rotation_event.clear()
+        return super(Minicap, self).get_latest_frame(newer_than, timeout)
+
+    def snapshot(self, ensure_orientation=True, projection=None, newer_than=None):
         """
 
         Args:
             ensure_orientation: True or False whether to keep the orientation same as display
             projection: the size of the desired projection, (width, height)
+            newer_than: in prefetch mode, wait for a frame whose seq is greater than it
 
         Returns:
 
@@ -370,7 +392,7 @@ class Minicap(BaseCap):
                 return None
             return screen
         else:
-            return super(Minicap, self).snapshot()
+            return super(Minicap, self).snapshot(newer_than=newer_than)
 
     def update_rotation(self, rotation):
         """
@@ -439,8 +461,12 @@ class Minicap(BaseCap):
             None
 
         """
+        prefetcher = self._stop_prefetcher()
         # clean up established connections
         self._cleanup()
+        if prefetcher is not None:
+            # the closed socket interrupts the prefetcher reading frame_gen
+            prefetcher.join(self.PREFETCH_TIMEOUT)
         if not self.frame_gen:
             return
         try:
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import time
+import itertools
+import threading
+from collections import namedtuple
+from airtest.utils.logger import get_logger
+
+LOGGING = get_logger(__name__)
+
+# data: jpg data, timestamp: time when it was received, seq: increasing number of the frame in this process,
+# it keeps increasing when the stream is rebuilt, e.g. after a rotation
+LatestFrame = namedtuple("LatestFrame", ["data", "timestamp", "seq"])
+
+_SEQ = itertools.count(1)
+
+
+class FramePrefetcher(object):
+    """
+    Read the frames of a screen stream in a background thread, only the latest one is kept
+
+    在后台线程中持续读取画面流，只保留最新的一帧，截图时不必等待设备
+
+    Args:
+        frames: iterator of the stream, yielding jpg data, or None when no frame came in time
+        name: name of the thread
+    """
+
+    def __init__(self, frames, name="frame_prefetcher"):
+        self._frames = frames
+        self._latest = None
+        self._error = None
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def latest(self, newer_than=None, timeout=None):
+        """
+        Get the latest frame
+
+        Args:
+            newer_than: wait for a frame whose seq is greater than it, default is None which returns the latest frame
+                immediately, waiting only for the first one
+            timeout: max seconds to wait, None to wait as long as the stream is read
+
+        Returns:
+            LatestFrame, the latest one even if it is not newer than `newer_than` at timeout,
+            None if no frame was received
+
+        Raises:
+            the error which stopped the stream, if no frame can be returned
+
+        """
+        newer_than = newer_than or 0
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (self._latest and self._latest.seq > newer_than) or not self._thread.is_alive(),
+                timeout)
+            if self._latest is None and self._error is not None:
+                raise self._error
+            return self._latest
+
+    def stop(self):
+        """
+        Stop reading after the current frame, the stream has to be closed to interrupt a blocking read
+
+        Returns:
+            None
+
+        """
+        self._stopping = True
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            for data in self._frames:
+                if self._stopping:
+                    break
+                if data is None:
+                    # no frame in time, e.g. the screen did not change, the latest frame is still valid
+                    continue
+                with self._cond:
+                    self._latest = LatestFrame(data, time.time(), next(_SEQ))
+                    self._cond.notify_all()
+        except Exception as err:
+            if not self._stopping:
+                LOGGING.error("frame prefetcher stopped: %r" % err)
+                self._error = err
+        finally:
+            with self._cond:
+                self._cond.notify_all()
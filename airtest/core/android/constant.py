@@ -15,6 +15,8 @@ DEFAULT_ADB_PATH = {
     "Linux-armv7l": os.path.join(STATICPATH, "adb", "linux_arm", "adb"),
 }
 DEFAULT_ADB_SERVER = ('127.0.0.1', 5037)
+# Android 5 SDK version, adb exec-out is available
+SDK_VERISON_ANDROID5 = 21
 SDK_VERISON_ANDROID7 = 24
 # Android 10 SDK version
 SDK_VERISON_ANDROID10 = 29
@@ -5,7 +5,7 @@ This module contains the Airtest Core APIs.
 import os
 import time
 
-from airtest.core.cv import Template, loop_find, try_log_screen
+from airtest.core.cv import Template, loop_find, loop_find_any, try_log_screen
 from airtest.core.error import TargetNotFoundError
 from airtest.core.settings import Settings as ST
 from airtest.utils.compat import script_log_dir
@@ -646,11 +646,91 @@ def exists(v):
         return pos
 
 
+@logwrap
+def wait_any(v_list, timeout=None, interval=0.5, intervalfunc=None):
+    """
+    Wait to match any of the Templates on the device screen
+
+    Each attempt takes only one screenshot, all the templates are matched against it in parallel.
+
+    :param v_list: list of Template instances, in the order of priority
+    :param timeout: time interval to wait for the match, default is None which is ``ST.FIND_TIMEOUT``
+    :param interval: time interval in seconds to attempt to find a match
+    :param intervalfunc: called after each unsuccessful attempt to find the corresponding match
+    :raise TargetNotFoundError: raised if none of the targets is found after the time limit expired
+    :return: (index, pos), the index in ``v_list`` of the first matched target and its coordinates
+    :platforms: Android, Windows, iOS
+    :Example:
+
+        >>> index, pos = wait_any([Template(r"tpl_login.png"), Template(r"tpl_home.png")], timeout=30)
+        >>> if index == 0:
+        >>>     touch(pos)
+
+    """
+    timeout = timeout or ST.FIND_TIMEOUT
+    positions = loop_find_any(v_list, timeout=timeout, interval=interval, intervalfunc=intervalfunc)
+    return next((index, pos) for index, pos in enumerate(positions) if pos)
+
+
+@logwrap
+def find_any(v_list):
+    """
+    Check whether any of the given targets exists on device screen
+
+    Replaces ``if exists(A): ... elif exists(B): ...``, the targets are matched against the same screenshot.
+
+    :param v_list: list of targets to be checked, in the order of priority
+    :return: False if none of the targets is found, otherwise (index, pos),
+             the index in ``v_list`` of the first found target and its coordinates
+    :platforms: Android, Windows, iOS
+    :Example:
+
+        >>> ret = find_any([Template(r"tpl_ok.png"), Template(r"tpl_cancel.png")])
+        >>> if ret:
+        >>>     index, pos = ret
+        >>>     touch(pos)
+
+    """
+    try:
+        positions = loop_find_any(v_list, timeout=ST.FIND_TIMEOUT_TMP)
+    except TargetNotFoundError:
+        return False
+    else:
+        return next((index, pos) for index, pos in enumerate(positions) if pos)
+
+
+@logwrap
+def exists_many(v_list):
+    """
+    Check which of the given targets exist on device screen
+
+    All the targets are matched against the same screenshot.
+
+    :param v_list: list of targets to be checked
+    :return: list of the same length as ``v_list``, False for each target not found, otherwise its coordinates
+    :platforms: Android, Windows, iOS
+    :Example:
+
+        >>> ok_pos, cancel_pos = exists_many([Template(r"tpl_ok.png"), Template(r"tpl_cancel.png")])
+        >>> if ok_pos and cancel_pos:
+        >>>     touch(cancel_pos)
+
+    """
+    try:
+        positions = loop_find_any(v_list, timeout=ST.FIND_TIMEOUT_TMP, find_all=True)
+    except TargetNotFoundError:
+        return [False] * len(v_list)
+    else:
+        return [pos or False for pos in positions]
+
+
 @logwrap
 def find_all(v):
     """
     Find all occurrences of the target on the device screen and return their coordinates
 
+    At most ``ST.FIND_ALL_MAX_COUNT`` results are returned, default is 10.
+
     :param v: target to find
     :return: list of results, [{'result': (x, y),
                                 'rectangle': ( (left_top, left_bottom, right_bottom, right_top) ),
@@ -6,8 +6,11 @@
 import os
 import sys
 import time
+import atexit
 import types
+import threading
 from six import PY3
+from collections import deque, namedtuple
 from copy import deepcopy
 
 from airtest import aircv
@@ -16,6 +19,14 @@ from airtest.core.helper import G, logwrap
 from airtest.core.settings import Settings as ST  # noqa
 from airtest.core.error import TargetNotFoundError, InvalidMatchingMethodError
 from airtest.utils.transform import TargetPos
+from airtest.aircv.cache import LRUCache
+from airtest.aircv.scale_hints import ScaleHints
+from airtest.aircv.keypoint_cache import KeypointCache
+from airtest.aircv.strategy_stats import StrategyStats
+from airtest.aircv.keypoint_base import KeypointMatching
+from airtest.aircv.utils import get_executor
+from airtest.aircv.match_service import get_match_service
+from airtest.aircv.frame import ImageFrame, ScreenFrame, EncodedFrame, as_frame, changed_area
 
 from airtest.aircv.template_matching import TemplateMatching
 from airtest.aircv.multiscale_template_matching import MultiScaleTemplateMatching,MultiScaleTemplateMatchingPre
@@ -35,6 +46,31 @@ MATCHING_METHODS = {
     "brief": BRIEFMatching,
 }
 
+# process-wide cache of PreparedTemplate, keyed by (filepath, mtime, record resolution, screen resolution, resize method)
+TEMPLATE_CACHE = LRUCache(ST.TEMPLATE_CACHE_SIZE)
+
+# scale ratios found by "mstpl"/"gmstpl", saved to ST.SCALE_HINTS_FILE if set
+SCALE_HINTS = ScaleHints()
+atexit.register(SCALE_HINTS.flush)
+
+# keypoints and descriptors of the templates for the keypoint methods, saved to ST.KEYPOINT_CACHE_DIR if set
+KEYPOINT_CACHE = KeypointCache()
+# keypoints and descriptors of the last screen frames and areas of them, by frame id and area,
+# shared by the templates matched on the same frame
+SCREEN_KEYPOINT_CACHE = KeypointCache(maxsize=ST.SCREEN_KEYPOINT_CACHE_SIZE)
+
+# hit rate and time of the CVSTRATEGY methods by template filepath for ST.ADAPTIVE_CVSTRATEGY,
+# saved to ST.STRATEGY_STATS_FILE if set
+STRATEGY_STATS = StrategyStats()
+atexit.register(STRATEGY_STATS.flush)
+
+# process-wide MatchHistory of the templates, keyed by (filepath, record resolution) as TEMPLATE_CACHE,
+# so that new Template objects of the same template share it
+MATCH_HISTORY = LRUCache(200)
+# searches in the last matched area of ST.ROI_TRACKING: "hits" found the target there, "fallbacks" searched the full screen
+ROI_STATS = {"hits": 0, "fallbacks": 0}
+_ROI_STATS_LOCK = threading.Lock()
+
 
 @logwrap
 def loop_find(query, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, intervalfunc=None):
@@ -58,6 +94,7 @@ def loop_find(query, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, inte
     """
     G.LOGGING.info("Try finding: %s", query)
     start_time = time.time()
+    last_frame = None
     while True:
         screen = G.DEVICE.snapshot(filename=None, quality=ST.SNAPSHOT_QUALITY)
 
@@ -66,10 +103,16 @@ def loop_find(query, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, inte
         else:
             if threshold:
                 query.threshold = threshold
-            match_pos = query.match_in(screen)
-            if match_pos:
-                try_log_screen(screen)
-                return match_pos
+            # all matching methods share the gray/hsv/keypoints computed on this frame
+            frame = ScreenFrame(screen)
+            changed, dirty_area = _diff_last_frame(last_frame, frame)
+            if changed:
+                match_pos = query.match_in(frame, dirty_area=dirty_area)
+                if match_pos:
+                    try_log_screen(screen)
+                    return match_pos
+                # 只与实际匹配过的画面比较, 缓慢的变化累积起来也会触发匹配
+                last_frame = frame
 
         if intervalfunc is not None:
             intervalfunc()
@@ -82,13 +125,116 @@ def loop_find(query, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, inte
             time.sleep(interval)
 
 
+@logwrap
+def loop_find_any(queries, timeout=ST.FIND_TIMEOUT, threshold=None, interval=0.5, intervalfunc=None, find_all=False):
+    """
+    Search for several image templates in the screen until any of them is found or timeout
+
+    Each attempt takes one screenshot and matches all the templates against it in parallel.
+
+    Args:
+        queries: list of image templates to be found in screenshot, in the order of priority
+        timeout: time interval how long to look for the image templates
+        threshold: default is None
+        interval: sleep interval before next attempt to find the image templates
+        intervalfunc: function that is executed after unsuccessful attempt to find the image templates
+        find_all: if False, the templates after the first one found are not matched
+
+    Raises:
+        TargetNotFoundError: when none of the image templates is found in screenshot
+
+    Returns:
+        list of the positions where the image templates have been found, in the order of queries,
+        None for the templates not found (or not matched)
+
+    """
+    G.LOGGING.info("Try finding any of: %s", queries)
+    start_time = time.time()
+    last_frame = None
+    while True:
+        screen = G.DEVICE.snapshot(filename=None, quality=ST.SNAPSHOT_QUALITY)
+
+        if screen is None:
+            G.LOGGING.warning("Screen is None, may be locked")
+        else:
+            if threshold:
+                for query in queries:
+                    query.threshold = threshold
+            frame = ScreenFrame(screen)
+            changed, dirty_area = _diff_last_frame(last_frame, frame)
+            if changed:
+                match_results = _cv_match_any(queries, frame, find_all=find_all, dirty_area=dirty_area)
+                if any(match_results):
+                    try_log_screen(screen)
+                    return [TargetPos().getXY(ret, query.target_pos) if ret else None
+                            for query, ret in zip(queries, match_results)]
+                last_frame = frame
+
+        if intervalfunc is not None:
+            intervalfunc()
+
+        # 超时则raise，未超时则进行下次循环:
+        if (time.time() - start_time) > timeout:
+            try_log_screen(screen)
+            raise TargetNotFoundError('Pictures %s not found in screen' % queries)
+        else:
+            time.sleep(interval)
+
+
+@logwrap
+def _cv_match_any(queries, screen, find_all=False, dirty_area=None):
+    """
+    Match several templates against the same screen, logged as one entry for the report
+
+    Args:
+        queries: list of image templates, in the order of priority
+        screen: screenshot, ScreenFrame or ndarray
+        find_all: if False, stop at the first template found in the order of queries
+        dirty_area: see Template._match_screen
+
+    Returns:
+        list of the match results, None for the templates not found (or not matched)
+
+    """
+    screen = as_frame(screen, ScreenFrame)
+    results = [None] * len(queries)
+    futures = [get_executor("match", ST.MATCH_THREADS).submit(query._match_screen, screen, dirty_area) for query in queries]
+    try:
+        # results are collected in the order of priority, not in the order of completion
+        for index, future in enumerate(futures):
+            results[index] = future.result()
+            if results[index] and not find_all:
+                break
+    finally:
+        for future in futures:
+            future.cancel()
+    return results
+
+
+def _diff_last_frame(last_frame, frame):
+    """
+    Compare frame with last_frame, the last frame matched where all the templates were missed.
+
+    Returns:
+        (changed, dirty_area): changed is False if the screen did not change, then there is no need to match again.
+        dirty_area is the changed area (xmin, ymin, xmax, ymax), None to search the full screen.
+    """
+    if last_frame is None or not ST.FRAME_DIFF_THRESHOLD:
+        return True, None
+    dirty_area = changed_area(last_frame, frame, ST.FRAME_DIFF_THRESHOLD)
+    if dirty_area is None:
+        G.LOGGING.debug("Screen unchanged since the last attempt, skip matching")
+        return False, None
+    return True, dirty_area
+
+
 @logwrap
 def try_log_screen(screen=None, quality=None, max_size=None):
     """
     Save screenshot to file
 
     Args:
-        screen: screenshot to be saved
+        screen: screenshot to be saved, ndarray or EncodedFrame
         quality: The image quality, default is ST.SNAPSHOT_QUALITY
         max_size: the maximum size of the picture, e.g 1200
 
@@ -103,12 +249,17 @@ def try_log_screen(screen=None, quality=None, max_size=None):
     if not max_size:
         max_size = ST.IMAGE_MAXSIZE
     if screen is None:
-        screen = G.DEVICE.snapshot(quality=quality)
+        # 只保存缩小的截图时不需要完整解码
+        screen = G.DEVICE.snapshot_frame() or G.DEVICE.snapshot(quality=quality)
+    if isinstance(screen, EncodedFrame):
+        resolution, screen = screen.size, screen.resized(max_size)
+    elif screen is not None:
+        resolution = aircv.get_resolution(screen)
     filename = "%(time)d.jpg" % {'time': time.time() * 1000}
     filepath = os.path.join(ST.LOG_DIR, filename)
     if screen is not None:
         aircv.imwrite(filepath, screen, quality, max_size=max_size)
-        return {"screen": filename, "resolution": aircv.get_resolution(screen)}
+        return {"screen": filename, "resolution": resolution}
     return None
 
 
@@ -122,9 +273,11 @@ class Template(object):
     rgb: 识别结果是否使用rgb三通道进行校验.
     scale_max: 多尺度模板匹配最大范围.
     scale_step: 多尺度模板匹配搜索步长.
+    keypoint_matcher: 特征点匹配方式, "bf"或"flann", 默认为ST.KEYPOINT_MATCHER.
     """
 
-    def __init__(self, filename, threshold=None, target_pos=TargetPos.MID, record_pos=None, resolution=(), rgb=False, scale_max=800, scale_step=0.005):
+    def __init__(self, filename, threshold=None, target_pos=TargetPos.MID, record_pos=None, resolution=(), rgb=False, scale_max=800, scale_step=0.005,
+                 keypoint_matcher=None):
         self.filename = filename
         self._filepath = None
         self.threshold = threshold or ST.THRESHOLD
@@ -134,6 +287,7 @@ class Template(object):
         self.rgb = rgb
         self.scale_max = scale_max
         self.scale_step = scale_step
+        self.keypoint_matcher = keypoint_matcher
 
     @property
     def filepath(self):
@@ -150,8 +304,8 @@ class Template(object):
         filepath = self.filepath if PY3 else self.filepath.encode(sys.getfilesystemencoding())
         return "Template(%s)" % filepath
 
-    def match_in(self, screen):
-        match_result = self._cv_match(screen)
+    def match_in(self, screen, dirty_area=None):
+        match_result = self._cv_match(as_frame(screen, ScreenFrame), dirty_area)
         G.LOGGING.debug("match result: %s", match_result)
         if not match_result:
             return None
@@ -159,36 +313,187 @@ class Template(object):
         return focus_pos
 
     def match_all_in(self, screen):
-        image = self._imread()
-        image = self._resize_image(image, screen, ST.RESIZE_METHOD)
+        screen = as_frame(screen, ScreenFrame)
+        image = self._get_prepared_template(screen).resized
         return self._find_all_template(image, screen)
 
     @logwrap
-    def _cv_match(self, screen):
+    def _cv_match(self, screen, dirty_area=None):
+        return self._match_screen(screen, dirty_area)
+
+    def _match_screen(self, screen, dirty_area=None):
+        """
+        Try the methods of ST.CVSTRATEGY in order on the screen frame, without logging.
+
+        dirty_area: (xmin, ymin, xmax, ymax) changed since a screen where the template was missed, only
+                    the positions overlapping it are searched, except by mstpl/gmstpl. None for the full screen.
+        """
         # in case image file not exist in current directory:
-        ori_image = self._imread()
-        image = self._resize_image(ori_image, screen, ST.RESIZE_METHOD)
-        ret = None
-        for method in ST.CVSTRATEGY:
-            # get function definition and execute:
-            func = MATCHING_METHODS.get(method, None)
-            if func is None:
-                raise InvalidMatchingMethodError("Undefined method in CVSTRATEGY: '%s', try 'kaze'/'brisk'/'akaze'/'orb'/'surf'/'sift'/'brief' instead." % method)
-            else:
-                if method in ["mstpl", "gmstpl"]:
-                    ret = self._try_match(func, ori_image, screen, threshold=self.threshold, rgb=self.rgb, record_pos=self.record_pos,
-                                            resolution=self.resolution, scale_max=self.scale_max, scale_step=self.scale_step)
-                else:
-                    ret = self._try_match(func, image, screen, threshold=self.threshold, rgb=self.rgb)
+        prepared = self._get_prepared_template(screen)
+        image = prepared.resized
+        history = self._get_match_history() if ST.ROI_TRACKING else None
+        # with dirty_area, the last matched area was already searched on the previous screen
+        if history is not None and dirty_area is None:
+            ret = self._match_in_last_area(history, prepared, screen)
             if ret:
-                break
+                return ret
+        search_area = None
+        if dirty_area is not None:
+            h, w = image.shape[:2]
+            search_area = (dirty_area[0] - w, dirty_area[1] - h, dirty_area[2] + w, dirty_area[3] + h)
+        methods = self._get_cvstrategy()
+        if ST.CVSTRATEGY_RACE and len(methods) > 1:
+            method, ret, tries = self._race_methods(methods, prepared, screen, search_area)
+        else:
+            ret, tries = None, []
+            for method in methods:
+                start = time.time()
+                ret = self._match_with_method(method, prepared, screen, search_area)
+                tries.append((method, bool(ret), time.time() - start))
+                if ret:
+                    break
+        if ret and history is not None:
+            history.add(method, ret["rectangle"], aircv.get_resolution(screen))
+        if ret and ST.ADAPTIVE_CVSTRATEGY:
+            STRATEGY_STATS.record(os.path.abspath(self.filepath), tries)
+        return ret
+
+    def _get_cvstrategy(self):
+        """ST.CVSTRATEGY, reordered for this template by STRATEGY_STATS if ST.ADAPTIVE_CVSTRATEGY."""
+        if not ST.ADAPTIVE_CVSTRATEGY:
+            return list(ST.CVSTRATEGY)
+        STRATEGY_STATS.path = ST.STRATEGY_STATS_FILE
+        methods = STRATEGY_STATS.order(os.path.abspath(self.filepath), ST.CVSTRATEGY)
+        if methods != list(ST.CVSTRATEGY):
+            G.LOGGING.debug("%s adaptive CVSTRATEGY: %s", self, methods)
+        return methods
+
+    def _match_with_method(self, method, prepared, screen, search_area=None):
+        """Match with one method of ST.CVSTRATEGY, in search_area (xmin, ymin, xmax, ymax) if not None."""
+        # get function definition and execute:
+        func = self._get_matching_method(method)
+        ori_image, image = prepared.image, prepared.resized
+        if method in ["mstpl", "gmstpl"]:
+            SCALE_HINTS.path = ST.SCALE_HINTS_FILE
+            return self._try_match(func, ori_image, screen, threshold=self.threshold, rgb=self.rgb, record_pos=self.record_pos,
+                                   resolution=self.resolution, scale_max=self.scale_max, scale_step=self.scale_step,
+                                   threads=ST.MULTISCALE_THREADS, scale_hints=SCALE_HINTS)
+        elif search_area is not None:
+            return self._find_result_in_area(func, image, screen, search_area)
+        elif method == "tpl" and ST.TEMPLATE_PYRAMID_LEVEL:
+            return self._try_match(func, image, screen, threshold=self.threshold, rgb=self.rgb,
+                                   pyramid_level=ST.TEMPLATE_PYRAMID_LEVEL)
+        else:
+            return self._try_match(func, image, screen, threshold=self.threshold, rgb=self.rgb,
+                                   **self._matching_kwargs(func))
+
+    def _race_methods(self, methods, prepared, screen, search_area=None):
+        """
+        Run all the methods at the same time, for ST.CVSTRATEGY_RACE.
+
+        The result is the same as trying them in order: the first method in methods that finds the target
+        wins as soon as the methods before it missed, the methods not started yet are cancelled and the ones
+        still running are ignored. The winner and the time of each finished method are added to the result,
+        e.g. {..., "method": "sift", "timings": {"tpl": 0.05, "mstpl": 0.4, "sift": 0.3}}.
+
+        Returns:
+            (method, result, tries), result is None if no method finds the target, tries are the
+            (method, hit, seconds) of the methods up to the winner
+        """
+        for method in methods:
+            self._get_matching_method(method)
+        timings = {}
+
+        def run(method):
+            start = time.time()
+            try:
+                return self._match_with_method(method, prepared, screen, search_area)
+            finally:
+                timings[method] = round(time.time() - start, 4)
+
+        executor = get_executor("cvstrategy", len(methods))
+        futures = [executor.submit(run, method) for method in methods]
+        winner, ret = None, None
+        try:
+            for method, future in zip(methods, futures):
+                ret = future.result()
+                if ret:
+                    winner = method
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+        G.LOGGING.debug("%s race of %s: won by %s, timings %s", self, methods, winner, timings)
+        if not ret:
+            return None, None, []
+        tries = [(method, method == winner, timings[method]) for method in methods[:methods.index(winner) + 1]]
+        return winner, dict(ret, method=winner, timings=dict(timings)), tries
+
+    @staticmethod
+    def _get_matching_method(method):
+        func = MATCHING_METHODS.get(method, None)
+        if func is None:
+            raise InvalidMatchingMethodError("Undefined method in CVSTRATEGY: '%s', try 'kaze'/'brisk'/'akaze'/'orb'/'surf'/'sift'/'brief' instead." % method)
+        return func
+
+    def _get_match_history(self):
+        key = (os.path.abspath(self.filepath), tuple(self.resolution or ()))
+        return MATCH_HISTORY.get_or_create(key, MatchHistory)
+
+    def _match_in_last_area(self, history, prepared, screen):
+        """
+        Search the area where the template was last found on a screen of the same resolution,
+        with the method that found it.
+
+        Returns:
+            the match result, None if there is no such area or the template is not found in it
+        """
+        record = history.latest(aircv.get_resolution(screen))
+        if record is None or record.method not in ST.CVSTRATEGY:
+            return None
+        x_min, y_min, x_max, y_max = record.rect
+        area = (x_min - Predictor.DEVIATION, y_min - Predictor.DEVIATION,
+                x_max + Predictor.DEVIATION, y_max + Predictor.DEVIATION)
+        if record.method in ["mstpl", "gmstpl"]:
+            # the scale found last time still fits the screen, single scale template matching is enough
+            ret = self._find_result_in_area(TemplateMatching, prepared.scaled(x_max - x_min, y_max - y_min), screen, area)
+        else:
+            ret = self._find_result_in_area(MATCHING_METHODS[record.method], prepared.resized, screen, area)
+
+        with _ROI_STATS_LOCK:
+            if ret:
+                history.roi_hits += 1
+                ROI_STATS["hits"] += 1
+            else:
+                history.fallbacks += 1
+                ROI_STATS["fallbacks"] += 1
+        G.LOGGING.debug("%s in last matched area %s: %s, %s", self, area, "hit" if ret else "fallback", ROI_STATS)
+        if ret:
+            history.add(record.method, ret["rectangle"], aircv.get_resolution(screen))
         return ret
 
+    def _matching_kwargs(self, func):
+        """Shared caches and options passed to the matching class func, or the match service running it."""
+        if isinstance(func, type) and issubclass(func, KeypointMatching):
+            service = get_match_service(ST.MATCH_PROCESSES) if ST.MATCH_PROCESSES else None
+            if service is not None:
+                # 子进程有各自的缓存
+                return {"keypoint_matcher": self.keypoint_matcher or ST.KEYPOINT_MATCHER, "match_service": service}
+            KEYPOINT_CACHE.cache_dir = ST.KEYPOINT_CACHE_DIR
+            SCREEN_KEYPOINT_CACHE.maxsize = ST.SCREEN_KEYPOINT_CACHE_SIZE
+            return {"keypoint_cache": KEYPOINT_CACHE, "source_keypoint_cache": SCREEN_KEYPOINT_CACHE,
+                    "keypoint_matcher": self.keypoint_matcher or ST.KEYPOINT_MATCHER}
+        return {}
+
     @staticmethod
     def _try_match(func, *args, **kwargs):
         G.LOGGING.debug("try match with %s" % func.__name__)
+        service = kwargs.pop("match_service", None)
         try:
-            ret = func(*args, **kwargs).find_best_result()
+            if service is not None:
+                ret = service.match(func, *args, **kwargs)
+            else:
+                ret = func(*args, **kwargs).find_best_result()
         except aircv.NoModuleError as err:
             G.LOGGING.warning("'surf'/'sift'/'brief' is in opencv-contrib module. You can use 'tpl'/'kaze'/'brisk'/'akaze'/'orb' in CVSTRATEGY, or reinstall opencv with the contrib module.")
             return None
@@ -201,28 +506,51 @@ class Template(object):
     def _imread(self):
         return aircv.imread(self.filepath)
 
+    def _get_prepared_template(self, screen):
+        """Get the decoded template and its form resized for the screen, from TEMPLATE_CACHE."""
+        filepath = os.path.abspath(self.filepath)
+        try:
+            mtime = os.path.getmtime(filepath)
+        except OSError:
+            # file not exist, self._imread() will raise the error and nothing is cached
+            mtime = None
+        key = (filepath, mtime, tuple(self.resolution or ()), aircv.get_resolution(screen), ST.RESIZE_METHOD)
+        TEMPLATE_CACHE.maxsize = ST.TEMPLATE_CACHE_SIZE
+        return TEMPLATE_CACHE.get_or_create(key, lambda: self._prepare_template(screen))
+
+    def _prepare_template(self, screen):
+        image = self._imread()
+        return PreparedTemplate(image, self._resize_image(image, screen, ST.RESIZE_METHOD))
+
     def _find_all_template(self, image, screen):
-        return TemplateMatching(image, screen, threshold=self.threshold, rgb=self.rgb).find_all_results()
+        return TemplateMatching(image, screen, threshold=self.threshold, rgb=self.rgb).find_all_results(
+            max_count=ST.FIND_ALL_MAX_COUNT)
 
     def _find_keypoint_result_in_predict_area(self, func, image, screen):
         if not self.record_pos:
             return None
         # calc predict area in screen
         image_wh, screen_resolution = aircv.get_resolution(image), aircv.get_resolution(screen)
-        xmin, ymin, xmax, ymax = Predictor.get_predict_area(self.record_pos, image_wh, self.resolution, screen_resolution)
-        # crop predict image from screen
-        predict_area = aircv.crop_image(screen, (xmin, ymin, xmax, ymax))
-        if not predict_area.any():
+        area = Predictor.get_predict_area(self.record_pos, image_wh, self.resolution, screen_resolution)
+        return self._find_result_in_area(func, image, screen, area)
+
+    def _find_result_in_area(self, func, image, screen, area):
+        """Match with func in the area (xmin, ymin, xmax, ymax) of screen, the result is in screen coordinates."""
+        w, h = aircv.get_resolution(screen)
+        xmin, ymin = max(0, int(area[0])), max(0, int(area[1]))
+        xmax, ymax = min(w, int(area[2])), min(h, int(area[3]))
+        if xmax <= xmin or ymax <= ymin:
             return None
-        # keypoint matching in predicted area:
-        ret_in_area = func(image, predict_area, threshold=self.threshold, rgb=self.rgb)
+        # crop area from screen, its keypoints are shared by the templates searched in the same area of the frame
+        area_image = as_frame(screen).crop((xmin, ymin, xmax, ymax))
+        ret_in_area = self._try_match(func, image, area_image, threshold=self.threshold, rgb=self.rgb,
+                                      **self._matching_kwargs(func))
         # calc cv ret if found
         if not ret_in_area:
             return None
         ret = deepcopy(ret_in_area)
         if "rectangle" in ret:
-            for idx, item in enumerate(ret["rectangle"]):
-                ret["rectangle"][idx] = (item[0] + xmin, item[1] + ymin)
+            ret["rectangle"] = type(ret["rectangle"])((item[0] + xmin, item[1] + ymin) for item in ret["rectangle"])
         ret["result"] = (ret_in_area["result"][0] + xmin, ret_in_area["result"][1] + ymin)
         return ret
 
@@ -250,6 +578,57 @@ class Template(object):
         return image
 
 
+class PreparedTemplate(object):
+    """
+    A decoded template image and its form resized for one screen resolution.
+
+    image: original BGR template, for mstpl/gmstpl
+    resized: template resized by ST.RESIZE_METHOD, for the other methods
+    Both are ImageFrame objects, their gray images are computed once when first used and reused by all matching methods.
+    """
+
+    def __init__(self, image, resized):
+        self.image = ImageFrame(image)
+        self.resized = self.image if resized is image else ImageFrame(resized)
+
+    def scaled(self, width, height):
+        """The original template resized to (width, height), e.g. the size mstpl found it at."""
+        return self.image.derived(("scaled", width, height),
+                                  lambda: ImageFrame(cv2.resize(self.image.image, (width, height))))
+
+
+class MatchHistory(object):
+    """
+    The last areas where a template was found, and how often searching them first succeeded.
+
+    roi_hits: number of times the template was found again in its last area
+    fallbacks: number of times it was not, and the full screen was searched
+    """
+
+    MAXLEN = 5
+
+    def __init__(self):
+        self.records = deque(maxlen=self.MAXLEN)
+        self.roi_hits = 0
+        self.fallbacks = 0
+
+    def add(self, method, rectangle, resolution):
+        """Record the bounding box of the rectangle found by method on a screen of resolution."""
+        xs = [int(p[0]) for p in rectangle]
+        ys = [int(p[1]) for p in rectangle]
+        self.records.append(MatchRecord(method, (min(xs), min(ys), max(xs), max(ys)), tuple(resolution)))
+
+    def latest(self, resolution):
+        """The latest record on a screen of resolution, None if there is no such record."""
+        for record in reversed(list(self.records)):
+            if record.resolution == tuple(resolution):
+                return record
+        return None
+
+
+MatchRecord = namedtuple("MatchRecord", ["method", "rect", "resolution"])
+
+
 class Predictor(object):
     """
     this class predicts the press_point and the area to search im_search.
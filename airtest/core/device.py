@@ -35,6 +35,16 @@ class Device(with_metaclass(MetaDevice, object)):
     def snapshot(self, *args, **kwargs):
         self._raise_not_implemented_error()
 
+    def snapshot_frame(self):
+        """
+        Take a screenshot as an `aircv.frame.EncodedFrame`, decoded only when and at the size it is used
+
+        Returns:
+            EncodedFrame, None if the device does not provide encoded screenshots, then use `snapshot()`
+
+        """
+        return None
+
     def touch(self, target, **kwargs):
         self._raise_not_implemented_error()
 
@@ -30,6 +30,7 @@ from airtest.utils.logger import get_logger
 from airtest.core.ios.mjpeg_cap import MJpegcap
 from airtest.core.settings import Settings as ST
 from airtest.aircv.screen_recorder import ScreenRecorder, resize_by_max, get_max_size
+from airtest.aircv.frame import EncodedFrame
 from airtest.core.error import LocalDeviceError, AirtestError
 
 
@@ -653,6 +654,14 @@ class IOS(Device):
 
         return screen
 
+    def snapshot_frame(self):
+        """Take snapshot as an EncodedFrame, see `Device.snapshot_frame()`.
+
+        Returns:
+            EncodedFrame of the jpg screenshot.
+        """
+        return EncodedFrame(self._neo_wda_screenshot())
+
     def get_frame_from_stream(self):
         if self.cap_method == CAP_METHOD.MJPEG:
             try:
@@ -1294,10 +1303,10 @@ class IOS(Device):
 
         max_size = get_max_size(max_size)
         def get_frame():
-            data = self.get_frame_from_stream()
-            frame = aircv.utils.string_2_img(data)
-            
-            if max_size is not None:
+            # 需要缩小时按缩小后的尺寸解码
+            frame = EncodedFrame(self.get_frame_from_stream()).resized(max_size)
+            if frame is None and max_size is not None:
+                # 解码失败时录制黑色画面
                 frame = resize_by_max(frame, max_size)
             return frame
 
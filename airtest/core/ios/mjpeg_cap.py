@@ -1,6 +1,8 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
+import re
 import numpy
+import select
 import socket
 import traceback
 from airtest import aircv
@@ -14,48 +16,117 @@ LOGGING = get_logger(__name__)
 
 
 class SocketBuffer(SafeSocket):
+    """
+    Buffered reader of a socket
+
+    The data is received with recv_into a large bytearray, reused once it was read, and the delimiters are
+    searched from where the previous search stopped, so a message is scanned only once.
+    """
+
+    RECV_SIZE = 256 * 1024
+
     def __init__(self, sock: socket.socket):
         super(SocketBuffer, self).__init__(sock)
+        self._data = bytearray(self.RECV_SIZE)
+        # unread data: self._data[self._start:self._end]
+        self._start = 0
+        self._end = 0
+
+    @property
+    def buffered(self) -> int:
+        """ number of bytes received and not read yet """
+        return self._end - self._start
 
     def _drain(self):
-        _data = self.sock.recv(1024)
-        if _data is None or _data == b"":
+        if self._end == len(self._data):
+            # 缓冲区已满: 未读数据移到开头，仍然不够时扩大一倍
+            pending = self._end - self._start
+            if self._start:
+                self._data[:pending] = self._data[self._start:self._end]
+                self._start, self._end = 0, pending
+            if pending == len(self._data):
+                self._data.extend(bytearray(len(self._data)))
+        with memoryview(self._data) as view:
+            n = self.sock.recv_into(view[self._end:])
+        if n == 0:
             raise IOError("socket closed")
-        self.buf += _data
-        return len(_data)
+        self._end += n
+        return n
 
-    def read_until(self, delimeter: bytes) -> bytes:
-        """ return without delimeter """
+    def read_until(self, delimeter: bytes, max_size: int = None, keep: bool = False) -> bytes:
+        """ return without delimeter, which is left in the buffer if keep, IOError if it is not found in max_size bytes """
+        scanned = 0
         while True:
-            index = self.buf.find(delimeter)
+            index = self._data.find(delimeter, self._start + scanned, self._end)
             if index != -1:
-                _return = self.buf[:index]
-                self.buf = self.buf[index + len(delimeter):]
+                _return = bytes(self._data[self._start:index])
+                self._start = index if keep else index + len(delimeter)
                 return _return
+            # 下次从未扫描过的位置继续查找，保留可能跨越两次接收的分隔符前缀
+            scanned = max(0, self.buffered - len(delimeter) + 1)
+            if max_size is not None and self.buffered > max_size:
+                raise IOError("%r not found in %d bytes" % (delimeter, max_size))
             self._drain()
 
-    def read_bytes(self, length: int) -> bytes:
-        while length > len(self.buf):
-            self._drain()
-
-        _return, self.buf = self.buf[:length], self.buf[length:]
+    def read_bytes(self, length: int) -> bytearray:
+        """ read exactly length bytes, the part not received yet goes directly into the returned buffer """
+        if length <= self.buffered:
+            _return = self._data[self._start:self._start + length]
+            self._start += length
+            return _return
+        _return = bytearray(length)
+        n = self.buffered
+        _return[:n] = self._data[self._start:self._end]
+        self._start = self._end = 0
+        with memoryview(_return) as view:
+            while n < length:
+                received = self.sock.recv_into(view[n:])
+                if received == 0:
+                    raise IOError("socket closed")
+                n += received
         return _return
 
+    def skip(self, chars: bytes = b"\r\n"):
+        """ skip the buffered bytes in chars """
+        while self._start < self._end and self._data[self._start] in chars:
+            self._start += 1
+
+    def poll(self) -> int:
+        """ receive what already arrived without waiting, return the number of bytes not read yet """
+        if select.select([self.sock], [], [], 0)[0]:
+            self._drain()
+        return self.buffered
+
     def write(self, data: bytes):
         return self.sock.sendall(data)
 
 
 class MJpegcap(object):
+    """
+    Screen frames of the MJPEG stream of WDA, a multipart/x-mixed-replace HTTP response
+
+    Args:
+        drop_stale: skip the frames which already arrived when a newer one is available, so that
+            get_frame_from_stream() returns the latest frame even if the stream was not read for a while
+    """
 
-    def __init__(self, instruct_helper=None, ip='localhost', port=None, ori_function=None):
+    # WDA的默认分隔符，响应头中没有boundary时使用
+    DEFAULT_BOUNDARY = b"--BoundaryString"
+    MAX_HEADER_SIZE = 64 * 1024
+    # 没有Content-Length时，最多扫描这么多字节查找下一个分隔符
+    MAX_FRAME_SIZE = 32 * 1024 * 1024
+
+    def __init__(self, instruct_helper=None, ip='localhost', port=None, ori_function=None, drop_stale=False):
         self.instruct_helper = instruct_helper
         self.port = int(port or DEFAULT_MJPEG_PORT)
         self.ip = ip
         # 如果指定了port，说明已经将wda的9100端口映射到了新端口，无需本地重复映射
         self.port_forwarding = True if self.port == DEFAULT_MJPEG_PORT and ip in ('localhost', '127.0.0.1') else False
         self.ori_function = ori_function
+        self.drop_stale = drop_stale
         self.sock = None
         self.buf = None
+        self.boundary = self.DEFAULT_BOUNDARY
         self._is_running = False
 
     @ready_method
@@ -71,7 +142,9 @@ class MJpegcap(object):
             self.sock.connect((self.ip, self.port))
             self.buf = SocketBuffer(self.sock)
             self.buf.write(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
-            self.buf.read_until(b'\r\n\r\n')
+            headers = self.buf.read_until(b'\r\n\r\n', max_size=self.MAX_HEADER_SIZE)
+            boundary = re.search(br"boundary=\"?([^\";\r\n]+)", headers)
+            self.boundary = boundary.group(1).strip() if boundary else self.DEFAULT_BOUNDARY
             self._is_running = True
             LOGGING.info("mjpegsock is ready")
         except ConnectionResetError:
@@ -84,15 +157,13 @@ class MJpegcap(object):
         if self._is_running is False:
             self.init_sock()
         try:
-            while True:
-                line = self.buf.read_until(b'\r\n')
-                if line.startswith(b"Content-Length"):
-                    length = int(line.decode('utf-8').split(": ")[1])
-                    break
-            while True:
-                if self.buf.read_until(b'\r\n') == b'':
-                    break
-            imdata = self.buf.read_bytes(length)
+            imdata = self._read_frame()
+            if self.drop_stale:
+                # 已经收到下一帧的数据时，丢弃当前帧
+                self.buf.skip()
+                while self.buf.poll():
+                    imdata = self._read_frame()
+                    self.buf.skip()
             return imdata
         except IOError:
             # 如果暂停获取mjpegsock的数据一段时间，可能会导致它断开，这里将self.buf关闭并临时返回黑屏图像
@@ -102,6 +173,37 @@ class MJpegcap(object):
             self.buf.close()
             return self.get_blank_screen()
 
+    def _read_frame(self):
+        """
+        Read the next part of the stream
+
+        The part headers start with the boundary line and end with an empty line, the jpg data is read
+        with Content-Length when it is given, otherwise it ends before the next boundary.
+
+        Returns:
+            jpg data
+
+        """
+        token = self.boundary.lstrip(b"-")
+        # 跳过上一帧之后的空行，直到分隔符
+        while True:
+            line = self.buf.read_until(b'\r\n', max_size=self.MAX_HEADER_SIZE)
+            if token in line:
+                break
+        length = None
+        while True:
+            line = self.buf.read_until(b'\r\n', max_size=self.MAX_HEADER_SIZE)
+            if line == b'':
+                break
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        if length is not None:
+            return self.buf.read_bytes(length)
+        # 分隔符留在缓冲区中，下次从它所在的行开始读取; 它前面是"\r\n--"
+        imdata = self.buf.read_until(token, max_size=self.MAX_FRAME_SIZE, keep=True)
+        return imdata.rstrip(b"-").rstrip(b"\r\n")
+
     def get_frame(self):
         # 获得单张屏幕截图
         return self.get_frame_from_stream()
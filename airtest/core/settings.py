@@ -15,12 +15,50 @@ class Settings(object):
     CVSTRATEGY = ["mstpl", "tpl", "sift", "brisk"]
     if LooseVersion('3.4.2') < LooseVersion(cv2.__version__) < LooseVersion('4.4.0'):
         CVSTRATEGY = ["mstpl", "tpl", "brisk"]
+    # run the methods of CVSTRATEGY at the same time in threads, the first one in CVSTRATEGY order that finds
+    # the target wins, the result records the winner and the time of each method
+    CVSTRATEGY_RACE = False
+    # try the methods of CVSTRATEGY that found each template fastest first, learned from the previous matches
+    ADAPTIVE_CVSTRATEGY = False
+    # json file keeping the statistics of ADAPTIVE_CVSTRATEGY for the next runs, None to keep them in memory only,
+    # show them with "python -m airtest strategy <file>"
+    STRATEGY_STATS_FILE = None
     KEYPOINT_MATCHING_PREDICTION = True
+    # search the area where a template was last found before the full screen, see cv.ROI_STATS;
+    # the first match found there is returned, even if a better one is elsewhere on the screen
+    ROI_TRACKING = False
+    # max number of results returned by find_all()
+    FIND_ALL_MAX_COUNT = 10
+    # "tpl": >0 enables the coarse-to-fine pyramid search with that many pyrDown levels, e.g. 2
+    TEMPLATE_PYRAMID_LEVEL = 0
     THRESHOLD = 0.7  # [0, 1]
     THRESHOLD_STRICT = None  # dedicated parameter for assert_exists
     OPDELAY = 0.1
     FIND_TIMEOUT = 20
     FIND_TIMEOUT_TMP = 3
+    # loop_find: skip matching screens unchanged since the last matched one, max channel difference
+    # of 8*8 pixel cells regarded as unchanged, e.g. 4; 0 disables the comparison
+    FRAME_DIFF_THRESHOLD = 0
+    # max number of prepared (decoded and resized) templates kept in memory, 0 disables the cache
+    TEMPLATE_CACHE_SIZE = 50
+    # number of threads matching the templates of find_any()/wait_any()/exists_many() in parallel
+    MATCH_THREADS = 4
+    # number of threads matching the scales of "mstpl"/"gmstpl" in parallel, 1 to match them in the calling thread,
+    # e.g. min(4, os.cpu_count()) to use more cores
+    MULTISCALE_THREADS = 1
+    # json file keeping the scale ratios found by "mstpl"/"gmstpl" for the next runs, None to keep them in memory only,
+    # e.g. os.path.join(os.path.dirname(__file__), "scale_hints.json") in the .air script
+    SCALE_HINTS_FILE = None
+    # directory of the npz files keeping the keypoints of the templates for the next runs, None to keep them in memory only
+    KEYPOINT_CACHE_DIR = None
+    # max number of screen keypoint sets kept in memory, one per screen frame (or area of it) and detector, 0 disables the cache
+    SCREEN_KEYPOINT_CACHE_SIZE = 8
+    # descriptor matcher of the keypoint methods: "bf" brute force, or "flann" approximate nearest neighbours
+    # searched in an index built once per template, faster on large screens but may find fewer matches
+    KEYPOINT_MATCHER = "bf"
+    # number of worker processes running the keypoint methods, for many devices driven from threads of one
+    # process: the screens are passed through shared memory (python 3.8+). 0 to match in the calling thread
+    MATCH_PROCESSES = 0
     PROJECT_ROOT = os.environ.get("PROJECT_ROOT", "")  # for ``using`` other script
     SNAPSHOT_QUALITY = 10  # 1-100 https://pillow.readthedocs.io/en/5.1.x/handbook/image-file-formats.html#jpeg
     # Image compression size, e.g. 1200, means that the size of the screenshot does not exceed 1200*1200
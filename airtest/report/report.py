@@ -195,6 +195,17 @@ class LogToHtml(object):
                 screen['rect'].append(rect)
                 screen['confidence'] = cv_result['confidence']
                 break
+            if item["data"]["name"] == "_cv_match_any" and isinstance(item["data"].get("ret"), list):
+                # one rect for each template found in the same screen, pos and confidence of the first one
+                for cv_result in item["data"]["ret"]:
+                    if not isinstance(cv_result, dict):
+                        continue
+                    pos = cv_result['result']
+                    if display_pos is None and self.is_pos(pos):
+                        display_pos = [round(pos[0]), round(pos[1])]
+                        screen['confidence'] = cv_result['confidence']
+                    screen['rect'].append(self.div_rect(cv_result['rectangle']))
+                break
 
         if step["data"]["name"] in ["touch", "assert_exists", "wait", "exists"]:
             # 将图像匹配得到的pos修正为最终pos
@@ -320,6 +331,9 @@ class LogToHtml(object):
             "swipe": u"Swipe on screen",
             "wait": u"Wait for target image to appear",
             "exists": lambda: u"Image %s exists" % ("" if res else "not"),
+            "wait_any": u"Wait for any of the target images to appear",
+            "find_any": lambda: u"Image %s found" % ("%s" % res[0] if res else "not"),
+            "exists_many": lambda: u"Images found: %s" % ([i for i, pos in enumerate(res or []) if pos]),
             "text": lambda: u"Input text:%s" % args.get('text'),
             "keyevent": lambda: u"Click [%s] button" % args.get('keyname'),
             "sleep": lambda: u"Wait for %s seconds" % args.get('secs'),
@@ -335,6 +349,9 @@ class LogToHtml(object):
             "swipe": u"滑动操作",
             "wait": u"等待目标图片出现",
             "exists": lambda: u"图片%s存在" % ("" if res else u"不"),
+            "wait_any": u"等待任一目标图片出现",
+            "find_any": lambda: u"%s找到图片" % (u"第%s张" % res[0] if res else u"未"),
+            "exists_many": lambda: u"存在的图片: %s" % ([i for i, pos in enumerate(res or []) if pos]),
             "text": lambda: u"输入文字:%s" % args.get('text'),
             "keyevent": lambda: u"点击[%s]按键" % args.get('keyname'),
             "sleep": lambda: u"等待%s秒" % args.get('secs'),
@@ -357,6 +374,9 @@ class LogToHtml(object):
             "swipe": u"Swipe",
             "wait": u"Wait",
             "exists": u"Exists",
+            "wait_any": u"Wait any",
+            "find_any": u"Find any",
+            "exists_many": u"Exists many",
             "text": u"Text",
             "keyevent": u"Keyevent",
             "sleep": u"Sleep",
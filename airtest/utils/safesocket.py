@@ -1,6 +1,51 @@
 # _*_ coding:UTF-8 _*_
 import socket
 import errno
+import threading
+
+
+class BufferPool(object):
+    """
+    Preallocated bytearrays reused to receive messages, e.g. the jpg frames of a screen stream
+
+    A buffer is only reused after release(), by the code owning the data it holds, e.g. once a frame is decoded.
+    Buffers which are not released are garbage collected as usual.
+    """
+
+    def __init__(self, count=4, block=65536):
+        self.count = count
+        self.block = block
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self, size):
+        """
+        Get a buffer of exactly size bytes
+
+        Returns:
+            memoryview of a pooled bytearray, its capacity is size rounded up to block
+
+        """
+        with self._lock:
+            for i, buf in enumerate(self._free):
+                if len(buf) >= size:
+                    del self._free[i]
+                    return memoryview(buf)[:size]
+        return memoryview(bytearray(-(-size // self.block) * self.block))[:size]
+
+    def release(self, view):
+        """Give back a buffer returned by acquire(), other objects are ignored"""
+        if not isinstance(view, memoryview) or not isinstance(view.obj, bytearray):
+            return
+        buf = view.obj
+        try:
+            view.release()
+        except BufferError:
+            # still used, e.g. by a numpy array
+            return
+        with self._lock:
+            if len(self._free) < self.count:
+                self._free.append(buf)
 
 
 class SafeSocket(object):
@@ -39,13 +84,54 @@ class SafeSocket(object):
             totalsent += sent
 
     def recv(self, size):
-        while len(self.buf) < size:
-            trunk = self.sock.recv(min(size-len(self.buf), 4096))
-            if trunk == b"":
-                raise socket.error("socket connection broken")
-            self.buf += trunk
-        ret, self.buf = self.buf[:size], self.buf[size:]
-        return ret
+        buf = bytearray(size)
+        self.recv_into(buf)
+        return bytes(buf)
+
+    def recv_into(self, buf):
+        """
+        Fill buf (bytearray or memoryview) with exactly len(buf) bytes, received directly into it
+        """
+        view = memoryview(buf)
+        n = min(len(self.buf), len(view))
+        if n:
+            view[:n] = self.buf[:n]
+            self.buf = self.buf[n:]
+        try:
+            while n < len(view):
+                received = self.sock.recv_into(view[n:])
+                if received == 0:
+                    raise socket.error("socket connection broken")
+                n += received
+        except socket.error:
+            # timeout or no data in nonblocking mode: 保留已收到的部分，下次接收时继续
+            self.buf = bytes(view[:n])
+            raise
+
+    def recv_exact(self, size, pool=None, timeout=None):
+        """
+        Receive a message of exactly size bytes, without intermediate copies
+
+        Args:
+            size: message size
+            pool: BufferPool providing the buffer, default is None which allocates a new one
+            timeout: seconds, default is None which waits for the whole message
+
+        Returns:
+            memoryview of the message, None at timeout
+
+        """
+        view = pool.acquire(size) if pool is not None else memoryview(bytearray(size))
+        if timeout is not None:
+            self.sock.settimeout(timeout)
+        try:
+            self.recv_into(view)
+        except socket.timeout:
+            return None
+        finally:
+            if timeout is not None:
+                self.sock.settimeout(None)
+        return view
 
     def recv_with_timeout(self, size, timeout=2):
         self.sock.settimeout(timeout)
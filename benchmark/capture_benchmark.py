@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""
+Latency of Minicap.snapshot() in lazy mode (one frame requested per call) and in prefetch mode
+(frames read continuously by a background thread), against the fake minicap server of the tests.
+
+The fake device spends --delay seconds on each frame (capture, jpg encoding, transfer), and the
+caller spends --work seconds on each screenshot, as the image matching would.
+
+Usage: python capture_benchmark.py [--delay 0.04] [--work 0.05] [--count 100]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from unittest import mock
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(THISDIR, "..", "tests"))
+
+from fake_minicap import FakeMinicapServer  # noqa
+from airtest.core.android.cap_methods.minicap import Minicap  # noqa
+
+
+def run(prefetch, delay, work, count):
+    server = FakeMinicapServer(size=(720, 1280), delay=delay, interval=0.01)
+    minicap = server.patch(Minicap(mock.Mock()))
+    if prefetch:
+        minicap.start_prefetch()
+    # connect before timing
+    minicap.snapshot()
+    costs = []
+    start = time.time()
+    for i in range(count):
+        t = time.time()
+        minicap.snapshot()
+        costs.append(time.time() - t)
+        time.sleep(work)
+    total = time.time() - start
+    minicap.stop_prefetch()
+    server.close()
+    costs.sort()
+    return sum(costs) / count, costs[int(count * 0.95)], count / total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay", type=float, default=0.04, help="seconds spent by the device on each frame")
+    parser.add_argument("--work", type=float, default=0.05, help="seconds spent by the caller on each screenshot")
+    parser.add_argument("--count", type=int, default=100)
+    args = parser.parse_args()
+    logging.getLogger("airtest").setLevel(logging.INFO)
+
+    print("%-10s %14s %14s %14s" % ("mode", "avg ms", "p95 ms", "snapshots/s"))
+    for name, prefetch in [("lazy", False), ("prefetch", True)]:
+        avg, p95, rate = run(prefetch, args.delay, args.work, args.count)
+        print("%-10s %14.1f %14.1f %14.1f" % (name, avg * 1000, p95 * 1000, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Per-call overhead of creating the keypoint detector and matcher objects.
+
+For each keypoint method, compare init_detector() (a new detector and matcher for each
+call, as before the per-thread pool) with the pooled objects, and the resulting
+find_best_result() latency on the tests/matching_images pair.
+
+Usage: python keypoint_detector_benchmark.py [--methods kaze brisk akaze orb sift] [--repeat 20]
+"""
+
+import os
+import time
+import logging
+import argparse
+
+from airtest.aircv import imread
+from airtest.aircv.error import NoModuleError
+from airtest.aircv.keypoint_matching import KAZEMatching, BRISKMatching, AKAZEMatching, ORBMatching
+from airtest.aircv.keypoint_matching_contrib import SIFTMatching, SURFMatching, BRIEFMatching
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(THISDIR, "..", "tests", "matching_images")
+METHODS = {
+    "kaze": KAZEMatching,
+    "brisk": BRISKMatching,
+    "akaze": AKAZEMatching,
+    "orb": ORBMatching,
+    "sift": SIFTMatching,
+    "surf": SURFMatching,
+    "brief": BRIEFMatching,
+}
+
+
+def timeit(func, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        func()
+    return (time.time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--methods", nargs="+", default=["kaze", "brisk", "akaze", "orb", "sift"])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    logging.getLogger("airtest").setLevel(logging.INFO)
+
+    im_search = imread(os.path.join(IMAGES_DIR, "keypoint_search.png"))
+    im_source = imread(os.path.join(IMAGES_DIR, "keypoint_screen.png"))
+    print("%-8s %14s %14s %16s %16s" % ("method", "init (ms)", "pooled (ms)", "match new (ms)", "match pooled (ms)"))
+    for method in args.methods:
+        matching = METHODS[method](im_search, im_source, rgb=False)
+        try:
+            matching.init_detector()
+        except NoModuleError:
+            print("%-8s not available" % method)
+            continue
+        init = timeit(matching.init_detector, args.repeat)
+        pooled = timeit(matching._init_detector_from_pool, args.repeat)
+
+        def match_new():
+            # the overhead removed by the pool: a new detector and matcher before each match
+            m = METHODS[method](im_search, im_source, rgb=False)
+            m.init_detector()
+            m.find_best_result()
+
+        def match_pooled():
+            METHODS[method](im_search, im_source, rgb=False).find_best_result()
+
+        repeat = max(1, args.repeat // 10)
+        print("%-8s %14.3f %14.3f %16.1f %16.1f" % (method, init * 1000, pooled * 1000,
+                                                    timeit(match_new, repeat) * 1000, timeit(match_pooled, repeat) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compare the brute force (BFMatcher) and the approximate nearest neighbour (FLANN) descriptor matchers.
+
+The corpus is the tests/matching_images keypoint pair, plus templates cropped at random positions
+from the screens in tests/matching_images and sample/*. A match is a hit when the found center is
+within 8 pixels of the crop center.
+
+The keypoints of the templates and screens are detected before timing, and the FLANN index of
+each template is built once, as with the templates cached by airtest.core.cv, so the time is the
+descriptor matching plus the homography and confidence of find_best_result().
+
+Usage: python keypoint_matcher_benchmark.py [--methods kaze brisk akaze orb sift] [--crops 10] [--repeat 3]
+"""
+
+import os
+import time
+import random
+import logging
+import argparse
+
+from airtest.aircv import imread
+from airtest.aircv.error import BaseError, NoModuleError
+from airtest.aircv.frame import ImageFrame, ScreenFrame
+from airtest.aircv.keypoint_matching import KAZEMatching, BRISKMatching, AKAZEMatching, ORBMatching
+from airtest.aircv.keypoint_matching_contrib import SIFTMatching, SURFMatching, BRIEFMatching
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(THISDIR, "..", "tests", "matching_images")
+SCREENS = [
+    os.path.join(IMAGES_DIR, "keypoint_screen.png"),
+    os.path.join(IMAGES_DIR, "template_screen.png"),
+    os.path.join(THISDIR, "sample", "high_dpi", "tpl1551944272194.png"),
+    os.path.join(THISDIR, "sample", "rich_texture", "search.png"),
+]
+METHODS = {
+    "kaze": KAZEMatching,
+    "brisk": BRISKMatching,
+    "akaze": AKAZEMatching,
+    "orb": ORBMatching,
+    "sift": SIFTMatching,
+    "surf": SURFMatching,
+    "brief": BRIEFMatching,
+}
+
+
+def load_cases(crops, seed=0):
+    """Return a list of (name, template frame, screen frame, (x, y) center) cases."""
+    rand = random.Random(seed)
+    screen = ScreenFrame(imread(os.path.join(IMAGES_DIR, "keypoint_screen.png")))
+    cases = [("keypoint_search.png", ImageFrame(imread(os.path.join(IMAGES_DIR, "keypoint_search.png"))), screen, (443, 250))]
+    for screen_file in SCREENS:
+        screen = ScreenFrame(imread(screen_file))
+        h_src, w_src = screen.shape[:2]
+        for i in range(crops):
+            w, h = rand.randint(120, min(480, w_src)), rand.randint(120, min(480, h_src))
+            x, y = rand.randint(0, w_src - w), rand.randint(0, h_src - h)
+            name = "%s[%d,%d %dx%d]" % (os.path.basename(screen_file), x, y, w, h)
+            cases.append((name, ImageFrame(screen.image[y:y + h, x:x + w].copy()), screen, (x + w // 2, y + h // 2)))
+    return cases
+
+
+def run(method, cases, matcher, repeat):
+    hits, good, cost = 0, 0, 0.0
+    for name, im_search, im_source, expected in cases:
+        matching = method(im_search, im_source, threshold=0.7, rgb=False, keypoint_matcher=matcher)
+        try:
+            # detect the keypoints and build the index once, they are memoized on the frames
+            matching.find_best_result()
+        except BaseError:
+            pass
+        start = time.time()
+        for _ in range(repeat):
+            matching = method(im_search, im_source, threshold=0.7, rgb=False, keypoint_matcher=matcher)
+            try:
+                ret = matching.find_best_result()
+            except BaseError:
+                ret = None
+        cost += time.time() - start
+        good += len(getattr(matching, "good", []))
+        if ret and abs(ret["result"][0] - expected[0]) <= 8 and abs(ret["result"][1] - expected[1]) <= 8:
+            hits += 1
+    return hits, good / len(cases), cost / (len(cases) * repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--methods", nargs="+", default=["kaze", "brisk", "akaze", "orb", "sift"])
+    parser.add_argument("--crops", type=int, default=10, help="random templates per screen")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger("airtest").setLevel(logging.INFO)
+
+    print("%-8s %-8s %10s %12s %12s" % ("method", "matcher", "hit rate", "avg good", "avg ms"))
+    for name in args.methods:
+        method = METHODS[name]
+        try:
+            method(None, None).init_detector()
+        except NoModuleError:
+            print("%-8s not available" % name)
+            continue
+        # new frames for each method, the keypoints are memoized by detector
+        cases = load_cases(args.crops)
+        for matcher in ["bf", "flann"]:
+            hits, good, avg = run(method, cases, matcher, args.repeat)
+            print("%-8s %-8s %9.1f%% %12.1f %12.1f" % (name, matcher, 100.0 * hits / len(cases), good, avg * 1000))
+
+
+if __name__ == '__main__':
+    main()
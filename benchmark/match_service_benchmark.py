@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+Aggregate matching throughput of N simulated devices driven from threads of one process,
+matching in the threads themselves or in the process pool of airtest.aircv.match_service.
+
+Each device is a thread matching the tests/matching_images keypoint template on its own screens,
+shifted by a few pixels at each capture so that no keypoints are reused between screens or devices.
+
+Usage: python match_service_benchmark.py [--method kaze] [--devices 1 4 8] [--processes 4] [--seconds 10]
+"""
+
+import os
+import time
+import logging
+import argparse
+import threading
+import numpy as np
+
+from airtest.aircv import imread
+from airtest.aircv.error import BaseError
+from airtest.aircv.frame import ImageFrame, ScreenFrame
+from airtest.aircv.match_service import MatchService
+from airtest.aircv.keypoint_matching import KAZEMatching, BRISKMatching, AKAZEMatching, ORBMatching
+from airtest.aircv.keypoint_matching_contrib import SIFTMatching
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(THISDIR, "..", "tests", "matching_images")
+METHODS = {
+    "kaze": KAZEMatching,
+    "brisk": BRISKMatching,
+    "akaze": AKAZEMatching,
+    "orb": ORBMatching,
+    "sift": SIFTMatching,
+}
+
+
+def device(method, service, im_search, screen, seconds, counts, index):
+    """Match on new screens until seconds passed, counts[index] = (matches, hits)."""
+    matches, hits = 0, 0
+    end = time.time() + seconds
+    while time.time() < end:
+        frame = ScreenFrame(np.roll(screen, (index, matches + 1), axis=(0, 1)))
+        try:
+            if service is None:
+                ret = method(im_search, frame, threshold=0.7, rgb=False).find_best_result()
+            else:
+                ret = service.match(method, im_search, frame, threshold=0.7, rgb=False)
+        except BaseError:
+            ret = None
+        matches += 1
+        hits += 1 if ret else 0
+    counts[index] = (matches, hits)
+
+
+def run(method, service, devices, seconds):
+    im_search = ImageFrame(imread(os.path.join(IMAGES_DIR, "keypoint_search.png")))
+    screen = imread(os.path.join(IMAGES_DIR, "keypoint_screen.png"))
+    counts = [None] * devices
+    threads = [threading.Thread(target=device, args=(method, service, im_search, screen, seconds, counts, i))
+               for i in range(devices)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cost = time.time() - start
+    matches = sum(count[0] for count in counts)
+    hits = sum(count[1] for count in counts)
+    return matches / cost, 100.0 * hits / max(1, matches)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--method", default="kaze", choices=sorted(METHODS))
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    logging.getLogger("airtest").setLevel(logging.INFO)
+
+    method = METHODS[args.method]
+    service = MatchService(args.processes)
+    # start the workers before timing
+    service.match(method, imread(os.path.join(IMAGES_DIR, "keypoint_search.png")),
+                  imread(os.path.join(IMAGES_DIR, "keypoint_screen.png")), threshold=0.7, rgb=False)
+    print("%-8s %8s %-12s %14s %10s" % ("method", "devices", "mode", "matches/s", "hit rate"))
+    for devices in args.devices:
+        for mode, matching_service in [("threads", None), ("processes", service)]:
+            rate, hit_rate = run(method, matching_service, devices, args.seconds)
+            print("%-8s %8d %-12s %14.2f %9.1f%%" % (args.method, devices, mode, rate, hit_rate))
+    service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
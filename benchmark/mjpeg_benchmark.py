@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""
+Throughput of the MJPEG stream parser of MJpegcap, against the fake WDA MJPEG server of the tests
+sending frames as fast as possible.
+
+"legacy" is the previous SocketBuffer (1024 bytes recv, bytes buffer grown with += and searched from the start).
+"cpu ms/frame" is the CPU time of the reading thread only, the server runs in another thread.
+
+Usage: python mjpeg_benchmark.py [--size 2048 2732] [--frames 100]
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import numpy as np
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(THISDIR, "..", "tests"))
+
+from fake_wda_mjpeg import FakeMjpegServer  # noqa
+from airtest.core.ios.mjpeg_cap import MJpegcap  # noqa
+from airtest import aircv  # noqa
+
+
+class LegacySocketBuffer(object):
+    """SocketBuffer before the recv_into buffer, and the frame reading of MJpegcap.get_frame_from_stream()."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = b""
+
+    def _drain(self):
+        _data = self.sock.recv(1024)
+        if _data is None or _data == b"":
+            raise IOError("socket closed")
+        self.buf += _data
+
+    def read_until(self, delimeter):
+        while True:
+            index = self.buf.find(delimeter)
+            if index != -1:
+                _return = self.buf[:index]
+                self.buf = self.buf[index + len(delimeter):]
+                return _return
+            self._drain()
+
+    def read_bytes(self, length):
+        while length > len(self.buf):
+            self._drain()
+        _return, self.buf = self.buf[:length], self.buf[length:]
+        return _return
+
+    def get_frame(self):
+        while True:
+            line = self.read_until(b'\r\n')
+            if line.startswith(b"Content-Length"):
+                length = int(line.decode('utf-8').split(": ")[1])
+                break
+        while True:
+            if self.read_until(b'\r\n') == b'':
+                break
+        return self.read_bytes(length)
+
+
+def textured_jpg(size):
+    """A jpg of screen-like content, large enough to be spread over many recv() calls."""
+    w, h = size
+    rand = np.random.RandomState(0)
+    img = np.kron(rand.randint(0, 256, (h // 8 + 1, w // 8 + 1, 3)), np.ones((8, 8, 1)))[:h, :w].astype(np.uint8)
+    return aircv.cv2.imencode(".jpg", img, [aircv.cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def run(mode, size, frames, content_length):
+    server = FakeMjpegServer(size=size, interval=0, content_length=content_length)
+    data = textured_jpg(size)
+    server.jpg = lambda level: data
+    if mode == "legacy":
+        sock = socket.create_connection(("127.0.0.1", server.port))
+        reader = LegacySocketBuffer(sock)
+        sock.sendall(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+        reader.read_until(b"\r\n\r\n")
+        get_frame = reader.get_frame
+    else:
+        cap = MJpegcap(ip="127.0.0.1", port=server.port)
+        get_frame = cap.get_frame_from_stream
+    get_frame()
+    start, cpu = time.time(), time.thread_time()
+    for i in range(frames):
+        assert len(get_frame()) == len(data)
+    cost, cpu = time.time() - start, time.thread_time() - cpu
+    if mode == "legacy":
+        sock.close()
+    else:
+        cap.teardown_stream()
+    server.close()
+    return len(data), frames / cost, cpu / frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, nargs=2, default=[2048, 2732], help="frame width and height")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    print("%-24s %10s %12s %14s" % ("mode", "jpg KB", "frames/s", "cpu ms/frame"))
+    for mode, content_length in [("legacy", True), ("content-length", True), ("boundary scan", False)]:
+        size, rate, cpu = run(mode, tuple(args.size), args.frames, content_length)
+        print("%-24s %10d %12.1f %14.2f" % (mode, size / 1024, rate, cpu * 1000))
+
+
+if __name__ == '__main__':
+    main()
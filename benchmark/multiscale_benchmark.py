@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""
+Latency and hit rate of the multi-scale template matching methods, "mstpl" and "gmstpl".
+
+Templates are cropped at random positions from the screens in tests/matching_images and
+sample/high_dpi, recorded at the screen resolution, then searched in the screen resized by
+each of --scales. A match is a hit when the found rectangle is within 3 pixels (or 3% of its
+size) of the expected one. With --hints, every case is matched a first time to warm the
+scale hints up before being measured.
+
+Usage: python multiscale_benchmark.py [--methods mstpl gmstpl] [--scales 1.0 0.8 0.6] [--crops 10] [--threads 1 4] [--hints]
+"""
+
+import os
+import time
+import random
+import logging
+import argparse
+
+import cv2
+from airtest.aircv import imread
+from airtest.aircv.multiscale_template_matching import MultiScaleTemplateMatching, MultiScaleTemplateMatchingPre
+from airtest.aircv.scale_hints import ScaleHints
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(THISDIR, "..", "tests", "matching_images")
+SCREENS = [
+    os.path.join(IMAGES_DIR, "template_screen.png"),
+    os.path.join(IMAGES_DIR, "keypoint_screen.png"),
+    os.path.join(THISDIR, "sample", "high_dpi", "tpl1551944272194.png"),
+]
+METHODS = {
+    "mstpl": MultiScaleTemplateMatchingPre,
+    "gmstpl": MultiScaleTemplateMatching,
+}
+
+
+def load_cases(crops, scales, seed=0):
+    """Return a list of (name, im_search, im_source, resolution, (x, y, w, h)) cases."""
+    rand = random.Random(seed)
+    cases = []
+    for screen_file in SCREENS:
+        screen = imread(screen_file)
+        h_src, w_src = screen.shape[:2]
+        for i in range(crops):
+            w, h = rand.randint(64, 320), rand.randint(64, 320)
+            x, y = rand.randint(0, w_src - w), rand.randint(0, h_src - h)
+            for scale in scales:
+                resized = cv2.resize(screen, (int(w_src * scale), int(h_src * scale)))
+                name = "%s[%d,%d %dx%d]x%s" % (os.path.basename(screen_file), x, y, w, h, scale)
+                expected = (x * scale, y * scale, w * scale, h * scale)
+                cases.append((name, screen[y:y + h, x:x + w].copy(), resized, (w_src, h_src), expected))
+    return cases
+
+
+def is_hit(ret, expected):
+    if not ret:
+        return False
+    (x0, y0), _, (x1, y1), _ = ret["rectangle"]
+    x, y, w, h = expected
+    tolerance = max(3, 0.03 * max(w, h))
+    return all(abs(a - b) <= tolerance for a, b in zip((x0, y0, x1, y1), (x, y, x + w, y + h)))
+
+
+def run(method, cases, threads, hints=False):
+    hits, cost = 0, 0.0
+    scale_hints = ScaleHints() if hints else None
+    for name, im_search, im_source, resolution, expected in cases:
+        kwargs = dict(threshold=0.8, rgb=False, resolution=resolution, threads=threads, scale_hints=scale_hints)
+        if hints:
+            METHODS[method](im_search, im_source, **kwargs).find_best_result()
+        start = time.time()
+        ret = METHODS[method](im_search, im_source, **kwargs).find_best_result()
+        cost += time.time() - start
+        if is_hit(ret, expected):
+            hits += 1
+        else:
+            logging.debug("miss %s: %s", name, ret)
+    return hits, cost / len(cases)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--methods", nargs="+", default=["mstpl", "gmstpl"])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.8, 0.6])
+    parser.add_argument("--crops", type=int, default=10, help="random templates per screen")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--hints", action="store_true", help="measure with warm scale hints")
+    args = parser.parse_args()
+    logging.getLogger("airtest").setLevel(logging.INFO)
+
+    cases = load_cases(args.crops, args.scales)
+    print("%d cases" % len(cases))
+    print("%-8s %8s %10s %12s" % ("method", "threads", "hit rate", "avg ms"))
+    for method in args.methods:
+        for threads in args.threads:
+            hits, avg = run(method, cases, threads, args.hints)
+            print("%-8s %8d %9.1f%% %12.1f" % (method, threads, 100.0 * hits / len(cases), avg * 1000))
+
+
+if __name__ == '__main__':
+    main()
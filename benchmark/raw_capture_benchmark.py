@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""
+Host side cost of the AdbCap screenshots: decoding the PNG of `screencap -p`, against parsing the raw
+framebuffer of `screencap` (`AdbCap.raw = True`), with and without `raw_max_size`.
+
+The dumps are built from a screen-like image of --size, the time spent by the device (PNG encoding)
+and by adb (transfer of the larger raw data) is not measured here, the sizes of both are printed.
+
+Usage: python raw_capture_benchmark.py [--size 1080 2340] [--count 50]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(THISDIR, "..", "tests"))
+
+from test_adbcap import make_raw  # noqa
+from airtest.aircv.utils import string_2_img  # noqa
+from airtest.core.android.cap_methods.adbcap import raw_to_img  # noqa
+from airtest import aircv  # noqa
+
+
+def screen_like(size):
+    """Flat areas and blocks of random colors, compressed by PNG about as well as a real screen."""
+    w, h = size
+    rand = np.random.RandomState(0)
+    img = np.kron(rand.randint(0, 256, (h // 40 + 1, w // 40 + 1, 3)), np.ones((40, 40, 1)))[:h, :w].astype(np.uint8)
+    img[h // 3:h // 2] = 255
+    return img
+
+
+def timeit(func, data, count):
+    func(data)
+    start = time.time()
+    for i in range(count):
+        func(data)
+    return (time.time() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, nargs=2, default=[1080, 2340], help="screen width and height")
+    parser.add_argument("--count", type=int, default=50)
+    args = parser.parse_args()
+
+    img = screen_like(tuple(args.size))
+    png = aircv.cv2.imencode(".png", img)[1].tobytes()
+    raw = make_raw(img, 1)
+    cases = [
+        ("png decode", png, string_2_img),
+        ("raw", raw, raw_to_img),
+        ("raw max_size=1280", raw, lambda data: raw_to_img(data, max_size=1280)),
+        ("raw RGB_565", make_raw(img, 4), raw_to_img),
+    ]
+    print("%-20s %12s %10s" % ("mode", "data KB", "host ms"))
+    for name, data, func in cases:
+        print("%-20s %12d %10.2f" % (name, len(data) / 1024, timeit(func, data, args.count) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cost of getting a frame of the screen stream scaled down to --max-size, as the screen recording does:
+decoding the full jpg and resizing it (`resize_by_max`), against `string_2_img(data, max_size)` which
+lets libjpeg decode it at 1/2, 1/4 or 1/8 size.
+
+Usage: python reduced_decode_benchmark.py [--size 1440 2560] [--max-size 800 400] [--count 50]
+"""
+
+import time
+import argparse
+import numpy as np
+
+from airtest.aircv import cv2
+from airtest.aircv.utils import string_2_img
+
+
+def textured_jpg(size):
+    """A jpg of screen-like content."""
+    w, h = size
+    rand = np.random.RandomState(0)
+    img = np.kron(rand.randint(0, 256, (h // 8 + 1, w // 8 + 1, 3)), np.ones((8, 8, 1)))[:h, :w].astype(np.uint8)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes()
+
+
+def full_then_resize(data, max_size):
+    img = string_2_img(data)
+    h, w = img.shape[:2]
+    scale = max_size / float(max(w, h))
+    return cv2.resize(img, (int(w * scale), int(h * scale)))
+
+
+def timeit(func, count):
+    func()
+    start = time.time()
+    for i in range(count):
+        func()
+    return (time.time() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, nargs=2, default=[1440, 2560], help="frame width and height")
+    parser.add_argument("--max-size", type=int, nargs="+", default=[800, 400])
+    parser.add_argument("--count", type=int, default=50)
+    args = parser.parse_args()
+
+    data = textured_jpg(tuple(args.size))
+    print("full decode: %.2f ms" % (timeit(lambda: string_2_img(data), args.count) * 1000))
+    print("%-10s %22s %22s" % ("max_size", "decode+resize ms", "reduced decode ms"))
+    for max_size in args.max_size:
+        full = timeit(lambda: full_then_resize(data, max_size), args.count)
+        reduced = timeit(lambda: string_2_img(data, max_size=max_size), args.count)
+        print("%-10d %22.2f %22.2f" % (max_size, full * 1000, reduced * 1000))
+
+
+if __name__ == '__main__':
+    main()
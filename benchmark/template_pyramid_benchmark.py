@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compare TemplateMatching.find_best_result() with and without the pyramid mode.
+
+The corpus is the tests/matching_images pair, plus templates cropped at random positions
+from the screens in tests/matching_images and sample/high_dpi. A match is a hit when the
+found rectangle is within 2 pixels of the crop position, or is an identical copy of the template.
+
+Usage: python template_pyramid_benchmark.py [--levels 0 1 2 3] [--crops 20] [--repeat 3]
+"""
+
+import os
+import time
+import random
+import logging
+import argparse
+import numpy as np
+
+from airtest.aircv import imread
+from airtest.aircv.frame import ScreenFrame
+from airtest.aircv.template_matching import TemplateMatching
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = os.path.join(THISDIR, "..", "tests", "matching_images")
+SCREENS = [
+    os.path.join(IMAGES_DIR, "template_screen.png"),
+    os.path.join(IMAGES_DIR, "keypoint_screen.png"),
+    os.path.join(THISDIR, "sample", "high_dpi", "tpl1551944272194.png"),
+]
+
+
+def load_cases(crops, seed=0):
+    """Return a list of (name, im_search, im_source, (x, y)) cases."""
+    rand = random.Random(seed)
+    cases = []
+    screen = imread(os.path.join(IMAGES_DIR, "template_screen.png"))
+    cases.append(("template_search.png", imread(os.path.join(IMAGES_DIR, "template_search.png")), screen, (216, 549)))
+    for screen_file in SCREENS:
+        screen = imread(screen_file)
+        h_src, w_src = screen.shape[:2]
+        for i in range(crops):
+            w, h = rand.randint(48, 320), rand.randint(48, 320)
+            x, y = rand.randint(0, w_src - w), rand.randint(0, h_src - h)
+            name = "%s[%d,%d %dx%d]" % (os.path.basename(screen_file), x, y, w, h)
+            cases.append((name, screen[y:y + h, x:x + w].copy(), screen, (x, y)))
+    return cases
+
+
+def run(cases, level, repeat):
+    hits, cost = 0, 0.0
+    for name, im_search, im_source, expected in cases:
+        for _ in range(repeat):
+            # a new frame each time, so that the derived images are not reused across runs
+            frame = ScreenFrame(im_source)
+            start = time.time()
+            ret = TemplateMatching(im_search, frame, threshold=0.9, rgb=False, pyramid_level=level).find_best_result()
+            cost += time.time() - start
+        if ret:
+            x, y = ret["rectangle"][0]
+            h, w = im_search.shape[:2]
+            if abs(x - expected[0]) <= 2 and abs(y - expected[1]) <= 2:
+                hits += 1
+            elif np.array_equal(im_source[y:y + h, x:x + w], im_search):
+                # the screen may contain several copies of the same icon
+                hits += 1
+    return hits, cost / (len(cases) * repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, nargs="+", default=[0, 1, 2, 3])
+    parser.add_argument("--crops", type=int, default=20, help="random templates per screen")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger("airtest").setLevel(logging.INFO)
+
+    cases = load_cases(args.crops)
+    print("%d cases" % len(cases))
+    print("%-8s %10s %12s" % ("level", "hit rate", "avg ms"))
+    for level in args.levels:
+        hits, avg = run(cases, level, args.repeat)
+        print("%-8s %9.1f%% %12.1f" % (level, 100.0 * hits / len(cases), avg * 1000))
+
+
+if __name__ == '__main__':
+    main()
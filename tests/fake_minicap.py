@@ -0,0 +1,119 @@
+# encoding=utf-8
+"""Minicap protocol server on localhost, to test and benchmark the screen streams without a device."""
+import os
+import time
+import struct
+import socket
+import threading
+import numpy as np
+from unittest import mock
+from airtest import aircv
+
+
+class FakeMinicapServer(object):
+    """
+    Send jpg frames with the minicap protocol: a 24 bytes banner, then 4 bytes size + jpg data per frame.
+
+    lazy: wait for b"1" before sending each frame, as `minicap -l`. Read when a client connects.
+    delay: seconds spent by the "device" on each frame (capture, encoding, transfer)
+    interval: seconds between frames in non-lazy mode
+    static: in non-lazy mode, send no frame, as minicap does while the screen does not change
+    The frames are filled with the gray level frames_sent % 256.
+    """
+
+    def __init__(self, size=(320, 240), delay=0.0, interval=0.02):
+        self.size = size
+        self.delay = delay
+        self.interval = interval
+        self.lazy = True
+        self.static = False
+        self.frames_sent = 0
+        self.connections = []
+        self._threads = []
+        self._closed = False
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(5)
+        self.port = self._sock.getsockname()[1]
+        self._jpg = {}
+        self._start_thread(self._accept)
+
+    def close(self):
+        self._closed = True
+        try:
+            # wakes up accept()
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self.drop_connections()
+        for t in self._threads:
+            t.join(1)
+
+    def drop_connections(self):
+        """Close the connections to the clients, as a crashed minicap server."""
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.connections = []
+
+    def patch(self, cap):
+        """Make the Minicap object cap connect to this server instead of setting up minicap on a device."""
+        def setup_stream_server(lazy=False):
+            self.lazy = lazy
+            return mock.Mock(), mock.Mock(), self.port
+        cap.adb = mock.Mock(host="127.0.0.1")
+        cap.ori_function = lambda: {"width": self.size[0], "height": self.size[1], "rotation": 0}
+        cap._install_or_upgrade_ready = True
+        cap._cleanup_minicap = lambda: None
+        cap._setup_stream_server = setup_stream_server
+        return cap
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            self._start_thread(self._serve, conn, self.lazy)
+
+    def _start_thread(self, target, *args):
+        t = threading.Thread(target=target, args=args, name="fake_minicap")
+        t.daemon = True
+        t.start()
+        self._threads.append(t)
+
+    def _serve(self, conn, lazy):
+        w, h = self.size
+        try:
+            conn.sendall(struct.pack("<2B5I2B", 1, 24, os.getpid(), w, h, w, h, 0, 0))
+            while not self._closed:
+                if lazy:
+                    if not conn.recv(1):
+                        return
+                else:
+                    time.sleep(self.interval)
+                    if self.static:
+                        continue
+                time.sleep(self.delay)
+                data = self._frame(self.frames_sent % 256)
+                self.frames_sent += 1
+                conn.sendall(struct.pack("<I", len(data)) + data)
+        except OSError:
+            return
+
+    @staticmethod
+    def frame_level(img):
+        """Gray level of a decoded frame, the number of the frame modulo 256."""
+        return int(round(float(img.mean())))
+
+    def _frame(self, level):
+        if level not in self._jpg:
+            img = np.full((self.size[1], self.size[0], 3), level, dtype=np.uint8)
+            self._jpg[level] = aircv.cv2.imencode(".jpg", img)[1].tobytes()
+        return self._jpg[level]
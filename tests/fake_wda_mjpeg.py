@@ -0,0 +1,104 @@
+# encoding=utf-8
+"""MJPEG server on localhost sending frames as WDA does, to test and benchmark MJpegcap without a device."""
+import time
+import socket
+import threading
+import numpy as np
+from airtest import aircv
+
+
+class FakeMjpegServer(object):
+    """
+    Answer each connection with a multipart/x-mixed-replace stream of jpg frames, in the WDA format.
+
+    content_length: send the Content-Length header of each part, MJpegcap then scans for the boundary
+    interval: seconds between frames, 0 to send them as fast as possible
+    The frames are filled with the gray level frames_sent % 256, see frame_level().
+    """
+
+    BOUNDARY = b"--BoundaryString"
+
+    def __init__(self, size=(320, 240), interval=0.02, content_length=True):
+        self.size = size
+        self.interval = interval
+        self.content_length = content_length
+        self.frames_sent = 0
+        self.connections = []
+        self._threads = []
+        self._closed = False
+        self._jpg = {}
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(5)
+        self.port = self._sock.getsockname()[1]
+        self._start_thread(self._accept)
+
+    def close(self):
+        self._closed = True
+        try:
+            # wakes up accept()
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self.drop_connections()
+        for t in self._threads:
+            t.join(1)
+
+    def drop_connections(self):
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.connections = []
+
+    @staticmethod
+    def frame_level(img):
+        """Gray level of a decoded frame, the number of the frame modulo 256."""
+        return int(round(float(img.mean())))
+
+    def jpg(self, level):
+        if level not in self._jpg:
+            img = np.full((self.size[1], self.size[0], 3), level, dtype=np.uint8)
+            self._jpg[level] = aircv.cv2.imencode(".jpg", img)[1].tobytes()
+        return self._jpg[level]
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            self._start_thread(self._serve, conn)
+
+    def _start_thread(self, target, *args):
+        t = threading.Thread(target=target, args=args, name="fake_mjpeg")
+        t.daemon = True
+        t.start()
+        self._threads.append(t)
+
+    def _serve(self, conn):
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                data = conn.recv(1024)
+                if not data:
+                    return
+                request += data
+            conn.sendall(b"HTTP/1.0 200 OK\r\nServer: WDA MJPEG Server\r\nConnection: close\r\n"
+                         b"Content-Type: multipart/x-mixed-replace; boundary=" + self.BOUNDARY + b"\r\n\r\n")
+            while not self._closed:
+                data = self.jpg(self.frames_sent % 256)
+                headers = self.BOUNDARY + b"\r\nContent-type: image/jpg\r\n"
+                if self.content_length:
+                    headers += b"Content-Length: %d\r\n" % len(data)
+                conn.sendall(headers + b"\r\n" + data + b"\r\n\r\n")
+                self.frames_sent += 1
+                if self.interval:
+                    time.sleep(self.interval)
+        except OSError:
+            return
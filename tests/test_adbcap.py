@@ -0,0 +1,102 @@
+# encoding=utf-8
+import os
+import struct
+import unittest
+from unittest import mock
+import numpy as np
+from airtest import aircv
+from airtest.core.android.cap_methods.adbcap import AdbCap, raw_to_img
+from airtest.core.error import ScreenError
+
+THISDIR = os.path.dirname(os.path.abspath(__file__))
+SCREEN = os.path.join(THISDIR, "matching_images", "keypoint_screen.png")
+
+
+def make_raw(img, fmt=1, colorspace=True, padding=0):
+    """Build a screencap dump of a BGR image, as written by the device in the given PixelFormat."""
+    h, w = img.shape[:2]
+    if fmt in (1, 2):
+        pixels = aircv.cv2.cvtColor(img, aircv.cv2.COLOR_BGR2RGBA)
+    elif fmt == 3:
+        pixels = aircv.cv2.cvtColor(img, aircv.cv2.COLOR_BGR2RGB)
+    elif fmt == 4:
+        pixels = aircv.cv2.cvtColor(img, aircv.cv2.COLOR_BGR2BGR565)
+    else:
+        pixels = aircv.cv2.cvtColor(img, aircv.cv2.COLOR_BGR2BGRA)
+    rows = pixels.reshape(h, -1)
+    if padding:
+        # stride of the framebuffer larger than the width
+        rows = np.hstack([rows, np.zeros((h, padding), dtype=np.uint8)])
+    header = struct.pack("<3I", w, h, fmt)
+    if colorspace:
+        header += struct.pack("<I", 1)
+    return header + rows.tobytes()
+
+
+class TestRawScreencap(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.img = aircv.imread(SCREEN)
+
+    def test_formats(self):
+        for fmt in (1, 2, 3, 5):
+            for colorspace in (True, False):
+                screen = raw_to_img(make_raw(self.img, fmt, colorspace))
+                self.assertEqual(screen.shape, self.img.shape)
+                np.testing.assert_array_equal(screen, self.img)
+
+    def test_rgb565(self):
+        screen = raw_to_img(make_raw(self.img, 4))
+        self.assertEqual(screen.shape, self.img.shape)
+        # 5/6 bits per channel
+        self.assertLessEqual(np.abs(screen.astype(int) - self.img).max(), 8)
+
+    def test_stride(self):
+        screen = raw_to_img(make_raw(self.img, 1, padding=64))
+        np.testing.assert_array_equal(screen, self.img)
+
+    def test_max_size(self):
+        h, w = self.img.shape[:2]
+        screen = raw_to_img(make_raw(self.img, 1), max_size=max(w, h) // 2)
+        self.assertEqual(max(screen.shape[:2]), max(w, h) // 2)
+        self.assertAlmostEqual(screen.shape[1] / float(screen.shape[0]), w / float(h), places=2)
+        expected = aircv.cv2.resize(self.img, (screen.shape[1], screen.shape[0]), interpolation=aircv.cv2.INTER_AREA)
+        self.assertLess(np.abs(screen.astype(int) - expected).mean(), 2)
+        self.assertEqual(max(raw_to_img(make_raw(self.img, 1), max_size=max(w, h) * 3 // 10).shape[:2]), max(w, h) * 3 // 10)
+        # 不需要缩小
+        self.assertEqual(raw_to_img(make_raw(self.img, 1), max_size=max(w, h)).shape, self.img.shape)
+        self.assertEqual(raw_to_img(make_raw(self.img, 4), max_size=max(w, h) // 2).shape, screen.shape)
+
+    def test_invalid(self):
+        raw = make_raw(self.img, 1)
+        with self.assertRaises(ScreenError):
+            raw_to_img(raw[:8])
+        with self.assertRaises(ScreenError):
+            raw_to_img(raw[:-10])
+        with self.assertRaises(ScreenError):
+            raw_to_img(struct.pack("<3I", 10, 10, 99) + b"\x00" * 400)
+
+    def test_adbcap(self):
+        adb = mock.Mock()
+        adb.sdk_version = 29
+        adb.raw_snapshot.return_value = make_raw(self.img, 1)
+        adb.snapshot.return_value = aircv.cv2.imencode(".png", self.img)[1].tobytes()
+        cap = AdbCap(adb)
+        np.testing.assert_array_equal(cap.snapshot(), self.img)
+        self.assertFalse(adb.raw_snapshot.called)
+
+        cap.raw = True
+        np.testing.assert_array_equal(cap.snapshot(), self.img)
+        self.assertEqual(adb.raw_snapshot.call_count, 1)
+        self.assertEqual(adb.snapshot.call_count, 1)
+
+        # 无法解析时退回PNG截图
+        adb.raw_snapshot.return_value = b"error"
+        np.testing.assert_array_equal(cap.snapshot(), self.img)
+        self.assertEqual(adb.snapshot.call_count, 2)
+        self.assertFalse(cap.raw)
+
+
+if __name__ == '__main__':
+    unittest.main()
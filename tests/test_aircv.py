@@ -4,13 +4,29 @@
 """Unittest for aircv."""
 
 
+import gc
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+import weakref
+import cv2
+import numpy as np
 from airtest.aircv import imread
 from airtest.aircv.keypoint_matching import *  # noqa
 from airtest.aircv.keypoint_matching_contrib import *  # noqa
 from airtest.aircv.template_matching import *  # noqa
+from airtest.aircv.multiscale_template_matching import MultiScaleTemplateMatching
 from airtest.aircv.sift import find_sift
 from airtest.aircv.template import find_template, find_all_template
+from airtest.aircv.frame import ImageFrame, ScreenFrame, EncodedFrame, changed_area
+from airtest.aircv.utils import string_2_img, image_size, resize_by_max, get_executor
+from airtest.aircv.scale_hints import ScaleHints
+from airtest.aircv.strategy_stats import StrategyStats, format_stats
+from airtest.aircv.keypoint_cache import KeypointCache
+from airtest.aircv.cal_confidence import cal_rgb_confidence, cal_hsv_confidence, cal_ccoeff_confidence, ConfidenceEngine
+from airtest.aircv.peaks import find_peaks
 
 
 class TestAircv(unittest.TestCase):
@@ -45,6 +61,48 @@ class TestAircv(unittest.TestCase):
         result = TemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD, rgb=self.RGB).find_all_results()
         self.assertIsInstance(result, list)
 
+    def test_find_all_template_grid(self):
+        """find_all on a grid of 60 identical icons, more than the default max count."""
+        icon = self.template_sch[20:80, 20:80]
+        screen = np.random.RandomState(0).randint(0, 255, (1920, 1080, 3)).astype(np.uint8)
+        for i in range(10):
+            for j in range(6):
+                screen[100 + i * 170:160 + i * 170, 50 + j * 170:110 + j * 170] = icon
+        matching = TemplateMatching(icon, screen, threshold=self.THRESHOLD, rgb=self.RGB)
+        self.assertEqual(len(matching.find_all_results()), TemplateMatching.MAX_RESULT_COUNT)
+        result = matching.find_all_results(max_count=100)
+        self.assertEqual(len(result), 60)
+        self.assertEqual(sorted(r["result"] for r in result),
+                         sorted((80 + j * 170, 130 + i * 170) for i in range(10) for j in range(6)))
+        result = find_all_template(screen, icon, threshold=self.THRESHOLD, rgb=self.RGB, max_count=100)
+        self.assertEqual(len(result), 60)
+
+    def test_find_all_template_rgb(self):
+        """With rgb, a target is kept by its rgb confidence even when its gray match is below the threshold."""
+        rs = np.random.RandomState(1)
+        hsv = np.dstack([rs.randint(0, 120, (15, 20)), rs.randint(120, 230, (15, 20)), rs.randint(120, 230, (15, 20))]).astype(np.uint8)
+        hsv = cv2.resize(hsv, (80, 60), interpolation=cv2.INTER_NEAREST)
+        icon = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+        # 色相整体偏移: 三通道可信度不变, 灰度匹配值只有0.55左右
+        hsv[..., 0] += 40
+        screen = np.full((600, 400, 3), 128, np.uint8)
+        screen[100:160, 50:130] = icon
+        screen[400:460, 200:280] = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+        expected = [(90, 130), (240, 430)]
+        result = TemplateMatching(icon, screen, threshold=self.THRESHOLD, rgb=True).find_all_results()
+        self.assertEqual([r["result"] for r in result], expected)
+        self.assertEqual([r["result"] for r in find_all_template(screen, icon, threshold=self.THRESHOLD, rgb=True)], expected)
+        result = TemplateMatching(icon, screen, threshold=self.THRESHOLD, rgb=False).find_all_results()
+        self.assertEqual([r["result"] for r in result], expected[:1])
+
+    def test_find_peaks(self):
+        """Peaks closer than half a template are suppressed, the higher one is kept."""
+        res = np.zeros((100, 100), np.float32)
+        res[10, 10], res[12, 14], res[50, 50], res[90, 10] = 0.9, 0.95, 0.8, 0.5
+        self.assertEqual(find_peaks(res, 0.7, 10, 10), [((14, 12), 0.949999988079071), ((50, 50), 0.800000011920929)])
+        self.assertEqual(len(find_peaks(res, 0.7, 10, 10, max_count=1)), 1)
+        self.assertEqual(len(find_peaks(res, 0.7, 2, 2)), 3)
+
     def test_find_kaze(self):
         """KAZE matching."""
         # 较慢,稍微稳定一点.
@@ -69,6 +127,54 @@ class TestAircv(unittest.TestCase):
         result = ORBMatching(self.keypoint_sch, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
         self.assertIsInstance(result, dict)
 
+    def test_find_all_keypoint(self):
+        """Keypoint matching finds all the instances of the template, scaled ones included, in one pass."""
+        screen = np.full((1500, 1900, 3), 40, np.uint8)
+        screen[50:408, 50:904] = self.keypoint_sch
+        small = cv2.resize(self.keypoint_sch, None, fx=0.8, fy=0.8)
+        screen[700:700 + small.shape[0], 100:100 + small.shape[1]] = small
+        screen[1000:1358, 1000:1854] = self.keypoint_sch
+        for method in [BRISKMatching, AKAZEMatching]:
+            result = method(self.keypoint_sch, screen, threshold=self.THRESHOLD, rgb=self.RGB).find_all_results()
+            self.assertEqual(len(result), 3, method.METHOD_NAME)
+            centers = sorted(r["result"] for r in result)
+            for (x, y), expected in zip(centers, [(441, 843), (477, 229), (1427, 1179)]):
+                self.assertLessEqual(abs(x - expected[0]) + abs(y - expected[1]), 4, method.METHOD_NAME)
+            self.assertEqual(len(method(self.keypoint_sch, screen).find_all_results(max_count=2)), 2)
+        result = BRISKMatching(self.keypoint_sch, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB).find_all_results()
+        self.assertEqual(len(result), 1)
+
+    def test_flann_matcher(self):
+        """The FLANN matcher finds the same target as the brute force one, with an index built once per template."""
+        for method in [BRISKMatching, KAZEMatching]:
+            template = ImageFrame(self.keypoint_sch)
+            expected = method(template, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+            matching = method(template, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB, keypoint_matcher="flann")
+            result = matching.find_best_result()
+            self.assertLessEqual(abs(result["result"][0] - expected["result"][0]) + abs(result["result"][1] - expected["result"][1]),
+                                 4, method.METHOD_NAME)
+            index = template.derived(("flann_index", matching._detector_key()), None)
+            method(template, self.keypoint_src, keypoint_matcher="flann").find_best_result()
+            self.assertIs(template.derived(("flann_index", matching._detector_key()), None), index)
+        with self.assertRaises(ValueError):
+            BRISKMatching(self.keypoint_sch, self.keypoint_src, keypoint_matcher="brute")
+
+    def test_flann_matcher_threads(self):
+        """FLANN matches are de-duplicated like the brute force ones, and the index shared by threads gives the same matches."""
+        for method in [BRISKMatching, KAZEMatching]:
+            template = ImageFrame(self.keypoint_sch)
+
+            def get_matches():
+                _, kp_src, good = method(template, self.keypoint_src, keypoint_matcher="flann")._get_key_points()
+                return [(m.queryIdx, m.trainIdx) for m in good], kp_src
+
+            good, kp_src = get_matches()
+            src_pts = [(int(kp_src[j].pt[0]), int(kp_src[j].pt[1])) for _, j in good]
+            self.assertEqual(len(src_pts), len(set(src_pts)), method.METHOD_NAME)
+            self.assertEqual([i for i, _ in good], sorted(i for i, _ in good))
+            for matches, _ in get_executor("test_flann", 4).map(lambda _: get_matches(), range(8)):
+                self.assertEqual(matches, good, method.METHOD_NAME)
+
     def test_contrib_find_sift(self):
         """SIFT matching (----need OpenCV contrib module----)."""
         # 慢,最稳定
@@ -102,6 +208,290 @@ class TestAircv(unittest.TestCase):
         result = find_all_template(self.template_src, self.template_sch, threshold=self.THRESHOLD, rgb=self.RGB)
         self.assertIsInstance(result, list)
 
+    def test_screen_frame_shared(self):
+        """Derived images of a ScreenFrame are computed once and reused by the matching methods."""
+        frame = ScreenFrame(self.template_src)
+        result = TemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+        result_frame = TemplateMatching(self.template_sch, frame, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+        self.assertEqual(result["rectangle"], result_frame["rectangle"])
+        self.assertEqual(result["confidence"], result_frame["confidence"])
+        gray = frame.gray
+        MultiScaleTemplateMatching(self.template_sch, frame, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+        self.assertIs(frame.gray, gray)
+
+        frame = ScreenFrame(self.keypoint_src)
+        matching = BRISKMatching(self.keypoint_sch, frame, threshold=self.THRESHOLD, rgb=self.RGB)
+        matching.find_best_result()
+        kp_src = frame.keypoints(matching._detector_key(), None)
+        BRISKMatching(self.keypoint_sch, frame, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+        self.assertIs(frame.keypoints(matching._detector_key(), None), kp_src)
+
+    def test_find_template_pyramid(self):
+        """Template matching in pyramid mode gives the same result as the full resolution search."""
+        result = TemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+        for level in [1, 2, 3]:
+            matching = TemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD, rgb=self.RGB, pyramid_level=level)
+            result_pyramid = matching.find_best_result()
+            self.assertAlmostEqual(result["confidence"], result_pyramid["confidence"], places=4)
+        # a template of 141*138 is too small for 4 levels (141 >> 4 < 16)
+        self.assertEqual(TemplateMatching(self.template_sch, self.template_src, pyramid_level=4)._get_pyramid_level(), 3)
+
+    def test_hsv_confidence(self):
+        """Confidence computed on the frame's HSV image equals cal_rgb_confidence."""
+        frame = ScreenFrame(self.template_src)
+        h, w = self.template_sch.shape[:2]
+        for x, y in [(216, 549), (0, 0), (300, 800)]:
+            crop = self.template_src[y:y + h, x:x + w]
+            self.assertEqual(cal_rgb_confidence(crop, self.template_sch),
+                             cal_hsv_confidence(frame.clipped_hsv[y:y + h, x:x + w], ScreenFrame(self.template_sch).clipped_hsv))
+
+    def test_confidence_engine(self):
+        """ConfidenceEngine gives the same confidences as the per-candidate functions."""
+        icon = self.template_sch[20:80, 20:80]
+        screen = np.random.RandomState(0).randint(0, 255, (1920, 1080, 3)).astype(np.uint8)
+        for i in range(10):
+            for j in range(6):
+                screen[100 + i * 170:160 + i * 170, 50 + j * 170:110 + j * 170] = icon
+        screen[100:160, 50:110, 0] = 255 - icon[:, :, 0]
+        points = [(50 + j * 170 + dx, 100 + i * 170 + dy) for i in range(10) for j in range(6) for dx, dy in [(0, 0), (3, 2)]]
+        points += [(216, 549), (0, 0), (300, 800)]
+        for im_search, im_source in [(icon, screen), (self.template_sch, self.template_src)]:
+            h, w = im_search.shape[:2]
+            crops = [im_source[y:y + h, x:x + w] for x, y in points]
+            # one engine scores all the crops, in the buffers it reuses
+            engine = ConfidenceEngine(im_search)
+            self.assertEqual([engine.confidence(crop) for crop in crops], [cal_rgb_confidence(crop, im_search) for crop in crops])
+            engine = ConfidenceEngine(im_search, rgb=False)
+            self.assertEqual([engine.confidence(crop) for crop in crops], [cal_ccoeff_confidence(crop, im_search) for crop in crops])
+            img_hsv, sch_hsv = ImageFrame(im_source).clipped_hsv, ImageFrame(im_search).clipped_hsv
+            hsv_crops = [img_hsv[y:y + h, x:x + w] for x, y in points]
+            expected = [cal_hsv_confidence(crop, sch_hsv) for crop in hsv_crops]
+            engine = ConfidenceEngine(sch_hsv, hsv=True)
+            self.assertEqual([engine.hsv_confidence(crop) for crop in hsv_crops], expected)
+            # with a threshold, only the confidences below it may differ, and stay below it
+            for value, exact in zip([engine.hsv_confidence(crop, 0.9) for crop in hsv_crops], expected):
+                self.assertTrue(value == exact or (value < 0.9 and exact < 0.9))
+        # the find_all results keep the exact confidences
+        for result in TemplateMatching(icon, screen, threshold=self.THRESHOLD, rgb=True).find_all_results(max_count=100):
+            (x, y), _, _, _ = result["rectangle"]
+            self.assertEqual(result["confidence"], cal_rgb_confidence(screen[y:y + 60, x:x + 60], icon))
+
+    def test_multiscale_threads(self):
+        """Matching the scales in parallel gives the same result as in one thread."""
+        result = MultiScaleTemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+        for _ in range(3):
+            result_threads = MultiScaleTemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD,
+                                                        rgb=self.RGB, threads=4).find_best_result()
+            self.assertEqual(result["rectangle"], result_threads["rectangle"])
+            self.assertEqual(result["confidence"], result_threads["confidence"])
+
+    def test_executor_resize(self):
+        """A pool replaced by another size can still be used by the threads that got it before."""
+        executor = get_executor("test_resize", 2)
+        self.assertIsNot(get_executor("test_resize", 3), executor)
+        self.assertEqual(executor.submit(abs, -1).result(), 1)
+        self.assertIs(get_executor("test_resize", 3), get_executor("test_resize", 3))
+
+    def test_scale_hints(self):
+        """The scale ratio found by multi-scale matching is reused and saved to the hints file."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "scale_hints.json")
+            hints = ScaleHints(path)
+            result = MultiScaleTemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD, rgb=self.RGB,
+                                                scale_hints=hints).find_best_result()
+            self.assertEqual(len(hints), 1)
+            # storing the hint is not a lookup
+            self.assertEqual((hints.stats()["hits"], hints.stats()["misses"]), (0, 1))
+            self.assertTrue(os.path.isfile(path))
+            # a new process starts with the hints saved in the file
+            hints = ScaleHints(path)
+            result_hint = MultiScaleTemplateMatching(self.template_sch, self.template_src, threshold=self.THRESHOLD, rgb=self.RGB,
+                                                     scale_hints=hints).find_best_result()
+            self.assertEqual((hints.stats()["hits"], hints.stats()["misses"]), (1, 0))
+            self.assertEqual(result["rectangle"], result_hint["rectangle"])
+            # the changes are saved at most every SAVE_INTERVAL seconds, and by flush()
+            hints.put("other", 1.0)
+            hints.put("other", 1.5)
+            self.assertEqual(ScaleHints(path).get("other"), 1.0)
+            hints.flush()
+            self.assertEqual(ScaleHints(path).get("other"), 1.5)
+            # instances are not kept alive until exit, only SCALE_HINTS of airtest.core.cv is flushed then
+            ref = weakref.ref(hints)
+            del hints
+            gc.collect()
+            self.assertIsNone(ref())
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_strategy_stats(self):
+        """Methods with enough tries are sorted by expected time to hit, and the statistics are saved."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, "strategy.json")
+            stats = StrategyStats(path)
+            methods = ["mstpl", "tpl", "sift", "brisk"]
+            self.assertEqual(stats.order("a.png", methods), methods)
+            for _ in range(StrategyStats.MIN_TRIES):
+                stats.record("a.png", [("mstpl", False, 0.2), ("tpl", False, 0.05), ("sift", True, 0.4)])
+            # brisk was never tried and keeps its place
+            self.assertEqual(stats.order("a.png", methods), ["sift", "tpl", "mstpl", "brisk"])
+            self.assertEqual(stats.order("b.png", methods), methods)
+            stats.flush()
+            stats = StrategyStats(path)
+            self.assertEqual(stats.get("a.png")["sift"][:2], [3, 3])
+            self.assertIn("a.png: sift > tpl > mstpl > brisk", format_stats(stats, methods))
+            # not kept alive until exit, only STRATEGY_STATS of airtest.core.cv is flushed then
+            ref = weakref.ref(stats)
+            del stats
+            gc.collect()
+            self.assertIsNone(ref())
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_keypoint_cache(self):
+        """Keypoints of the template are loaded from the cache dir, only the screen is detected."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            detected = []
+
+            class CountingBRISK(BRISKMatching):
+                def get_keypoints_and_descriptors(self, image):
+                    detected.append(image.shape)
+                    return super(CountingBRISK, self).get_keypoints_and_descriptors(image)
+
+            result = BRISKMatching(self.keypoint_sch, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB).find_best_result()
+            CountingBRISK(self.keypoint_sch, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB,
+                          keypoint_cache=KeypointCache(tmpdir)).find_best_result()
+            self.assertEqual(len(detected), 2)
+            # a new process starts with the keypoints saved in the cache dir
+            result_cached = CountingBRISK(self.keypoint_sch, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB,
+                                          keypoint_cache=KeypointCache(tmpdir)).find_best_result()
+            self.assertEqual(detected[2:], [self.keypoint_src.shape])
+            self.assertEqual(result["rectangle"], result_cached["rectangle"])
+            self.assertEqual(result["confidence"], result_cached["confidence"])
+            # another image or detector is another entry
+            self.assertNotEqual(KeypointCache.make_key(self.keypoint_sch, "BRISK []"), KeypointCache.make_key(self.keypoint_src, "BRISK []"))
+            self.assertNotEqual(KeypointCache.make_key(self.keypoint_sch, "BRISK []"), KeypointCache.make_key(self.keypoint_sch, "ORB []"))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_detector_pool(self):
+        """Detector and matcher objects are reused within a thread, not across threads."""
+        def get_detector():
+            matching = BRISKMatching(self.keypoint_sch, self.keypoint_src, threshold=self.THRESHOLD, rgb=self.RGB)
+            matching.find_best_result()
+            return matching.detector
+
+        detector = get_detector()
+        self.assertIs(get_detector(), detector)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(get_detector()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], detector)
+
+    def test_filter_good_matches(self):
+        """The vectorized ratio test and de-duplication keep the same matches as the original loops."""
+        def filter_with_loops(matching, matches, kp_src):
+            good = []
+            for m, n in matches:
+                if m.distance < matching.FILTER_RATIO * n.distance:
+                    good.append(m)
+            good_diff, diff_good_point = [], [[]]
+            for m in good:
+                diff_point = [int(kp_src[m.trainIdx].pt[0]), int(kp_src[m.trainIdx].pt[1])]
+                if diff_point not in diff_good_point:
+                    good_diff.append(m)
+                    diff_good_point.append(diff_point)
+            return good_diff
+
+        high_dpi = imread("../benchmark/sample/high_dpi/tpl1551944272194.png")
+        rich_texture = imread("../benchmark/sample/rich_texture/search.png")
+        text = imread("../benchmark/sample/text/search.png")
+        pairs = [
+            (self.keypoint_sch, self.keypoint_src),
+            (imread("../benchmark/sample/high_dpi/tpl1551940579340.png"), high_dpi),
+            (cv2.resize(rich_texture, None, fx=0.8, fy=0.8), rich_texture),
+            (cv2.resize(text, None, fx=0.8, fy=0.8), text),
+        ]
+        for method in [KAZEMatching, BRISKMatching, AKAZEMatching, ORBMatching]:
+            for im_search, im_source in pairs:
+                matching = method(im_search, im_source)
+                matching.init_detector()
+                kp_sch, des_sch = matching.get_keypoints_and_descriptors(im_search)
+                kp_src, des_src = matching.get_keypoints_and_descriptors(im_source)
+                matches = matching.match_keypoints(des_sch, des_src)
+                good = matching._filter_good_matches(matches, kp_src)
+                expected = filter_with_loops(matching, matches, kp_src)
+                self.assertTrue(expected, method.METHOD_NAME)
+                self.assertEqual([(m.queryIdx, m.trainIdx) for m in good],
+                                 [(m.queryIdx, m.trainIdx) for m in expected], method.METHOD_NAME)
+
+    def test_changed_area(self):
+        """changed_area() bounds the changed pixels, None for identical frames."""
+        frame = ScreenFrame(self.template_src)
+        self.assertIsNone(changed_area(frame, ScreenFrame(self.template_src.copy()), 4))
+        changed = self.template_src.copy()
+        changed[100:110, 200:230] = 255 - changed[100:110, 200:230]
+        xmin, ymin, xmax, ymax = changed_area(frame, ScreenFrame(changed), 4)
+        self.assertTrue(xmin <= 200 and ymin <= 100 and xmax >= 230 and ymax >= 110)
+        self.assertTrue(xmax - xmin <= 60 and ymax - ymin <= 40)
+        self.assertEqual(changed_area(frame, ScreenFrame(self.template_sch), 4), (0, 0, 138, 141))
+
+
+class TestReducedDecode(unittest.TestCase):
+    """Test decoding jpg/png frames at a reduced size."""
+
+    @classmethod
+    def setUpClass(cls):
+        img = imread(os.path.join(os.path.dirname(__file__), "matching_images", "keypoint_screen.png"))
+        cls.img = cv2.resize(img, (1440, 2560))
+        cls.jpg = cv2.imencode(".jpg", cls.img)[1].tobytes()
+        cls.png = cv2.imencode(".png", cls.img)[1].tobytes()
+
+    def test_image_size(self):
+        self.assertEqual(image_size(self.jpg), (1440, 2560))
+        self.assertEqual(image_size(self.png), (1440, 2560))
+        self.assertEqual(image_size(memoryview(self.jpg)), (1440, 2560))
+        self.assertIsNone(image_size(b"not an image"))
+        self.assertIsNone(image_size(self.jpg[:20]))
+
+    def test_string_2_img(self):
+        full = string_2_img(self.jpg)
+        self.assertEqual(full.shape, (2560, 1440, 3))
+        for max_size in (800, 2000, 3000):
+            size = (1440 * max_size // 2560, max_size)
+            expected = cv2.resize(full, size, interpolation=cv2.INTER_AREA) if max_size < 2560 else full
+            for data in (self.jpg, self.png):
+                reduced = string_2_img(data, max_size=max_size)
+                self.assertEqual(reduced.shape, expected.shape)
+                # libjpeg的缩小解码与完整解码后缩小的结果接近
+                self.assertLess(cv2.absdiff(reduced, expected).mean(), 3)
+        self.assertEqual(string_2_img(self.jpg, max_size=300).shape, (300, 168, 3))
+        self.assertIsNone(string_2_img(b"not an image", max_size=800))
+
+    def test_resize_by_max(self):
+        self.assertEqual(resize_by_max(self.img, 800).shape, (800, 450, 3))
+        self.assertIs(resize_by_max(self.img, 3000), self.img)
+        # 按完整图像的尺寸缩放缩小解码的图像
+        self.assertEqual(resize_by_max(self.img[::2, ::2], 800, size=(1440, 2560)).shape, (800, 450, 3))
+        self.assertEqual(resize_by_max(None, 800).shape, (800, 800, 3))
+
+    def test_encoded_frame(self):
+        frame = EncodedFrame(self.jpg)
+        self.assertEqual(frame.size, (1440, 2560))
+        reduced = frame.resized(800)
+        self.assertEqual(reduced.shape, (800, 450, 3))
+        self.assertIs(frame.resized(800), reduced)
+        # 只解码了缩小的图像
+        self.assertNotIn("image", frame._derived)
+        self.assertIs(frame.resized(3000), frame.image)
+        self.assertEqual(frame.gray.shape, (2560, 1440))
+        # 完整图像已解码时,由它缩小
+        self.assertEqual(frame.resized(400).shape, (400, 225, 3))
+        self.assertEqual(frame.to_json(), "<EncodedFrame 1440x2560>")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,527 @@
+# encoding=utf-8
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+import numpy as np
+from unittest import mock
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from airtest import aircv
+from airtest.core.api import find_any, wait_any, exists_many
+from airtest.aircv.frame import ScreenFrame, EncodedFrame, as_frame
+from airtest.aircv.match_service import MatchService, get_match_service
+from airtest.aircv.keypoint_matching import BRISKMatching
+from airtest.core.cv import Template, TEMPLATE_CACHE, SCREEN_KEYPOINT_CACHE, STRATEGY_STATS, MATCH_HISTORY, ROI_STATS, loop_find, loop_find_any, try_log_screen
+from airtest.core.error import TargetNotFoundError, InvalidMatchingMethodError
+from airtest.core.helper import G
+from airtest.core.settings import Settings as ST
+
+THISDIR = os.path.dirname(__file__)
+IMG_DIR = os.path.join(THISDIR, "matching_images")
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = aircv.imread(os.path.join(IMG_DIR, "template_screen.png"))
+        cls.search_file = os.path.join(IMG_DIR, "template_search.png")
+
+    def setUp(self):
+        TEMPLATE_CACHE.clear()
+
+    def test_cached_between_matches(self):
+        tpl = Template(self.search_file, resolution=(1080, 1920))
+        self.assertTrue(tpl.match_in(self.screen))
+        self.assertTrue(tpl.match_in(self.screen))
+        stats = TEMPLATE_CACHE.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+        # another Template object of the same file shares the entry
+        Template(self.search_file, resolution=(1080, 1920)).match_in(self.screen)
+        self.assertEqual(TEMPLATE_CACHE.stats()["hits"], 2)
+
+    def test_prepared_forms(self):
+        tpl = Template(self.search_file, resolution=(540, 960))
+        prepared = tpl._get_prepared_template(self.screen)
+        h, w = prepared.image.shape[:2]
+        self.assertEqual(prepared.resized.shape[:2], (h * 2, w * 2))
+        self.assertEqual(prepared.resized.gray.shape, (h * 2, w * 2))
+        # a different screen resolution is another entry
+        tpl._get_prepared_template(aircv.crop_image(self.screen, (0, 0, 540, 960)))
+        self.assertEqual(len(TEMPLATE_CACHE), 2)
+
+    def test_invalidate_on_mtime(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(tmpdir, "tpl.png")
+            shutil.copy(self.search_file, filepath)
+            tpl = Template(filepath)
+            tpl._get_prepared_template(self.screen)
+            os.utime(filepath, (0, 0))
+            tpl._get_prepared_template(self.screen)
+            self.assertEqual(TEMPLATE_CACHE.stats()["misses"], 2)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_disabled(self):
+        cache_size = ST.TEMPLATE_CACHE_SIZE
+        ST.TEMPLATE_CACHE_SIZE = 0
+        try:
+            tpl = Template(self.search_file)
+            tpl._get_prepared_template(self.screen)
+            tpl._get_prepared_template(self.screen)
+            self.assertEqual(len(TEMPLATE_CACHE), 0)
+        finally:
+            ST.TEMPLATE_CACHE_SIZE = cache_size
+
+
+class TestRoiTracking(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = aircv.imread(os.path.join(IMG_DIR, "template_screen.png"))
+        cls.search_file = os.path.join(IMG_DIR, "template_search.png")
+
+    def setUp(self):
+        MATCH_HISTORY.clear()
+        self._cvstrategy, self._roi_tracking = ST.CVSTRATEGY, ST.ROI_TRACKING
+        ST.ROI_TRACKING = True
+
+    def tearDown(self):
+        ST.CVSTRATEGY, ST.ROI_TRACKING = self._cvstrategy, self._roi_tracking
+
+    def _match_twice(self, screen2, resolution=(1080, 1920)):
+        pos = Template(self.search_file, resolution=resolution).match_in(self.screen)
+        stats = dict(ROI_STATS)
+        # a new Template object of the same file shares the history
+        pos2 = Template(self.search_file, resolution=resolution).match_in(screen2)
+        return pos, pos2, ROI_STATS["hits"] - stats["hits"], ROI_STATS["fallbacks"] - stats["fallbacks"]
+
+    def test_hit(self):
+        for method in ["tpl", "mstpl", "brisk"]:
+            MATCH_HISTORY.clear()
+            ST.CVSTRATEGY = [method]
+            pos, pos2, hits, fallbacks = self._match_twice(self.screen)
+            self.assertEqual((hits, fallbacks), (1, 0), method)
+            self.assertLessEqual(abs(pos[0] - pos2[0]) + abs(pos[1] - pos2[1]), 2, method)
+
+    def test_fallback(self):
+        ST.CVSTRATEGY = ["tpl"]
+        moved = np.roll(self.screen, 400, axis=0)
+        pos, pos2, hits, fallbacks = self._match_twice(moved)
+        self.assertEqual((hits, fallbacks), (0, 1))
+        self.assertEqual(pos2, (pos[0], pos[1] + 400))
+
+    def test_other_resolution(self):
+        ST.CVSTRATEGY = ["tpl"]
+        pos, pos2, hits, fallbacks = self._match_twice(aircv.crop_image(self.screen, (0, 0, 1000, 1800)), resolution=())
+        self.assertEqual((hits, fallbacks), (0, 0))
+        self.assertTrue(pos2)
+
+    def test_other_record_resolution(self):
+        # the same file recorded at another resolution is another template, with its own history
+        ST.CVSTRATEGY = ["tpl"]
+        Template(self.search_file, resolution=(1080, 1920)).match_in(self.screen)
+        stats = dict(ROI_STATS)
+        self.assertTrue(Template(self.search_file, resolution=()).match_in(self.screen))
+        self.assertEqual(ROI_STATS, stats)
+        self.assertEqual(len(MATCH_HISTORY), 2)
+
+    def test_disabled(self):
+        ST.CVSTRATEGY = ["tpl"]
+        ST.ROI_TRACKING = False
+        self.assertEqual(self._match_twice(self.screen)[2:], (0, 0))
+
+
+class TestScreenKeypointCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = aircv.imread(os.path.join(IMG_DIR, "keypoint_screen.png"))
+
+    def setUp(self):
+        MATCH_HISTORY.clear()
+        SCREEN_KEYPOINT_CACHE.clear()
+        self._cvstrategy = ST.CVSTRATEGY
+
+    def tearDown(self):
+        ST.CVSTRATEGY = self._cvstrategy
+
+    def _stats(self):
+        stats = SCREEN_KEYPOINT_CACHE.stats()
+        return stats["misses"], stats["hits"]
+
+    def test_shared_between_templates(self):
+        ST.CVSTRATEGY = ["brisk"]
+        frame = ScreenFrame(self.screen)
+        self.assertTrue(Template(os.path.join(IMG_DIR, "keypoint_search.png")).match_in(frame))
+        # another template on the same frame
+        Template(os.path.join(IMG_DIR, "template_search.png")).match_in(frame)
+        self.assertEqual(self._stats(), (1, 1))
+        # each detector has its own entry
+        ST.CVSTRATEGY = ["akaze"]
+        Template(os.path.join(IMG_DIR, "keypoint_search.png")).match_in(frame)
+        self.assertEqual(self._stats(), (2, 1))
+        # another frame is another screen, its content is not compared
+        Template(os.path.join(IMG_DIR, "keypoint_search.png")).match_in(ScreenFrame(self.screen))
+        self.assertEqual(self._stats(), (3, 1))
+
+    def test_areas(self):
+        ST.CVSTRATEGY = ["brisk"]
+        frame = ScreenFrame(self.screen)
+        template = Template(os.path.join(IMG_DIR, "keypoint_search.png"))
+        prepared = template._get_prepared_template(frame)
+        func = Template._get_matching_method("brisk")
+        for i in range(2):
+            template._find_result_in_area(func, prepared.resized, frame, (0, 0, 800, 800))
+        self.assertEqual(self._stats(), (1, 1))
+        template._find_result_in_area(func, prepared.resized, frame, (0, 0, 600, 600))
+        self.assertEqual(self._stats(), (2, 1))
+
+    def test_disabled(self):
+        ST.CVSTRATEGY = ["brisk"]
+        cache_size = ST.SCREEN_KEYPOINT_CACHE_SIZE
+        ST.SCREEN_KEYPOINT_CACHE_SIZE = 0
+        try:
+            Template(os.path.join(IMG_DIR, "keypoint_search.png")).match_in(self.screen)
+            self.assertEqual(len(SCREEN_KEYPOINT_CACHE), 0)
+        finally:
+            ST.SCREEN_KEYPOINT_CACHE_SIZE = cache_size
+
+
+class TestCvstrategyRace(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = aircv.imread(os.path.join(IMG_DIR, "keypoint_screen.png"))
+        cls.search_file = os.path.join(IMG_DIR, "keypoint_search.png")
+
+    def setUp(self):
+        MATCH_HISTORY.clear()
+        self._cvstrategy, self._race = ST.CVSTRATEGY, ST.CVSTRATEGY_RACE
+        ST.CVSTRATEGY_RACE = True
+
+    def tearDown(self):
+        ST.CVSTRATEGY, ST.CVSTRATEGY_RACE = self._cvstrategy, self._race
+
+    def _match(self, screen, race):
+        MATCH_HISTORY.clear()
+        ST.CVSTRATEGY_RACE = race
+        return Template(self.search_file)._cv_match(as_frame(screen, ScreenFrame))
+
+    def test_priority_order(self):
+        ST.CVSTRATEGY = ["tpl", "brisk"]
+        ret = self._match(self.screen, True)
+        self.assertEqual(ret["method"], "tpl")
+        self.assertIn("tpl", ret["timings"])
+        self.assertEqual(ret["rectangle"], self._match(self.screen, False)["rectangle"])
+
+    def test_first_method_missed(self):
+        # tpl misses the scaled screen, brisk finds it
+        ST.CVSTRATEGY = ["tpl", "brisk"]
+        screen = aircv.cv2.resize(self.screen, None, fx=0.8, fy=0.8)
+        ret = self._match(screen, True)
+        self.assertEqual(ret["method"], "brisk")
+        self.assertEqual(set(ret["timings"]), {"tpl", "brisk"})
+        self.assertEqual(ret["rectangle"], self._match(screen, False)["rectangle"])
+
+    def test_invalid_method(self):
+        ST.CVSTRATEGY = ["tpl", "nothing"]
+        with self.assertRaises(InvalidMatchingMethodError):
+            self._match(self.screen, True)
+
+
+class TestMatchService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = aircv.imread(os.path.join(IMG_DIR, "keypoint_screen.png"))
+        cls.search_file = os.path.join(IMG_DIR, "keypoint_search.png")
+
+    def setUp(self):
+        MATCH_HISTORY.clear()
+        self._cvstrategy, self._processes = ST.CVSTRATEGY, ST.MATCH_PROCESSES
+        ST.CVSTRATEGY = ["brisk"]
+
+    def tearDown(self):
+        ST.CVSTRATEGY, ST.MATCH_PROCESSES = self._cvstrategy, self._processes
+
+    def test_same_result(self):
+        ST.MATCH_PROCESSES = 0
+        expected = Template(self.search_file)._cv_match(ScreenFrame(self.screen))
+        MATCH_HISTORY.clear()
+        ST.MATCH_PROCESSES = 1
+        service = get_match_service(1)
+        with mock.patch.object(service, "match", wraps=service.match) as match:
+            ret = Template(self.search_file)._cv_match(ScreenFrame(self.screen))
+        match.assert_called_once()
+        self.assertEqual(ret["result"], expected["result"])
+        self.assertEqual(ret["rectangle"], expected["rectangle"])
+        self.assertAlmostEqual(ret["confidence"], expected["confidence"], places=5)
+
+    def test_no_shared_memory_warning(self):
+        # the workers must not register the blocks of the main process to the resource_tracker:
+        # it warns about leaked blocks and unlinks them again, or fails to unregister them
+        script = "\n".join([
+            "import multiprocessing",
+            "from airtest import aircv",
+            "from airtest.aircv.keypoint_matching import BRISKMatching",
+            "from airtest.aircv.match_service import get_match_service",
+            "if __name__ == '__main__':",
+            "    multiprocessing.set_start_method('spawn')",
+            "    screen, search = aircv.imread(%r), aircv.imread(%r)" % (os.path.join(IMG_DIR, "keypoint_screen.png"),
+                                                                       self.search_file),
+            "    service = get_match_service(1)",
+            "    for i in range(3):",
+            "        assert service.match(BRISKMatching, search, screen.copy())",
+            "    service.shutdown()",
+        ])
+        env = dict(os.environ, PYTHONPATH=os.path.abspath(os.path.join(THISDIR, "..")))
+        proc = subprocess.run([sys.executable, "-W", "always", "-c", script], env=env, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, universal_newlines=True, timeout=120)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        errors = [line for line in proc.stderr.splitlines() if "DEBUG" not in line]
+        self.assertEqual(errors, [])
+
+    def test_replaced_service(self):
+        """A service replaced by another number of processes is still usable by the threads holding it."""
+        service = get_match_service(1)
+        self.assertIsNot(get_match_service(2), service)
+        self.assertTrue(service.match(BRISKMatching, aircv.imread(self.search_file), self.screen))
+
+    def test_fallback_in_process(self):
+        expected = BRISKMatching(aircv.imread(self.search_file), self.screen).find_best_result()
+        service = MatchService(1)
+        service.shutdown()
+        self.assertEqual(service.match(BRISKMatching, aircv.imread(self.search_file), self.screen)["result"], expected["result"])
+        # a broken pool is replaced by get_match_service()
+        service = get_match_service(1)
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        with mock.patch.object(service, "submit", return_value=future):
+            ret = service.match(BRISKMatching, aircv.imread(self.search_file), self.screen)
+        self.assertEqual(ret["result"], expected["result"])
+        self.assertTrue(service.broken)
+        self.assertIsNot(get_match_service(1), service)
+
+    def test_not_found(self):
+        ST.MATCH_PROCESSES = 1
+        self.assertIsNone(Template(self.search_file)._cv_match(ScreenFrame(np.zeros_like(self.screen))))
+
+
+class TestAdaptiveCvstrategy(unittest.TestCase):
+
+    def setUp(self):
+        STRATEGY_STATS.clear()
+        self._settings = ST.CVSTRATEGY, ST.ADAPTIVE_CVSTRATEGY, ST.ROI_TRACKING
+        ST.CVSTRATEGY, ST.ADAPTIVE_CVSTRATEGY, ST.ROI_TRACKING = ["tpl", "brisk"], True, False
+
+    def tearDown(self):
+        ST.CVSTRATEGY, ST.ADAPTIVE_CVSTRATEGY, ST.ROI_TRACKING = self._settings
+        STRATEGY_STATS.clear()
+
+    def test_reorder(self):
+        # tpl misses the scaled screen, brisk finds it
+        screen = aircv.cv2.resize(aircv.imread(os.path.join(IMG_DIR, "keypoint_screen.png")), None, fx=0.8, fy=0.8)
+        tpl = Template(os.path.join(IMG_DIR, "keypoint_search.png"))
+        for _ in range(STRATEGY_STATS.MIN_TRIES):
+            self.assertEqual(tpl._get_cvstrategy(), ["tpl", "brisk"])
+            self.assertTrue(tpl.match_in(screen))
+        self.assertEqual(tpl._get_cvstrategy(), ["brisk", "tpl"])
+        with mock.patch.object(Template, "_match_with_method", autospec=True, side_effect=Template._match_with_method) as match:
+            tpl.match_in(screen)
+        self.assertEqual([call[0][1] for call in match.call_args_list], ["brisk"])
+
+    def test_same_name_other_dir(self):
+        screen = aircv.cv2.resize(aircv.imread(os.path.join(IMG_DIR, "keypoint_screen.png")), None, fx=0.8, fy=0.8)
+        tmpdir = tempfile.mkdtemp()
+        basedir = list(G.BASEDIR)
+        try:
+            # the same file name in the directories of two scripts
+            shutil.copy(os.path.join(IMG_DIR, "keypoint_search.png"), tmpdir)
+            G.BASEDIR[:] = [IMG_DIR]
+            tpl = Template("keypoint_search.png")
+            for _ in range(STRATEGY_STATS.MIN_TRIES):
+                tpl.match_in(screen)
+            self.assertEqual(tpl._get_cvstrategy(), ["brisk", "tpl"])
+            G.BASEDIR[:] = [tmpdir]
+            self.assertEqual(Template("keypoint_search.png")._get_cvstrategy(), ["tpl", "brisk"])
+        finally:
+            G.BASEDIR[:] = basedir
+            shutil.rmtree(tmpdir)
+
+    def test_disabled(self):
+        ST.ADAPTIVE_CVSTRATEGY = False
+        Template(os.path.join(IMG_DIR, "template_search.png")).match_in(aircv.imread(os.path.join(IMG_DIR, "template_screen.png")))
+        self.assertEqual(len(STRATEGY_STATS), 0)
+
+
+class FakeDevice(object):
+    """Device returning the same screen image, or the next of screens at each snapshot, counting the snapshots."""
+
+    def __init__(self, screen, screens=None):
+        self.screen = screen
+        self.screens = list(screens or [])
+        self.snapshot_count = 0
+
+    def snapshot(self, filename=None, quality=None, **kwargs):
+        self.snapshot_count += 1
+        if self.screens:
+            self.screen = self.screens.pop(0)
+        return self.screen
+
+
+class TestFindAny(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.missing_file = os.path.join(cls.tmpdir, "noise.png")
+        aircv.imwrite(cls.missing_file, np.random.RandomState(0).randint(0, 256, (120, 160, 3)).astype(np.uint8))
+        cls.device = FakeDevice(aircv.imread(os.path.join(IMG_DIR, "template_screen.png")))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        MATCH_HISTORY.clear()
+        self._device, self._cvstrategy = G._DEVICE, ST.CVSTRATEGY
+        G.DEVICE = self.device
+        ST.CVSTRATEGY = ["tpl"]
+        self.device.snapshot_count = 0
+        self.found = Template(os.path.join(IMG_DIR, "template_search.png"))
+        self.found2 = Template(os.path.join(IMG_DIR, "keypoint_search.png"))
+        self.missing = Template(self.missing_file)
+
+    def tearDown(self):
+        G.DEVICE, ST.CVSTRATEGY = self._device, self._cvstrategy
+
+    def test_loop_find_any(self):
+        positions = loop_find_any([self.missing, self.found, self.found2], timeout=0)
+        self.assertIsNone(positions[0])
+        self.assertEqual(positions[1], self.found.match_in(self.device.screen))
+        # the templates after the first one found are not required
+        self.assertEqual(self.device.snapshot_count, 1)
+        positions = loop_find_any([self.missing, self.found, self.found2], timeout=0, find_all=True)
+        self.assertEqual(positions[2], self.found2.match_in(self.device.screen))
+
+    def test_not_found(self):
+        with self.assertRaises(TargetNotFoundError):
+            loop_find_any([self.missing], timeout=0)
+
+    def test_api(self):
+        index, pos = wait_any([self.missing, self.found2, self.found])
+        self.assertEqual(index, 1)
+        self.assertEqual(find_any([self.found, self.found2])[0], 0)
+        ok, missing, ok2 = exists_many([self.found, self.missing, self.found2])
+        self.assertTrue(ok and ok2)
+        self.assertFalse(missing)
+        self.assertEqual(self.device.snapshot_count, 3)
+
+    def test_api_not_found(self):
+        find_timeout = ST.FIND_TIMEOUT_TMP
+        ST.FIND_TIMEOUT_TMP = 0
+        try:
+            self.assertFalse(find_any([self.missing]))
+            self.assertEqual(exists_many([self.missing, self.missing]), [False, False])
+        finally:
+            ST.FIND_TIMEOUT_TMP = find_timeout
+
+
+class TestFrameDiffGating(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.screen = aircv.imread(os.path.join(IMG_DIR, "template_screen.png"))
+        cls.search_file = os.path.join(IMG_DIR, "template_search.png")
+        # template_screen.png has 3 copies of template_search.png, the first one at (216, 549) - (354, 690)
+        cls.blank_screen = cls.screen.copy()
+        for x, y in [(216, 549), (566, 80), (778, 790)]:
+            cls.blank_screen[y:y + 141, x:x + 138] = 0
+        cls.shown_screen = cls.blank_screen.copy()
+        cls.shown_screen[549:690, 216:354] = cls.screen[549:690, 216:354]
+
+    def setUp(self):
+        MATCH_HISTORY.clear()
+        self._device, self._cvstrategy, self._diff_threshold = G._DEVICE, ST.CVSTRATEGY, ST.FRAME_DIFF_THRESHOLD
+        ST.CVSTRATEGY = ["tpl"]
+        ST.FRAME_DIFF_THRESHOLD = 4
+
+    def tearDown(self):
+        G.DEVICE, ST.CVSTRATEGY, ST.FRAME_DIFF_THRESHOLD = self._device, self._cvstrategy, self._diff_threshold
+
+    def _loop_find(self, screens, **kwargs):
+        G.DEVICE = FakeDevice(screens[-1], screens)
+        with mock.patch.object(Template, "_match_screen", autospec=True, side_effect=Template._match_screen) as match:
+            try:
+                return loop_find(Template(self.search_file), interval=0.01, **kwargs)
+            finally:
+                self.calls = match.call_args_list
+
+    def test_skip_unchanged(self):
+        with self.assertRaises(TargetNotFoundError):
+            self._loop_find([self.blank_screen], timeout=0.5)
+        self.assertGreater(G.DEVICE.snapshot_count, 2)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_match_dirty_area(self):
+        pos = self._loop_find([self.blank_screen, self.blank_screen, self.shown_screen], timeout=1)
+        self.assertEqual(pos, Template(self.search_file).match_in(self.shown_screen))
+        self.assertEqual(len(self.calls), 2)
+        xmin, ymin, xmax, ymax = self.calls[-1][0][2]
+        self.assertTrue(xmin <= 216 and ymin <= 549 and xmax >= 354 and ymax >= 690)
+        self.assertLess((xmax - xmin) * (ymax - ymin), 200 * 200)
+
+    def test_gradual_change(self):
+        """Changes below the threshold between snapshots add up until the screen is matched again."""
+        # 100 steps fade-in of the template, each step changes the pixels by 3 at most
+        fade_in = [aircv.cv2.addWeighted(self.shown_screen, i / 100.0, self.blank_screen, 1 - i / 100.0, 0) for i in range(101)]
+        pos = self._loop_find(fade_in, timeout=10)
+        self.assertEqual(pos, Template(self.search_file).match_in(self.shown_screen))
+        self.assertLess(len(self.calls), G.DEVICE.snapshot_count)
+
+    def test_disabled(self):
+        ST.FRAME_DIFF_THRESHOLD = 0
+        with self.assertRaises(TargetNotFoundError):
+            self._loop_find([self.blank_screen], timeout=0.1)
+        self.assertEqual(len(self.calls), G.DEVICE.snapshot_count)
+
+
+class TestTryLogScreen(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self._device, self._log_dir, self._save_image = G._DEVICE, ST.LOG_DIR, ST.SAVE_IMAGE
+        ST.LOG_DIR, ST.SAVE_IMAGE = self.tmpdir, True
+        screen = aircv.cv2.resize(aircv.imread(os.path.join(IMG_DIR, "keypoint_screen.png")), (1440, 2560))
+        self.frame = EncodedFrame(aircv.cv2.imencode(".jpg", screen)[1].tobytes())
+        G.DEVICE = mock.Mock(snapshot_frame=mock.Mock(return_value=self.frame))
+
+    def tearDown(self):
+        G.DEVICE, ST.LOG_DIR, ST.SAVE_IMAGE = self._device, self._log_dir, self._save_image
+        shutil.rmtree(self.tmpdir)
+
+    def test_encoded_frame(self):
+        """A screenshot logged at a reduced size is not decoded at full size."""
+        ret = try_log_screen(max_size=800)
+        self.assertEqual(ret["resolution"], (1440, 2560))
+        self.assertEqual(aircv.imread(os.path.join(self.tmpdir, ret["screen"])).shape, (800, 450, 3))
+        self.assertNotIn("image", self.frame._derived)
+        self.assertFalse(G.DEVICE.snapshot.called)
+
+    def test_fallback(self):
+        G.DEVICE.snapshot_frame.return_value = None
+        G.DEVICE.snapshot.return_value = self.frame.image
+        ret = try_log_screen()
+        self.assertEqual(ret["resolution"], (1440, 2560))
+        self.assertTrue(G.DEVICE.snapshot.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
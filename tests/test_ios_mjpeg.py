@@ -1,10 +1,14 @@
 # encoding=utf-8
 import os
 import time
+import socket
+import threading
 import unittest
 from airtest.core.ios.ios import IOS, CAP_METHOD
+from airtest.core.ios.mjpeg_cap import MJpegcap, SocketBuffer
 from airtest import aircv
 from .testconf import try_remove, is_port_open
+from .fake_wda_mjpeg import FakeMjpegServer
 import warnings
 warnings.simplefilter("always")
 
@@ -73,3 +77,52 @@ class TestIosMjpeg(unittest.TestCase):
             self.assertTrue(is_port_open(self.mjpeg_server.ip, self.mjpeg_server.port))
             self.mjpeg_server.teardown_stream()
             self.assertFalse(is_port_open(self.mjpeg_server.ip, self.mjpeg_server.port))
+
+
+class TestMjpegParser(unittest.TestCase):
+    """MJpegcap against a fake WDA MJPEG server, no device needed"""
+
+    def _mjpegcap(self, **kwargs):
+        self.server = FakeMjpegServer(**kwargs)
+        self.addCleanup(self.server.close)
+        cap = MJpegcap(ip="127.0.0.1", port=self.server.port)
+        self.addCleanup(cap.teardown_stream)
+        return cap
+
+    def _levels(self, cap, count):
+        return [FakeMjpegServer.frame_level(aircv.utils.string_2_img(cap.get_frame_from_stream())) for i in range(count)]
+
+    def test_content_length(self):
+        cap = self._mjpegcap()
+        levels = self._levels(cap, 5)
+        self.assertEqual(levels, list(range(levels[0], levels[0] + 5)))
+
+    def test_boundary_scan(self):
+        cap = self._mjpegcap(content_length=False)
+        levels = self._levels(cap, 5)
+        self.assertEqual(levels, list(range(levels[0], levels[0] + 5)))
+
+    def test_drop_stale(self):
+        cap = self._mjpegcap(interval=0.01)
+        first = self._levels(cap, 1)[0]
+        time.sleep(0.5)
+        # the frames sent during the sleep are read in order
+        self.assertEqual(self._levels(cap, 1)[0], first + 1)
+        cap.drop_stale = True
+        time.sleep(0.5)
+        latest = self._levels(cap, 1)[0]
+        self.assertGreaterEqual(latest, (self.server.frames_sent - 3) % 256)
+
+    def test_socket_buffer(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        buf = SocketBuffer(b)
+        self.addCleanup(buf.close)
+        big = os.urandom(SocketBuffer.RECV_SIZE * 3)
+        sender = threading.Thread(target=a.sendall, args=(b"header\r\n" + big + b"--end--" + big,))
+        sender.start()
+        self.addCleanup(sender.join)
+        self.assertEqual(buf.read_until(b"\r\n"), b"header")
+        # the delimiter is found after the buffer grew
+        self.assertEqual(buf.read_until(b"--end--"), big)
+        self.assertEqual(bytes(buf.read_bytes(len(big))), big)
@@ -2,11 +2,14 @@
 from airtest.core.android.android import Android
 from airtest.core.android.cap_methods.minicap import Minicap
 from airtest.aircv.utils import string_2_img
+from airtest.aircv.frame import EncodedFrame
 from numpy import ndarray
 from .testconf import PKG
+from .fake_minicap import FakeMinicapServer
 import time
 import unittest
 import warnings
+from unittest import mock
 warnings.simplefilter("always")
 
 
@@ -92,5 +95,85 @@ class TestMinicapSetup(TestMinicapBase):
         self.assertEqual(self._count_server_proc(), 0)
 
 
+class TestMinicapPrefetch(unittest.TestCase):
+    """Prefetch mode against a fake minicap server, no device needed"""
+
+    def setUp(self):
+        self.server = FakeMinicapServer()
+        self.minicap = self.server.patch(Minicap(mock.Mock()))
+        self.minicap.start_prefetch()
+
+    def tearDown(self):
+        self.minicap.stop_prefetch()
+        self.server.close()
+
+    def test_snapshot(self):
+        screen = self.minicap.snapshot()
+        self.assertIsInstance(screen, ndarray)
+        self.assertEqual(screen.shape[:2], (240, 320))
+        # minicap runs in non-lazy mode, frames are pushed by the server
+        self.assertFalse(self.server.lazy)
+
+    def test_snapshot_frame(self):
+        frame = self.minicap.snapshot_frame()
+        self.assertIsInstance(frame, EncodedFrame)
+        self.assertEqual(frame.size, (320, 240))
+        self.assertEqual(frame.resized(160).shape[:2], (120, 160))
+
+    def test_newer_than(self):
+        frame = self.minicap.get_latest_frame()
+        newer = self.minicap.get_latest_frame(newer_than=frame.seq)
+        self.assertGreater(newer.seq, frame.seq)
+        self.assertGreaterEqual(newer.timestamp, frame.timestamp)
+        self.assertIsInstance(self.minicap.snapshot(newer_than=newer.seq), ndarray)
+
+    def test_static_screen(self):
+        self.minicap.get_latest_frame()
+        self.server.static = True
+        time.sleep(0.1)
+        frame = self.minicap.get_latest_frame()
+        start = time.time()
+        # no newer frame comes, the latest one is returned after NEWER_FRAME_TIMEOUT
+        self.assertEqual(self.minicap.get_latest_frame(newer_than=frame.seq).seq, frame.seq)
+        self.assertIsInstance(self.minicap.snapshot(newer_than=frame.seq), ndarray)
+        self.assertLess(time.time() - start, self.minicap.NEWER_FRAME_TIMEOUT * 2 + 0.5)
+        self.server.static = False
+        self.assertGreater(self.minicap.get_latest_frame(newer_than=frame.seq, timeout=2).seq, frame.seq)
+
+    def test_no_wait_for_device(self):
+        self.server.delay = 0.2
+        self.minicap.get_latest_frame()
+        start = time.time()
+        for i in range(5):
+            self.minicap.get_frame_from_stream()
+        self.assertLess(time.time() - start, 0.2)
+
+    def test_reconnect(self):
+        frame = self.minicap.get_latest_frame()
+        self.server.drop_connections()
+        time.sleep(0.2)
+        self.assertGreater(self.minicap.get_latest_frame(newer_than=frame.seq).seq, frame.seq)
+
+    def test_stop_prefetch(self):
+        self.minicap.get_latest_frame()
+        prefetcher = self.minicap._prefetcher
+        self.minicap.stop_prefetch()
+        self.assertFalse(prefetcher.alive)
+        # back to lazy mode, one frame requested per call
+        self.assertIsInstance(string_2_img(self.minicap.get_frame_from_stream()), ndarray)
+        self.assertTrue(self.server.lazy)
+
+    def test_frame_bytes(self):
+        self.assertIsInstance(self.minicap.get_frame_from_stream(), bytes)
+        self.minicap.stop_prefetch()
+        # the frames returned are kept intact by the next ones, received into the same pooled buffers
+        first = self.minicap.get_frame_from_stream()
+        second = self.minicap.get_frame_from_stream()
+        self.assertIsInstance(first, bytes)
+        self.assertNotEqual(FakeMinicapServer.frame_level(string_2_img(first)),
+                            FakeMinicapServer.frame_level(string_2_img(second)))
+        self.assertIsInstance(self.minicap.snapshot(), ndarray)
+
+
 if __name__ == '__main__':
     unittest.main()
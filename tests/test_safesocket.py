@@ -0,0 +1,64 @@
+# encoding=utf-8
+import socket
+import struct
+import threading
+import unittest
+from airtest.utils.safesocket import SafeSocket, BufferPool
+
+
+class TestSafeSocket(unittest.TestCase):
+
+    def setUp(self):
+        a, b = socket.socketpair()
+        self.sender = a
+        self.s = SafeSocket(b)
+
+    def tearDown(self):
+        self.sender.close()
+        self.s.close()
+
+    def _send_later(self, data):
+        t = threading.Thread(target=self.sender.sendall, args=(data,))
+        t.start()
+        return t
+
+    def test_recv_exact(self):
+        frames = [bytes(bytearray(i % 256 for i in range(size))) for size in (300000, 10, 70000)]
+        t = self._send_later(b"".join(struct.pack("<I", len(f)) + f for f in frames))
+        for frame in frames:
+            size = struct.unpack("<I", self.s.recv(4))[0]
+            data = self.s.recv_exact(size)
+            self.assertEqual(len(data), size)
+            self.assertEqual(data, frame)
+        t.join()
+
+    def test_timeout_keeps_partial_data(self):
+        self.sender.sendall(b"abc")
+        self.assertIsNone(self.s.recv_exact(5, timeout=0.1))
+        self.sender.sendall(b"de")
+        self.assertEqual(self.s.recv_exact(5, timeout=1), b"abcde")
+        self.assertIsNone(self.s.recv_with_timeout(1, timeout=0.1))
+
+    def test_broken(self):
+        self.sender.sendall(b"ab")
+        self.sender.close()
+        with self.assertRaises(socket.error):
+            self.s.recv_exact(3)
+
+    def test_pool(self):
+        pool = BufferPool(count=1)
+        self.sender.sendall(b"x" * 1000 + b"y" * 500)
+        first = self.s.recv_exact(1000, pool=pool)
+        self.assertEqual(first, b"x" * 1000)
+        buf = first.obj
+        pool.release(first)
+        # the released buffer receives the next message
+        second = self.s.recv_exact(500, pool=pool)
+        self.assertIs(second.obj, buf)
+        self.assertEqual(second, b"y" * 500)
+        # not released: a new buffer
+        self.assertIsNot(pool.acquire(10).obj, buf)
+
+
+if __name__ == '__main__':
+    unittest.main()